@@ -3,8 +3,8 @@ Agente de Análise de Casos Históricos
 Busca e compara com projetos aprovados/reprovados
 """
 from typing import Dict, List
-from app.ai.rag.embeddings import generate_embedding
-from app.ai.rag.vectorstore import search_similar_cases
+from app.ai.rag.embeddings import aembed
+from app.ai.rag.vectorstore import asearch_similar_cases
 from app.database.session import SessionLocal
 from app.models.historical_case import HistoricalCase
 import logging
@@ -38,17 +38,22 @@ class CaseAnalyzerAgent:
         try:
             # Gerar embedding da descrição
             query_text = f"{field or ''} {project_description}"
-            query_vector = generate_embedding(query_text)
+            query_vector = await aembed(query_text)
             
-            # Buscar casos similares no Qdrant
-            similar_cases = search_similar_cases(query_vector, limit=limit * 2)
+            # Buscar casos similares no Qdrant (filtro de aprovação no servidor;
+            # agrupado por case_id, um trecho por caso)
+            filters = {"approved": True} if only_approved else None
+            similar_cases = await asearch_similar_cases(
+                query_vector, limit=limit, filters=filters, query_text=query_text, group_by_case=True
+            )
             
             # Filtrar e formatar resultados
             db = SessionLocal()
             results = []
             
             for case in similar_cases:
-                case_id = case.id
+                # Pontos do pipeline são trechos: o caso vem no payload
+                case_id = (case.payload or {}).get("case_id", case.id)
                 historical = db.query(HistoricalCase).filter(
                     HistoricalCase.id == case_id
                 ).first()
@@ -56,10 +61,6 @@ class CaseAnalyzerAgent:
                 if not historical:
                     continue
                 
-                # Filtrar por aprovação se necessário
-                if only_approved and not historical.is_approved:
-                    continue
-                
                 results.append({
                     "id": historical.id,
                     "title": historical.project_title,
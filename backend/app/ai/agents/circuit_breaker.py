@@ -0,0 +1,141 @@
+"""
+Circuit breaker por provider de LLM
+
+Estados:
+    closed     chamadas normais
+    open       provider pulado; após LLM_BREAKER_COOLDOWN_SECONDS passa a
+               half_open
+    half_open  uma única chamada de teste: sucesso fecha, falha reabre
+               (e o cooldown recomeça)
+
+Abre com LLM_BREAKER_FAILURES falhas seguidas ou, com ao menos
+LLM_BREAKER_MIN_CALLS chamadas na janela (LLM_BREAKER_WINDOW), com taxa de
+erro ≥ LLM_BREAKER_ERROR_RATE. A latência dos sucessos vira uma média
+móvel exponencial (EWMA), usada para rotear ao provider mais rápido.
+"""
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Optional
+from app.config import settings
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Provider indisponível pelo circuito (não conta como falha)"""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.ewma_latency: Optional[float] = None
+        self.last_success: Optional[datetime] = None
+        self.last_failure: Optional[datetime] = None
+        self.times_opened = 0
+        self._outcomes: Deque[bool] = deque(maxlen=settings.LLM_BREAKER_WINDOW)
+        self._lock = threading.Lock()
+
+    def _cooled_down(self) -> bool:
+        return time.monotonic() - self.opened_at >= settings.LLM_BREAKER_COOLDOWN_SECONDS
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def available(self) -> bool:
+        """Pode ser chamado agora? (não altera o estado)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return self._cooled_down()
+            return not self.probe_in_flight
+
+    def acquire(self) -> bool:
+        """Reserva a chamada; em half_open só uma de cada vez (a de teste)"""
+        with self._lock:
+            if self.state == OPEN:
+                if not self._cooled_down():
+                    return False
+                self.state = HALF_OPEN
+                logger.info(f"🟡 {self.name}: cooldown encerrado, testando o provider")
+            if self.state == HALF_OPEN:
+                if self.probe_in_flight:
+                    return False
+                self.probe_in_flight = True
+            return True
+
+    def release(self):
+        """Chamada cancelada antes de terminar: não conta como sucesso nem falha"""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def record_success(self, latency: float):
+        with self._lock:
+            alpha = settings.LLM_LATENCY_EWMA_ALPHA
+            self.ewma_latency = latency if self.ewma_latency is None else (
+                alpha * latency + (1 - alpha) * self.ewma_latency
+            )
+            self._outcomes.append(True)
+            self.consecutive_failures = 0
+            self.last_success = datetime.now()
+            self.probe_in_flight = False
+            if self.state != CLOSED:
+                logger.info(f"🟢 {self.name}: circuito fechado")
+            self.state = CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._outcomes.append(False)
+            self.consecutive_failures += 1
+            self.last_failure = datetime.now()
+            self.probe_in_flight = False
+            too_many_errors = (
+                len(self._outcomes) >= settings.LLM_BREAKER_MIN_CALLS
+                and self.error_rate >= settings.LLM_BREAKER_ERROR_RATE
+            )
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED
+                and (self.consecutive_failures >= settings.LLM_BREAKER_FAILURES or too_many_errors)
+            ):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                logger.warning(
+                    f"🔴 {self.name}: circuito aberto por {settings.LLM_BREAKER_COOLDOWN_SECONDS:g}s "
+                    f"({self.consecutive_failures} falhas seguidas, erro {self.error_rate:.0%})"
+                )
+            else:
+                logger.warning(
+                    f"⚠️  {self.name}: {self.consecutive_failures}/{settings.LLM_BREAKER_FAILURES} falhas"
+                )
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            retry_in = 0.0
+            if self.state == OPEN:
+                retry_in = max(0.0, settings.LLM_BREAKER_COOLDOWN_SECONDS - (time.monotonic() - self.opened_at))
+            return {
+                "state": self.state,
+                "failures": self.consecutive_failures,
+                "error_rate": round(self.error_rate, 4),
+                "calls_in_window": len(self._outcomes),
+                "ewma_latency_ms": round(self.ewma_latency * 1000) if self.ewma_latency is not None else None,
+                "retry_in_seconds": round(retry_in, 1),
+                "times_opened": self.times_opened,
+                "last_success": self.last_success,
+                "last_failure": self.last_failure
+            }
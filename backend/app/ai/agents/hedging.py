@@ -0,0 +1,69 @@
+"""
+Requisições "hedged" entre providers de LLM
+
+Em vez de esperar o timeout (e as novas tentativas) do provider primário,
+o secundário é disparado em paralelo se o primário não responder dentro
+do percentil GENERATION_HEDGE_PERCENTILE das suas latências recentes; a
+primeira resposta válida vence e a outra chamada é cancelada.
+
+Enquanto não há amostras suficientes usa-se GENERATION_HEDGE_DEFAULT_DELAY.
+O atraso fica sempre entre GENERATION_HEDGE_MIN_DELAY e
+GENERATION_HEDGE_MAX_DELAY. Taxa de hedge e vitórias por provider saem em
+/api/ai/metrics para calibrar custo × latência.
+"""
+from collections import deque
+from typing import Deque, Dict, Optional
+from app.config import settings
+import threading
+
+
+class HedgePolicy:
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.wins: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.GENERATION_HEDGE_ENABLED
+
+    def record_latency(self, provider: str, seconds: float):
+        with self._lock:
+            self._latencies.setdefault(provider, deque(maxlen=self.window)).append(seconds)
+
+    def delay(self, provider: str) -> float:
+        """Quanto esperar pelo `provider` antes de disparar o próximo"""
+        with self._lock:
+            samples = sorted(self._latencies.get(provider, ()))
+        if len(samples) < self.min_samples:
+            delay = settings.GENERATION_HEDGE_DEFAULT_DELAY
+        else:
+            index = min(len(samples) - 1, int(len(samples) * settings.GENERATION_HEDGE_PERCENTILE / 100))
+            delay = samples[index]
+        return min(max(delay, settings.GENERATION_HEDGE_MIN_DELAY), settings.GENERATION_HEDGE_MAX_DELAY)
+
+    def record_outcome(self, hedged: bool, winner: Optional[str]):
+        """`winner` None: nenhum provider respondeu"""
+        with self._lock:
+            self.requests += 1
+            if hedged:
+                self.hedged += 1
+                if winner:
+                    self.wins[winner] = self.wins.get(winner, 0) + 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            providers = list(self._latencies)
+        return {
+            "enabled": self.enabled,
+            "percentile": settings.GENERATION_HEDGE_PERCENTILE,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedged / self.requests, 4) if self.requests else 0.0,
+            "wins": dict(self.wins),
+            "delay_seconds": {provider: round(self.delay(provider), 3) for provider in providers}
+        }
@@ -1,9 +1,11 @@
 import os
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import asyncio
 from enum import Enum
 from datetime import datetime
+import threading
 import logging
+import time
 
 try:
     from openai import AsyncOpenAI
@@ -17,6 +19,13 @@ try:
 except ImportError:
     GEMINI_AVAILABLE = False
 
+from app.ai.rag.reranker import rerank_if_enabled
+from app.ai.rag.embeddings import aembed
+from app.ai.agents.response_cache import generation_cache, prompt_key
+from app.ai.agents.hedging import HedgePolicy
+from app.ai.agents.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.config import settings
+
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -31,10 +40,17 @@ class LLMProvider(Enum):
     GEMINI = "gemini"
     RAG_ONLY = "rag_only"
 
+# Nome exibido e confiança de cada provider
+PROVIDER_MODELS = {
+    LLMProvider.OPENAI: ("gpt-4o-mini", 0.95),
+    LLMProvider.GEMINI: ("gemini-2.5-flash", 0.85)
+}
+
 class IntelligentTextAgent:
     """
     Agente inteligente multi-LLM com fallback automático
     Prioridade: GPT-4o-mini → Gemini 2.5 Flash → RAG puro
+    (com LLM_ROUTING=latency, o provider saudável mais rápido vai primeiro)
     """
     
     def __init__(self):
@@ -57,19 +73,19 @@ class IntelligentTextAgent:
             self.gemini_model = None
             logger.warning("⚠️  Gemini não disponível")
         
-        # Circuit breaker para health tracking
-        self.provider_health = {
-            LLMProvider.OPENAI: {"failures": 0, "last_success": None},
-            LLMProvider.GEMINI: {"failures": 0, "last_success": None}
+        # Circuit breaker por provider (closed/open/half_open + latência EWMA)
+        self.breakers = {
+            provider: CircuitBreaker(provider.value) for provider in PROVIDER_MODELS
         }
-        self.max_failures = 3
+        self.hedging = HedgePolicy()
     
     async def generate_contextual_text(
         self,
         field_name: str,
         project_context: Dict,
         similar_cases: List[Dict],
-        max_length: int = 1000
+        max_length: int = 1000,
+        use_cache: bool = True
     ) -> Dict:
         """
         Gera texto contextualizado usando multi-LLM com fallback
@@ -79,11 +95,146 @@ class IntelligentTextAgent:
             project_context: Contexto do projeto atual (título, instituição, etc)
             similar_cases: Lista de casos similares do RAG
             max_length: Tamanho máximo do texto gerado
+            use_cache: False ignora o cache (a nova geração o substitui)
             
         Returns:
             Dict com texto gerado, provider usado, confiança e referências
+            (de uma geração em cache: `cached` e `cache` com o provider original)
         """
         start_time = datetime.now()
+        similar_cases, prompt = await self._prepare(field_name, project_context, similar_cases, max_length)
+        
+        cache_key = prompt_key(prompt)
+        cached, context_vector = await self._lookup_cache(
+            cache_key, field_name, project_context, max_length, use_cache
+        )
+        if cached is not None:
+            cached["latency_ms"] = int((datetime.now() - start_time).total_seconds() * 1000)
+            return cached
+        
+        # GPT-4o-mini primeiro (prioridade), Gemini como fallback — com
+        # hedging, o Gemini entra em paralelo se o GPT demorar demais
+        providers = self._available_providers()
+        if self.hedging.enabled and len(providers) >= 2:
+            provider, result = await self._generate_hedged(providers[0], providers[1], prompt, max_length, field_name)
+        else:
+            provider, result = await self._generate_sequential(providers, prompt, max_length, field_name)
+        
+        if provider is not None:
+            name, confidence = PROVIDER_MODELS[provider]
+            latency = (datetime.now() - start_time).total_seconds()
+            return await self._remember(cache_key, field_name, project_context, max_length, context_vector, {
+                "text": result,
+                "provider": name,
+                "confidence": confidence,
+                "references": self._references(similar_cases),
+                "latency_ms": int(latency * 1000)
+            })
+        
+        # Fallback final: RAG puro (sempre funciona)
+        logger.warning(f"⚠️  Usando RAG puro para campo '{field_name}'")
+        return self._generate_rag_only(field_name, similar_cases)
+    
+    async def stream_contextual_text(
+        self,
+        field_name: str,
+        project_context: Dict,
+        similar_cases: List[Dict],
+        max_length: int = 1000,
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict]:
+        """
+        Versão em streaming de `generate_contextual_text`: mesma cadeia de
+        fallback (sem hedging), produzindo eventos {"event", "data"}:
+            token   {"text": trecho}
+            reset   {"provider", "error"}: o provider falhou no meio da
+                    resposta; descarte o texto recebido (o próximo recomeça)
+            done    {"provider", "confidence", "references", "latency_ms",
+                     "ttft_ms"} (+ `cached`/`cache` se veio do cache)
+        """
+        started = time.perf_counter()
+        
+        def elapsed_ms() -> int:
+            return int((time.perf_counter() - started) * 1000)
+        
+        similar_cases, prompt = await self._prepare(field_name, project_context, similar_cases, max_length)
+        
+        cache_key = prompt_key(prompt)
+        cached, context_vector = await self._lookup_cache(
+            cache_key, field_name, project_context, max_length, use_cache
+        )
+        if cached is not None:
+            text = cached.pop("text")
+            yield {"event": "token", "data": {"text": text}}
+            yield {"event": "done", "data": dict(cached, latency_ms=elapsed_ms(), ttft_ms=elapsed_ms())}
+            return
+        
+        for i, provider in enumerate(self._available_providers()):
+            name, confidence = PROVIDER_MODELS[provider]
+            action = "🚀 Tentando" if i == 0 else "🔄 Fallback para"
+            if not self.breakers[provider].acquire():
+                continue  # outra requisição está testando o provider (half_open)
+            logger.info(f"{action} {name} (streaming) para campo '{field_name}'")
+            provider_started = time.perf_counter()
+            parts: List[str] = []
+            ttft_ms = None
+            try:
+                async for delta in self._stream_provider(provider, prompt, max_length):
+                    if not delta:
+                        continue
+                    if ttft_ms is None:
+                        ttft_ms = elapsed_ms()
+                    parts.append(delta)
+                    yield {"event": "token", "data": {"text": delta}}
+                text = "".join(parts).strip()
+                if not text:
+                    raise ValueError("resposta vazia")
+            except (asyncio.CancelledError, GeneratorExit):
+                # Cliente desconectou no meio: não é falha do provider
+                self.breakers[provider].release()
+                raise
+            except Exception as e:
+                self._mark_failure(provider)
+                logger.error(f"❌ {name} falhou: {str(e)}")
+                if parts:
+                    yield {"event": "reset", "data": {"provider": name, "error": str(e)}}
+                continue
+            
+            latency = time.perf_counter() - provider_started
+            self._mark_success(provider, latency)
+            logger.info(f"✅ {name}: streaming concluído em {latency:.2f}s (primeiro trecho em {ttft_ms}ms)")
+            result = await self._remember(cache_key, field_name, project_context, max_length, context_vector, {
+                "text": text,
+                "provider": name,
+                "confidence": confidence,
+                "references": self._references(similar_cases),
+                "latency_ms": elapsed_ms()
+            })
+            yield {"event": "done", "data": dict(
+                {k: v for k, v in result.items() if k != "text"}, ttft_ms=ttft_ms
+            )}
+            return
+        
+        logger.warning(f"⚠️  Usando RAG puro para campo '{field_name}'")
+        result = self._generate_rag_only(field_name, similar_cases)
+        yield {"event": "token", "data": {"text": result.pop("text")}}
+        yield {"event": "done", "data": dict(result, latency_ms=elapsed_ms(), ttft_ms=elapsed_ms())}
+    
+    async def _prepare(
+        self,
+        field_name: str,
+        project_context: Dict,
+        similar_cases: List[Dict],
+        max_length: int
+    ) -> Tuple[List[Dict], str]:
+        """Exemplos que vão ao prompt e o prompt"""
+        # Re-ranking opcional: só os exemplos mais relevantes vão ao prompt
+        similar_cases = await rerank_if_enabled(
+            self._rerank_query(field_name, project_context),
+            similar_cases,
+            text_of=lambda case: self._case_text(case, field_name),
+            top_k=3
+        )
         
         # Construir prompt contextual rico
         prompt = self._build_contextual_prompt(
@@ -92,52 +243,182 @@ class IntelligentTextAgent:
             similar_cases=similar_cases,
             max_length=max_length
         )
-        
-        # Tentar GPT-4o-mini primeiro (prioridade)
-        if self._is_provider_healthy(LLMProvider.OPENAI) and self.openai_client:
-            try:
-                logger.info(f"🚀 Tentando GPT-4o-mini para campo '{field_name}'")
+        return similar_cases, prompt
+    
+    async def _lookup_cache(
+        self,
+        cache_key: str,
+        field_name: str,
+        project_context: Dict,
+        max_length: int,
+        use_cache: bool
+    ) -> Tuple[Optional[Dict], Optional[List[float]]]:
+        """Geração em cache: mesmo prompt (exato) ou contexto parecido (semântico)"""
+        if not use_cache or not generation_cache.enabled:
+            return None, None
+        context_vector = None
+        cached = generation_cache.get_exact(cache_key)
+        if cached is None and generation_cache.semantic_enabled:
+            context_vector = await self._context_vector(field_name, project_context)
+            if context_vector is not None:
+                cached = generation_cache.get_semantic(field_name, max_length, context_vector)
+        if cached is not None:
+            logger.info(f"♻️  Campo '{field_name}' do cache ({cached['cache']['level']}, {cached['provider']})")
+        return cached, context_vector
+    
+    @staticmethod
+    def _references(similar_cases: List[Dict]) -> List:
+        return [case.get("id", f"case_{i}") for i, case in enumerate(similar_cases[:3])]
+    
+    def _available_providers(self) -> List[LLMProvider]:
+        """
+        Providers configurados com o circuito permitindo chamadas, na ordem
+        de prioridade ou, com LLM_ROUTING=latency, do mais rápido (EWMA) ao
+        mais lento; providers sem nenhum sucesso medido ficam por último, na
+        ordem de prioridade (um provider que só falha não passa à frente)
+        """
+        clients = {LLMProvider.OPENAI: self.openai_client, LLMProvider.GEMINI: self.gemini_model}
+        providers = [
+            provider for provider in (LLMProvider.OPENAI, LLMProvider.GEMINI)
+            if clients[provider] is not None and self._is_provider_healthy(provider)
+        ]
+        if settings.LLM_ROUTING == "latency":
+            def latency(provider):
+                ewma = self.breakers[provider].ewma_latency
+                return (ewma is None, ewma or 0.0)
+
+            providers.sort(key=latency)
+        return providers
+    
+    async def _call_provider(self, provider: LLMProvider, prompt: str, max_length: int) -> str:
+        """Uma chamada ao provider, com registro de sucesso/falha e latência"""
+        name = PROVIDER_MODELS[provider][0]
+        if not self.breakers[provider].acquire():
+            raise CircuitOpenError(f"{name}: circuito aberto")
+        started = time.perf_counter()
+        try:
+            if provider == LLMProvider.OPENAI:
                 result = await self._generate_with_openai(prompt, max_length)
-                self._mark_success(LLMProvider.OPENAI)
-                
-                latency = (datetime.now() - start_time).total_seconds()
-                logger.info(f"✅ GPT-4o-mini: sucesso em {latency:.2f}s")
-                
-                return {
-                    "text": result,
-                    "provider": "gpt-4o-mini",
-                    "confidence": 0.95,
-                    "references": [case.get("id", f"case_{i}") for i, case in enumerate(similar_cases[:3])],
-                    "latency_ms": int(latency * 1000)
-                }
-            except Exception as e:
-                self._mark_failure(LLMProvider.OPENAI)
-                logger.error(f"❌ OpenAI falhou: {str(e)}")
-        
-        # Fallback para Gemini
-        if self._is_provider_healthy(LLMProvider.GEMINI) and self.gemini_model:
-            try:
-                logger.info(f"🔄 Fallback para Gemini para campo '{field_name}'")
+            else:
                 result = await self._generate_with_gemini(prompt, max_length)
-                self._mark_success(LLMProvider.GEMINI)
-                
-                latency = (datetime.now() - start_time).total_seconds()
-                logger.info(f"✅ Gemini: sucesso em {latency:.2f}s")
-                
-                return {
-                    "text": result,
-                    "provider": "gemini-2.5-flash",
-                    "confidence": 0.85,
-                    "references": [case.get("id", f"case_{i}") for i, case in enumerate(similar_cases[:3])],
-                    "latency_ms": int(latency * 1000)
-                }
-            except Exception as e:
-                self._mark_failure(LLMProvider.GEMINI)
-                logger.error(f"❌ Gemini falhou: {str(e)}")
+            if not result:
+                raise ValueError("resposta vazia")
+        except asyncio.CancelledError:
+            # Perdedor do hedge / cliente desconectou: não é falha
+            self.breakers[provider].release()
+            raise
+        except Exception as e:
+            self._mark_failure(provider)
+            logger.error(f"❌ {name} falhou: {str(e)}")
+            raise
         
-        # Fallback final: RAG puro (sempre funciona)
-        logger.warning(f"⚠️  Usando RAG puro para campo '{field_name}'")
-        return self._generate_rag_only(field_name, similar_cases)
+        latency = time.perf_counter() - started
+        self._mark_success(provider, latency)
+        logger.info(f"✅ {name}: sucesso em {latency:.2f}s")
+        return result
+    
+    async def _generate_sequential(
+        self,
+        providers: List[LLMProvider],
+        prompt: str,
+        max_length: int,
+        field_name: str
+    ) -> Tuple[Optional[LLMProvider], Optional[str]]:
+        """Um provider de cada vez, na ordem; (None, None) se todos falharem"""
+        for i, provider in enumerate(providers):
+            action = "🚀 Tentando" if i == 0 else "🔄 Fallback para"
+            logger.info(f"{action} {PROVIDER_MODELS[provider][0]} para campo '{field_name}'")
+            try:
+                return provider, await self._call_provider(provider, prompt, max_length)
+            except Exception:
+                continue
+        return None, None
+    
+    async def _generate_hedged(
+        self,
+        primary: LLMProvider,
+        secondary: LLMProvider,
+        prompt: str,
+        max_length: int,
+        field_name: str
+    ) -> Tuple[Optional[LLMProvider], Optional[str]]:
+        """
+        Dispara o secundário em paralelo se o primário não responder dentro
+        do atraso do hedge; a primeira resposta válida vence e a outra
+        chamada é cancelada.
+        """
+        delay = self.hedging.delay(primary.value)
+        logger.info(f"🚀 Tentando {PROVIDER_MODELS[primary][0]} para campo '{field_name}' (hedge em {delay:.1f}s)")
+        tasks = {asyncio.create_task(self._call_provider(primary, prompt, max_length)): primary}
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=delay)
+            hedged = not done
+            if hedged:
+                logger.info(f"⏩ {PROVIDER_MODELS[primary][0]} sem resposta em {delay:.1f}s: "
+                            f"disparando {PROVIDER_MODELS[secondary][0]} em paralelo")
+            else:
+                primary_task = next(iter(done))
+                if primary_task.exception() is None:
+                    self.hedging.record_outcome(False, primary.value)
+                    return primary, primary_task.result()
+                logger.info(f"🔄 Fallback para {PROVIDER_MODELS[secondary][0]} para campo '{field_name}'")
+            tasks[asyncio.create_task(self._call_provider(secondary, prompt, max_length))] = secondary
+            
+            pending = {task for task in tasks if not task.done()}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.hedging.record_outcome(hedged, tasks[task].value)
+                        return tasks[task], task.result()
+            self.hedging.record_outcome(hedged, None)
+            return None, None
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    async def _remember(
+        self,
+        cache_key: str,
+        field_name: str,
+        project_context: Dict,
+        max_length: int,
+        context_vector,
+        result: Dict
+    ) -> Dict:
+        """Guarda a geração do LLM no cache e a devolve"""
+        if generation_cache.enabled:
+            if context_vector is None and generation_cache.semantic_enabled:
+                context_vector = await self._context_vector(field_name, project_context)
+            generation_cache.put(cache_key, result, field_name, max_length, context_vector)
+        return result
+    
+    async def _context_vector(self, field_name: str, project_context: Dict):
+        """Embedding do contexto do projeto (chave do cache semântico)"""
+        parts = [field_name] + [
+            str(project_context.get(key, "")) for key in ("titulo", "instituicao", "tipo", "publico_alvo")
+        ]
+        try:
+            return await aembed(" | ".join(parts))
+        except Exception as e:
+            logger.warning(f"⚠️  Cache semântico indisponível: {e}")
+            return None
+    
+    @staticmethod
+    def _rerank_query(field_name: str, project_context: Dict) -> str:
+        """Consulta usada pelo cross-encoder para pontuar os exemplos"""
+        parts = [field_name, project_context.get("titulo", ""), project_context.get("tipo", "")]
+        return " ".join(p for p in parts if p)
+    
+    @staticmethod
+    def _case_text(case: Dict, field_name: str) -> str:
+        """Texto do caso relevante para o campo (seção específica ou resumo)"""
+        return (
+            case.get('metadata', {}).get(field_name)
+            or case.get('summary')
+            or case.get('text', '')
+        )
     
     def _build_contextual_prompt(
         self,
@@ -199,7 +480,13 @@ class IntelligentTextAgent:
     async def _generate_with_openai(self, prompt: str, max_length: int) -> str:
         """Gera texto usando GPT-4o-mini com retry logic"""
         
-        response = await self.openai_client.chat.completions.create(
+        response = await self.openai_client.chat.completions.create(**self._openai_request(prompt, max_length))
+        
+        return response.choices[0].message.content.strip()
+    
+    @staticmethod
+    def _openai_request(prompt: str, max_length: int) -> Dict:
+        return dict(
             model="gpt-4o-mini",
             messages=[
                 {
@@ -216,12 +503,20 @@ class IntelligentTextAgent:
             top_p=0.9,
             timeout=30.0
         )
-        
-        return response.choices[0].message.content.strip()
     
     async def _generate_with_gemini(self, prompt: str, max_length: int) -> str:
         """Gera texto usando Gemini 2.5 Flash"""
         
+        response = await asyncio.to_thread(
+            self.gemini_model.generate_content,
+            prompt,
+            **self._gemini_options(max_length)
+        )
+        
+        return response.text.strip()
+    
+    @staticmethod
+    def _gemini_options(max_length: int) -> Dict:
         generation_config = {
             "temperature": 0.7,
             "top_p": 0.9,
@@ -236,14 +531,60 @@ class IntelligentTextAgent:
             {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
         ]
         
-        response = await asyncio.to_thread(
-            self.gemini_model.generate_content,
-            prompt,
-            generation_config=generation_config,
-            safety_settings=safety_settings
+        return {"generation_config": generation_config, "safety_settings": safety_settings}
+    
+    def _stream_provider(self, provider: LLMProvider, prompt: str, max_length: int) -> AsyncIterator[str]:
+        if provider == LLMProvider.OPENAI:
+            return self._stream_openai(prompt, max_length)
+        return self._stream_gemini(prompt, max_length)
+    
+    async def _stream_openai(self, prompt: str, max_length: int) -> AsyncIterator[str]:
+        """Trechos do GPT-4o-mini conforme são gerados (stream=True)"""
+        stream = await self.openai_client.chat.completions.create(
+            **self._openai_request(prompt, max_length), stream=True
         )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Cliente desconectou ou fallback: fecha a conexão com a OpenAI
+            await stream.response.aclose()
+    
+    async def _stream_gemini(self, prompt: str, max_length: int) -> AsyncIterator[str]:
+        """
+        Trechos do Gemini conforme são gerados. O SDK é síncrono: a
+        iteração roda numa thread e os trechos chegam por uma fila.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        stop = threading.Event()
         
-        return response.text.strip()
+        def produce():
+            try:
+                response = self.gemini_model.generate_content(
+                    prompt, stream=True, **self._gemini_options(max_length)
+                )
+                for chunk in response:
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, (chunk.text, None))
+                loop.call_soon_threadsafe(queue.put_nowait, (finished, None))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, (finished, e))
+        
+        loop.run_in_executor(None, produce)
+        try:
+            while True:
+                item, error = await queue.get()
+                if item is finished:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            stop.set()  # a thread para no próximo trecho
     
     def _generate_rag_only(self, field_name: str, similar_cases: List[Dict]) -> Dict:
         """Fallback final: retorna exemplos formatados (sistema atual)"""
@@ -269,33 +610,30 @@ class IntelligentTextAgent:
     
     def _is_provider_healthy(self, provider: LLMProvider) -> bool:
         """Verifica health do provider (circuit breaker)"""
-        return self.provider_health[provider]["failures"] < self.max_failures
+        return self.breakers[provider].available()
     
-    def _mark_success(self, provider: LLMProvider):
-        """Marca sucesso e reseta contador"""
-        self.provider_health[provider]["failures"] = 0
-        self.provider_health[provider]["last_success"] = datetime.now()
+    def _mark_success(self, provider: LLMProvider, latency: float):
+        """Sucesso: fecha o circuito e atualiza a latência (EWMA e percentil do hedge)"""
+        self.breakers[provider].record_success(latency)
+        self.hedging.record_latency(provider.value, latency)
     
     def _mark_failure(self, provider: LLMProvider):
-        """Incrementa contador de falhas"""
-        self.provider_health[provider]["failures"] += 1
-        logger.warning(
-            f"⚠️  {provider.value}: {self.provider_health[provider]['failures']}/{self.max_failures} falhas"
-        )
+        """Falha: conta para abrir o circuito (ou o reabre, em half_open)"""
+        self.breakers[provider].record_failure()
 
     def get_health_status(self) -> Dict:
         """Retorna status de saúde de todos os providers"""
-        return {
-            "openai": {
-                "available": self.openai_client is not None,
-                "failures": self.provider_health[LLMProvider.OPENAI]["failures"],
-                "last_success": self.provider_health[LLMProvider.OPENAI]["last_success"],
-                "healthy": self._is_provider_healthy(LLMProvider.OPENAI)
-            },
-            "gemini": {
-                "available": self.gemini_model is not None,
-                "failures": self.provider_health[LLMProvider.GEMINI]["failures"],
-                "last_success": self.provider_health[LLMProvider.GEMINI]["last_success"],
-                "healthy": self._is_provider_healthy(LLMProvider.GEMINI)
-            }
+        clients = {LLMProvider.OPENAI: self.openai_client, LLMProvider.GEMINI: self.gemini_model}
+        status = {
+            provider.value: dict(
+                self.breakers[provider].get_stats(),
+                available=clients[provider] is not None,
+                healthy=self._is_provider_healthy(provider)
+            )
+            for provider in (LLMProvider.OPENAI, LLMProvider.GEMINI)
+        }
+        status["routing"] = {
+            "mode": settings.LLM_ROUTING,
+            "order": [PROVIDER_MODELS[provider][0] for provider in self._available_providers()] + ["rag-only"]
         }
+        return status
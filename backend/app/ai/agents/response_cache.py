@@ -0,0 +1,157 @@
+"""
+Cache das gerações do IntelligentTextAgent
+
+Dois níveis:
+    exato      sha256 do prompt final (contexto + exemplos + tamanho);
+               re-cliques em "gerar" e o /test-generation não chamam o LLM
+    semântico  opcional (GENERATION_SEMANTIC_CACHE_ENABLED): mesmo campo e
+               tamanho, com o embedding do contexto do projeto acima de
+               GENERATION_SEMANTIC_THRESHOLD de similaridade (cosseno)
+
+Ambos com TTL e limite de itens. Só respostas de LLM entram (o fallback
+RAG puro não é guardado, para que a próxima chamada tente o provider de
+novo); cada entrada guarda o provider que a gerou.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.utils.lru import LRUCache
+import numpy as np
+import threading
+import hashlib
+import time
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedGeneration:
+    response: Dict
+    provider: str
+    created_at: float
+
+
+class GenerationCache:
+    def __init__(self, max_items: int, ttl_seconds: float, semantic_items: int, threshold: float):
+        self.exact = LRUCache(max_items, ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self.semantic_items = semantic_items
+        self.threshold = threshold
+        # (campo, tamanho) → [(vetor normalizado, geração, expira_em)], mais antigos primeiro
+        self._semantic: Dict[Tuple[str, int], List[Tuple[np.ndarray, CachedGeneration, float]]] = {}
+        self._semantic_size = 0
+        self._lock = threading.Lock()
+        self.semantic_hits = 0
+        self.semantic_misses = 0
+        self.saved_ms = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.exact.max_items > 0
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.enabled and settings.GENERATION_SEMANTIC_CACHE_ENABLED and self.semantic_items > 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _hit(self, entry: CachedGeneration, level: str, similarity: Optional[float] = None) -> Dict:
+        original_ms = entry.response.get("latency_ms", 0)
+        with self._lock:
+            self.saved_ms += original_ms
+        cache = {
+            "level": level,
+            "original_provider": entry.provider,
+            "original_latency_ms": original_ms,
+            "age_seconds": round(time.time() - entry.created_at, 1)
+        }
+        if similarity is not None:
+            cache["similarity"] = round(similarity, 4)
+        return dict(entry.response, cached=True, cache=cache)
+
+    def get_exact(self, key: str) -> Optional[Dict]:
+        entry = self.exact.get(key)
+        return self._hit(entry, "exact") if entry is not None else None
+
+    def get_semantic(self, field_name: str, max_length: int, vector) -> Optional[Dict]:
+        query = self._normalize(vector)
+        now = time.monotonic()
+        best, best_score = None, -1.0
+        with self._lock:
+            entries = self._semantic.get((field_name, max_length), [])
+            alive = [item for item in entries if item[2] > now]
+            self._semantic_size -= len(entries) - len(alive)
+            if alive:
+                self._semantic[(field_name, max_length)] = alive
+                scores = np.stack([item[0] for item in alive]) @ query
+                index = int(np.argmax(scores))
+                best, best_score = alive[index][1], float(scores[index])
+            else:
+                self._semantic.pop((field_name, max_length), None)
+
+            if best is None or best_score < self.threshold:
+                self.semantic_misses += 1
+                return None
+            self.semantic_hits += 1
+        return self._hit(best, "semantic", best_score)
+
+    def put(self, key: str, response: Dict, field_name: str, max_length: int, vector=None):
+        entry = CachedGeneration(
+            response={k: v for k, v in response.items() if k not in ("cached", "cache")},
+            provider=response.get("provider", ""),
+            created_at=time.time()
+        )
+        self.exact.set(key, entry)
+        if vector is None or not self.semantic_enabled:
+            return
+
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else float("inf")
+        with self._lock:
+            self._semantic.setdefault((field_name, max_length), []).append(
+                (self._normalize(vector), entry, expires_at)
+            )
+            self._semantic_size += 1
+            while self._semantic_size > self.semantic_items:
+                # Remove a entrada mais antiga entre todos os campos
+                oldest = min(self._semantic, key=lambda k: self._semantic[k][0][1].created_at)
+                self._semantic[oldest].pop(0)
+                if not self._semantic[oldest]:
+                    del self._semantic[oldest]
+                self._semantic_size -= 1
+
+    def clear(self):
+        self.exact.clear()
+        with self._lock:
+            self._semantic.clear()
+            self._semantic_size = 0
+
+    def get_stats(self) -> dict:
+        semantic_total = self.semantic_hits + self.semantic_misses
+        return {
+            "exact": self.exact.get_stats(),
+            "semantic": {
+                "enabled": self.semantic_enabled,
+                "size": self._semantic_size,
+                "max_items": self.semantic_items,
+                "threshold": self.threshold,
+                "hits": self.semantic_hits,
+                "misses": self.semantic_misses,
+                "hit_ratio": round(self.semantic_hits / semantic_total, 4) if semantic_total else 0.0
+            },
+            "ttl_seconds": self.ttl_seconds,
+            "saved_latency_ms": self.saved_ms
+        }
+
+
+generation_cache = GenerationCache(
+    max_items=settings.GENERATION_CACHE_SIZE,
+    ttl_seconds=settings.GENERATION_CACHE_TTL_SECONDS,
+    semantic_items=settings.GENERATION_SEMANTIC_CACHE_SIZE,
+    threshold=settings.GENERATION_SEMANTIC_THRESHOLD
+)
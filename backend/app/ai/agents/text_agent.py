@@ -1,6 +1,7 @@
 from typing import Dict, List
-from app.ai.rag.embeddings import generate_embedding
-from app.ai.rag.vectorstore import search_similar_cases
+from app.ai.rag.embeddings import aembed
+from app.ai.rag.vectorstore import asearch_similar_cases
+from app.ai.rag.reranker import rerank_if_enabled, candidate_limit
 import google.generativeai as genai
 from app.config import settings
 import logging
@@ -76,8 +77,11 @@ async def suggest_text(field_name: str, field_context: Dict, project_context: Di
     
     # 2. BUSCAR CASOS (RAG)
     try:
-        query_vector = generate_embedding(query)
-        similar_cases = search_similar_cases(query_vector, limit=8)
+        query_vector = await aembed(query)
+        similar_cases = await asearch_similar_cases(query_vector, limit=candidate_limit(8), query_text=query)
+        similar_cases = await rerank_if_enabled(
+            query, similar_cases, text_of=lambda c: c.payload.get('text', ''), top_k=8
+        )
         logger.info(f"✅ {len(similar_cases)} casos (scores: {[f'{c.score:.2f}' for c in similar_cases[:3]]})")
     except Exception as e:
         logger.error(f"RAG erro: {e}")
@@ -0,0 +1,173 @@
+"""
+Cache de embeddings endereçado por conteúdo
+
+Chave = sha256(EMBEDDING_MODEL + texto normalizado). Camada 1 é um LRU
+em memória; camada 2 (opcional) é Redis ou disco, para sobreviver a
+reinícios e ser compartilhada entre workers/scripts de importação.
+"""
+from array import array
+from pathlib import Path
+from typing import List, Optional
+from app.config import settings
+from app.utils.lru import LRUCache
+import unicodedata
+import hashlib
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza unicode (NFC) e colapsa espaços em branco"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def model_fingerprint() -> str:
+    """Identifica modelo + backend (vetores ONNX/int8 diferem levemente)"""
+    if settings.EMBEDDING_BACKEND == "onnx":
+        suffix = "-int8" if settings.EMBEDDING_ONNX_QUANTIZED else ""
+        return f"{settings.EMBEDDING_MODEL}#onnx{suffix}"
+    return settings.EMBEDDING_MODEL
+
+
+def cache_key(text: str, model_name: Optional[str] = None) -> str:
+    model_name = model_name or model_fingerprint()
+    payload = f"{model_name}\x00{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(data: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(data)
+    return values.tolist()
+
+
+class RedisEmbeddingStore:
+    """Camada persistente em Redis (usa REDIS_URL)"""
+
+    prefix = "pronas:emb:"
+
+    def __init__(self, url: str, ttl_seconds: int = 0):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> Optional[List[float]]:
+        data = self.client.get(self.prefix + key)
+        return _unpack(data) if data else None
+
+    def set(self, key: str, vector: List[float]):
+        self.client.set(self.prefix + key, _pack(vector), ex=self.ttl_seconds or None)
+
+
+class DiskEmbeddingStore:
+    """Camada persistente em disco: um arquivo float32 por chave"""
+
+    def __init__(self, directory: str):
+        self.root = Path(directory)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.f32"
+
+    def get(self, key: str) -> Optional[List[float]]:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        return _unpack(path.read_bytes())
+
+    def set(self, key: str, vector: List[float]):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_suffix(f".tmp{os.getpid()}")
+        tmp.write_bytes(_pack(vector))
+        os.replace(tmp, path)
+
+
+class EmbeddingCache:
+    """LRU em memória + camada persistente opcional, com contadores"""
+
+    def __init__(self, max_items: int, backend: str = "memory"):
+        self.memory = LRUCache(max_items)
+        self.store = self._build_store(backend)
+        self._lock = threading.Lock()
+        self.store_hits = 0
+        self.store_errors = 0
+        self.computed = 0
+        self.compute_seconds = 0.0
+
+    def _build_store(self, backend: str):
+        try:
+            if backend == "redis":
+                return RedisEmbeddingStore(settings.REDIS_URL, settings.EMBEDDING_CACHE_TTL_SECONDS)
+            if backend == "disk":
+                return DiskEmbeddingStore(settings.EMBEDDING_CACHE_DIR)
+        except Exception as e:
+            logger.warning(f"⚠️  Cache persistente de embeddings indisponível ({backend}): {e}")
+        return None
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = cache_key(text)
+        vector = self.memory.get(key)
+        if vector is not None or self.store is None:
+            return vector
+
+        try:
+            vector = self.store.get(key)
+        except Exception as e:
+            self.store_errors += 1
+            logger.debug(f"Erro lendo cache persistente: {e}")
+            return None
+
+        if vector is not None:
+            with self._lock:
+                self.store_hits += 1
+            self.memory.set(key, vector)
+        return vector
+
+    def set(self, text: str, vector: List[float]):
+        key = cache_key(text)
+        self.memory.set(key, vector)
+        if self.store is None:
+            return
+        try:
+            self.store.set(key, vector)
+        except Exception as e:
+            self.store_errors += 1
+            logger.debug(f"Erro gravando cache persistente: {e}")
+
+    def record_compute(self, count: int, seconds: float):
+        """Registra tempo de modelo gasto em misses (para estimar economia)"""
+        with self._lock:
+            self.computed += count
+            self.compute_seconds += seconds
+
+    def get_stats(self) -> dict:
+        memory = self.memory.get_stats()
+        hits = memory["hits"]
+        misses = memory["misses"] - self.store_hits
+        avg = self.compute_seconds / self.computed if self.computed else 0.0
+        total = hits + self.store_hits + misses
+        return {
+            "backend": type(self.store).__name__ if self.store else "memory",
+            "memory": memory,
+            "store_hits": self.store_hits,
+            "store_errors": self.store_errors,
+            "hits": hits + self.store_hits,
+            "misses": misses,
+            "hit_ratio": round((hits + self.store_hits) / total, 4) if total else 0.0,
+            "avg_compute_ms": round(avg * 1000, 2),
+            "estimated_saved_seconds": round((hits + self.store_hits) * avg, 3)
+        }
+
+
+embedding_cache = EmbeddingCache(
+    max_items=settings.EMBEDDING_CACHE_SIZE,
+    backend=settings.EMBEDDING_CACHE_BACKEND
+)
@@ -0,0 +1,67 @@
+"""
+Servidor de embeddings compartilhado
+
+Um único processo carrega o modelo e atende os workers da API, que
+passam a ser clientes quando EMBEDDING_SERVER_URL está configurado.
+Pedidos concorrentes de vários workers são agrupados pelo micro-batcher.
+
+Executar (socket Unix ou porta local):
+    uvicorn app.ai.rag.embedding_server:app --uds /tmp/pronas-embed.sock
+    uvicorn app.ai.rag.embedding_server:app --host 127.0.0.1 --port 8001
+"""
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from typing import List
+from app.config import settings
+from app.ai.rag.embedding_cache import model_fingerprint
+from app.ai.rag.embeddings import (
+    aembed,
+    aembed_many,
+    build_backend,
+    get_embedding_dimension,
+    get_embedding_stats,
+    shutdown_embedding_executor,
+    use_embedding_backend
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="PRONAS/PCD - Servidor de Embeddings")
+
+
+class EmbedRequest(BaseModel):
+    texts: List[str]
+
+
+@app.on_event("startup")
+async def startup_event():
+    # Sempre o modelo local, mesmo com EMBEDDING_SERVER_URL (evita chamar a si mesmo)
+    use_embedding_backend(build_backend(settings.EMBEDDING_BACKEND))
+    logger.info(f"🧠 Servidor de embeddings: {model_fingerprint()} ({get_embedding_dimension()} dim)")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    shutdown_embedding_executor()
+
+@app.post("/embed")
+async def embed(request: EmbedRequest):
+    if len(request.texts) > settings.EMBEDDING_SERVER_MAX_TEXTS:
+        raise HTTPException(status_code=413, detail="Textos demais em um único pedido")
+
+    # Pedido unitário entra no micro-batcher junto com os de outros workers
+    if len(request.texts) == 1:
+        vectors = [await aembed(request.texts[0])]
+    else:
+        vectors = await aembed_many(request.texts)
+
+    return {"model": model_fingerprint(), "vectors": vectors}
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "healthy",
+        "model": model_fingerprint(),
+        "dimension": get_embedding_dimension(),
+        "stats": get_embedding_stats()
+    }
@@ -1,18 +1,519 @@
-from sentence_transformers import SentenceTransformer
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
 from app.config import settings
+from app.ai.rag.embedding_cache import embedding_cache
+import threading
+import asyncio
 import logging
+import queue
+import json
+import math
+import time
 
 logger = logging.getLogger(__name__)
 
-_model = None
 
-def get_embedding_model():
-    global _model
-    if _model is None:
-        logger.info(f"Carregando modelo de embeddings: {settings.EMBEDDING_MODEL}")
-        _model = SentenceTransformer(settings.EMBEDDING_MODEL)
-    return _model
+class EmbeddingBackend:
+    """Interface comum dos backends de inferência de embeddings"""
+
+    name = "base"
+
+    def encode(self, texts: List[str], batch_size: int) -> List[List[float]]:
+        raise NotImplementedError
+
+    @property
+    def dimension(self) -> int:
+        raise NotImplementedError
+
+
+class TorchBackend(EmbeddingBackend):
+    """Modelo de referência: SentenceTransformer em PyTorch"""
+
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str], batch_size: int) -> List[List[float]]:
+        vectors = self.model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+        return vectors.tolist()
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    Transformer exportado para ONNX Runtime (opcionalmente int8).
+
+    Reproduz o pooling do SentenceTransformer (média dos tokens com a
+    máscara de atenção) sem importar torch no processo do worker.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str, quantized: bool = False, threads: int = 0):
+        import numpy as np
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.np = np
+        model_dir = Path(model_dir)
+        model_file = model_dir / ("model_quantized.onnx" if quantized else "model.onnx")
+        if not model_file.exists():
+            raise FileNotFoundError(
+                f"{model_file} não encontrado. Rode scripts/export_onnx_embeddings.py"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.session = ort.InferenceSession(
+            str(model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+
+        config = json.loads((model_dir / "pronas_export.json").read_text())
+        self.max_seq_length = config["max_seq_length"]
+        self.pooling = config.get("pooling", "mean")
+        self._dimension = config["dimension"]
+
+    def encode(self, texts: List[str], batch_size: int) -> List[List[float]]:
+        np = self.np
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            tokens = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            feeds = {k: v.astype(np.int64) for k, v in tokens.items() if k in self.input_names}
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            if self.pooling == "cls":
+                vectors.extend(token_embeddings[:, 0].tolist())
+                continue
+
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            summed = (token_embeddings * mask).sum(axis=1)
+            counts = np.clip(mask.sum(axis=1), 1e-9, None)
+            vectors.extend((summed / counts).tolist())
+        return vectors
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+
+def export_onnx_model(model_name: str, output_dir: str, quantize: bool = True) -> Path:
+    """Exporta o transformer do SentenceTransformer para ONNX (+ versão int8)"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0]
+    auto_model = transformer.auto_model.eval()
+    tokenizer = transformer.tokenizer
+
+    sample = tokenizer(["exemplo de texto"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            auto_model,
+            tuple(sample[name] for name in input_names),
+            str(output / "model.onnx"),
+            input_names=input_names,
+            output_names=["token_embeddings"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+
+    tokenizer.save_pretrained(str(output))
+    (output / "pronas_export.json").write_text(json.dumps({
+        "model": model_name,
+        "max_seq_length": st_model.max_seq_length,
+        "pooling": "cls" if st_model[1].get_pooling_mode_str() == "cls" else "mean",
+        "dimension": st_model.get_sentence_embedding_dimension()
+    }))
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(
+            str(output / "model.onnx"),
+            str(output / "model_quantized.onnx"),
+            weight_type=QuantType.QInt8
+        )
+
+    logger.info(f"✅ Modelo exportado para ONNX em {output}")
+    return output
+
+
+class RemoteBackend(EmbeddingBackend):
+    """
+    Cliente do servidor de embeddings compartilhado (embedding_server.py).
+
+    Aceita `http://host:porta` ou `unix:///caminho/do/socket`. Com
+    EMBEDDING_SERVER_FALLBACK_LOCAL, carrega o modelo local se o servidor
+    estiver indisponível.
+    """
+
+    name = "remote"
+
+    def __init__(self, url: str, timeout: float = 30.0, fallback_local: bool = False):
+        import httpx
+
+        if url.startswith("unix://"):
+            transport = httpx.HTTPTransport(uds=url[len("unix://"):], retries=1)
+            base_url = "http://embeddings"
+        else:
+            transport = httpx.HTTPTransport(retries=1)
+            base_url = url.rstrip("/")
+
+        self.url = url
+        self.client = httpx.Client(base_url=base_url, transport=transport, timeout=timeout)
+        self.fallback_local = fallback_local
+        self._local: Optional[EmbeddingBackend] = None
+        self._dimension: Optional[int] = None
+
+    def _fallback(self, error: Exception) -> EmbeddingBackend:
+        if not self.fallback_local:
+            raise error
+        if self._local is None:
+            logger.warning(f"⚠️  Servidor de embeddings indisponível ({error}); usando modelo local")
+            self._local = build_backend(settings.EMBEDDING_BACKEND)
+        return self._local
+
+    def encode(self, texts: List[str], batch_size: int) -> List[List[float]]:
+        try:
+            response = self.client.post("/embed", json={"texts": texts})
+            response.raise_for_status()
+            return response.json()["vectors"]
+        except Exception as e:
+            return self._fallback(e).encode(texts, batch_size)
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            try:
+                response = self.client.get("/health")
+                response.raise_for_status()
+                self._dimension = response.json()["dimension"]
+            except Exception as e:
+                return self._fallback(e).dimension
+        return self._dimension
+
+
+def build_backend(name: Optional[str] = None) -> EmbeddingBackend:
+    if name is None and settings.EMBEDDING_SERVER_URL:
+        return RemoteBackend(
+            settings.EMBEDDING_SERVER_URL,
+            timeout=settings.EMBEDDING_SERVER_TIMEOUT,
+            fallback_local=settings.EMBEDDING_SERVER_FALLBACK_LOCAL
+        )
+
+    name = name or settings.EMBEDDING_BACKEND
+    if name == "onnx":
+        return OnnxBackend(
+            settings.EMBEDDING_ONNX_DIR,
+            quantized=settings.EMBEDDING_ONNX_QUANTIZED,
+            threads=settings.EMBEDDING_ONNX_THREADS
+        )
+    if name == "torch":
+        return TorchBackend(settings.EMBEDDING_MODEL)
+    raise ValueError(f"Backend de embeddings desconhecido: {name}")
+
+
+_backend: Optional[EmbeddingBackend] = None
+_backend_lock = threading.Lock()
+
+def get_embedding_backend() -> EmbeddingBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.EMBEDDING_SERVER_URL:
+                    logger.info(f"Usando servidor de embeddings: {settings.EMBEDDING_SERVER_URL}")
+                else:
+                    logger.info(
+                        f"Carregando modelo de embeddings: {settings.EMBEDDING_MODEL} "
+                        f"(backend={settings.EMBEDDING_BACKEND})"
+                    )
+                _backend = build_backend()
+    return _backend
+
+def use_embedding_backend(backend: EmbeddingBackend):
+    """Fixa o backend deste processo (o servidor de embeddings usa sempre o modelo local)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+def get_embedding_dimension() -> int:
+    return get_embedding_backend().dimension
+
+def _encode(texts: List[str]) -> List[List[float]]:
+    """Codifica uma lista de textos em uma única chamada ao modelo"""
+    backend = get_embedding_backend()
+    started = time.perf_counter()
+    vectors = backend.encode(texts, batch_size=settings.EMBEDDING_BATCH_SIZE)
+    embedding_cache.record_compute(len(texts), time.perf_counter() - started)
+    return vectors
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+def check_backend_parity(
+    texts: List[str],
+    candidate: Optional[EmbeddingBackend] = None,
+    reference: Optional[EmbeddingBackend] = None
+) -> Dict:
+    """
+    Compara um backend com o modelo PyTorch de referência.
+
+    Retorna o desvio de cosseno (1 - cos) médio e máximo e a latência
+    média por texto de cada backend.
+    """
+    candidate = candidate or get_embedding_backend()
+    reference = reference or TorchBackend(settings.EMBEDDING_MODEL)
+    batch_size = settings.EMBEDDING_BATCH_SIZE
+
+    started = time.perf_counter()
+    expected = reference.encode(texts, batch_size)
+    reference_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    actual = candidate.encode(texts, batch_size)
+    candidate_seconds = time.perf_counter() - started
+
+    drifts = [1.0 - _cosine(a, b) for a, b in zip(expected, actual)]
+    return {
+        "reference": reference.name,
+        "candidate": candidate.name,
+        "samples": len(texts),
+        "mean_cosine_drift": sum(drifts) / len(drifts) if drifts else 0.0,
+        "max_cosine_drift": max(drifts) if drifts else 0.0,
+        "reference_ms_per_text": reference_seconds / len(texts) * 1000 if texts else 0.0,
+        "candidate_ms_per_text": candidate_seconds / len(texts) * 1000 if texts else 0.0
+    }
+
+
+class EmbeddingMicroBatcher:
+    """
+    Agrupa pedidos concorrentes de embedding em lotes.
+
+    Cada chamada a `submit` enfileira um texto; uma thread dedicada espera
+    até `max_wait_ms` (ou até encher `max_batch_size`) e codifica tudo em
+    uma única chamada ao modelo, resolvendo os futures de cada chamador.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="embedding-microbatcher",
+                    daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((text, future))
+        return future
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            texts = [text for text, _ in batch]
+            try:
+                vectors = _encode(texts)
+                if len(vectors) != len(texts):
+                    raise RuntimeError(f"backend retornou {len(vectors)} vetores para {len(texts)} textos")
+            except Exception as e:
+                logger.error(f"❌ Erro no lote de embeddings ({len(texts)} textos): {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def get_stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "pending": self._queue.qsize()
+        }
+
+
+_batcher = EmbeddingMicroBatcher(
+    max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+    max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS
+)
+
+def generate_embeddings(texts: List[str]) -> List[List[float]]:
+    """Gera embeddings para vários textos de uma vez (uso em importações)"""
+    results: List[Optional[List[float]]] = [embedding_cache.get(t) for t in texts]
+    missing = [i for i, vector in enumerate(results) if vector is None]
+
+    if missing:
+        vectors = _encode([texts[i] for i in missing])
+        if len(vectors) != len(missing):
+            raise RuntimeError(f"backend retornou {len(vectors)} vetores para {len(missing)} textos")
+        for i, vector in zip(missing, vectors):
+            results[i] = vector
+            embedding_cache.set(texts[i], vector)
+
+    return results
 
 def generate_embedding(text: str):
-    model = get_embedding_model()
-    return model.encode(text).tolist()
+    cached = embedding_cache.get(text)
+    if cached is not None:
+        return cached
+
+    if settings.EMBEDDING_MICROBATCH_ENABLED:
+        vector = _batcher.submit(text).result(timeout=settings.EMBEDDING_REQUEST_TIMEOUT)
+    else:
+        vector = _encode([text])[0]
+
+    embedding_cache.set(text, vector)
+    return vector
+
+
+class EmbeddingExecutor:
+    """
+    Pool de threads dedicado à inferência de embeddings.
+
+    Mantém o event loop do FastAPI livre enquanto o modelo roda; as
+    threads do pool alimentam o micro-batcher, então pedidos concorrentes
+    continuam sendo agrupados em lotes.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="embedding"
+                    )
+        return self._executor
+
+    async def run(self, fn, *args):
+        submitted = time.perf_counter()
+        with self._lock:
+            self.queued += 1
+
+        def job():
+            wait = time.perf_counter() - submitted
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), job)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "queue_depth": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "avg_wait_ms": round(self.total_wait / self.completed * 1000, 2) if self.completed else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2)
+        }
+
+
+_executor = EmbeddingExecutor(max_workers=settings.EMBEDDING_EXECUTOR_WORKERS)
+
+async def aembed(text: str) -> List[float]:
+    """Versão assíncrona de `generate_embedding` (não bloqueia o event loop)"""
+    return await _executor.run(generate_embedding, text)
+
+async def aembed_many(texts: List[str]) -> List[List[float]]:
+    """Versão assíncrona de `generate_embeddings`"""
+    return await _executor.run(generate_embeddings, list(texts))
+
+def shutdown_embedding_executor():
+    _executor.shutdown()
+
+def get_embedding_stats() -> dict:
+    """Métricas de embeddings (micro-batcher, executor e cache)"""
+    return {
+        "model": settings.EMBEDDING_MODEL,
+        "backend": settings.EMBEDDING_BACKEND,
+        "server": settings.EMBEDDING_SERVER_URL if isinstance(_backend, RemoteBackend) else None,
+        "batcher": _batcher.get_stats(),
+        "executor": _executor.get_stats(),
+        "cache": embedding_cache.get_stats()
+    }
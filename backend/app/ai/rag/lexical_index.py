@@ -0,0 +1,371 @@
+"""
+Índice lexical BM25 para busca híbrida
+
+Complementa a busca densa com termos exatos ("Portaria 8.031", códigos
+SIGEM, nomes de instituições). Tokenização em português com remoção de
+acentos, stopwords e stemming leve (plurais).
+
+Formato em LEXICAL_INDEX_PATH (segmento principal mapeado em memória):
+    terms.json       termo -> [offset, tamanho] nas listas de postings
+    postings.npy     int32 [n, 2] (posição do documento, frequência)
+    docs.jsonl       um documento por posição {id, length, payload}
+    meta.json        contagens e versão
+
+Documentos novos ficam num segmento delta em memória até `commit()`,
+que funde tudo (descartando removidos) num novo segmento principal.
+"""
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.config import settings
+from app.ai.rag.local_vectorstore import ScoredHit
+from app.ai.rag.result_cache import result_cache
+import numpy as np
+import unicodedata
+import threading
+import logging
+import math
+import json
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+STOPWORDS = {
+    "a", "ao", "aos", "as", "com", "como", "da", "das", "de", "do", "dos", "e", "em",
+    "entre", "era", "essa", "esse", "esta", "este", "eu", "foi", "ha", "isso", "ja",
+    "mais", "mas", "na", "nas", "nao", "no", "nos", "o", "os", "ou", "para", "pela",
+    "pelas", "pelo", "pelos", "por", "que", "se", "sem", "ser", "seu", "sua", "suas",
+    "seus", "sao", "so", "tambem", "um", "uma", "umas", "uns", "the", "of", "and",
+}
+
+_TOKEN_RE = re.compile(r"\d+(?:[./-]\d+)+|\w+")
+
+_PLURAL_RULES = (
+    ("oes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"),
+    ("ns", "m"), ("res", "r"), ("zes", "z"), ("ses", "s"),
+)
+
+
+def fold(text: str) -> str:
+    """Minúsculas e remoção de acentos"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def stem(token: str) -> str:
+    """Stemming leve: reduz plurais e advérbios em -mente"""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("mente") and len(token) > 7:
+        return token[:-5]
+    for suffix, replacement in _PLURAL_RULES:
+        if token.endswith(suffix):
+            return token[:-len(suffix)] + replacement
+    if token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_RE.findall(fold(text or "")):
+        if token[0].isdigit() and not token.isdigit():
+            # "8.031/2025" vira "8.031/2025", "8031" e "2025"
+            tokens.append(token)
+            parts = re.split(r"[/-]", token)
+            tokens.extend(p.replace(".", "") for p in parts if p)
+            continue
+        if len(token) < 2 or token in STOPWORDS:
+            continue
+        tokens.append(stem(token))
+    return tokens
+
+
+def _term_frequencies(text: str) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for token in tokenize(text):
+        counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+def _matches(payload: Dict, filters: Optional[Dict]) -> bool:
+    """Mesma semântica de filtros de vectorstore.build_payload_filter"""
+    if not filters:
+        return True
+
+    for key in ("approved", "field", "section", "year"):
+        expected = filters.get(key)
+        if expected is None:
+            continue
+        value = payload.get(key)
+        if isinstance(expected, (list, tuple, set)):
+            if value not in expected:
+                return False
+        elif value != expected:
+            return False
+
+    ranges = {
+        "year": (filters.get("year_from"), filters.get("year_to")),
+        "score": (filters.get("min_score"), filters.get("max_score")),
+    }
+    for key, (gte, lte) in ranges.items():
+        value = payload.get(key)
+        if gte is not None and (value is None or value < gte):
+            return False
+        if lte is not None and (value is None or value > lte):
+            return False
+    return True
+
+
+class LexicalIndex:
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._meta_mtime = None
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.terms: Dict[str, Tuple[int, int]] = {}
+        self.postings = np.zeros((0, 2), dtype=np.int32)
+        self.doc_ids: List = []
+        self.payloads: List[Dict] = []
+        self.lengths: List[int] = []
+        self.deleted: List[bool] = []
+        self.positions: Dict = {}
+        self.delta: Dict[str, Dict[int, int]] = {}
+        self.version = 0
+        self._total_length = 0
+        self._alive = 0
+
+    # ── Persistência ───────────────────────────────────────────────
+
+    @property
+    def _meta_file(self) -> Path:
+        return self.path / "meta.json"
+
+    def _load(self):
+        if not self._meta_file.exists():
+            return
+
+        meta = json.loads(self._meta_file.read_text())
+        self._meta_mtime = self._meta_file.stat().st_mtime
+        self.version = meta.get("version", 0)
+        self.terms = {t: tuple(v) for t, v in json.loads((self.path / "terms.json").read_text()).items()}
+        postings_file = self.path / "postings.npy"
+        if postings_file.exists() and postings_file.stat().st_size:
+            self.postings = np.load(postings_file, mmap_mode="r")
+
+        with open(self.path / "docs.jsonl", encoding="utf-8") as f:
+            for line in f:
+                self._append_doc(json.loads(line))
+
+    def _append_doc(self, row: Dict) -> int:
+        position = len(self.doc_ids)
+        self.doc_ids.append(row["id"])
+        self.payloads.append(row.get("payload", {}))
+        self.lengths.append(row["length"])
+        self.deleted.append(bool(row.get("deleted")))
+        if not row.get("deleted"):
+            self.positions[row["id"]] = position
+            self._total_length += row["length"]
+            self._alive += 1
+        return position
+
+    def _maybe_reload(self):
+        """Recarrega se outro processo (ex: importação) gravou o índice"""
+        try:
+            mtime = self._meta_file.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._meta_mtime and not self.delta:
+            with self._lock:
+                self._reset()
+                self._load()
+
+    def refresh(self):
+        """Relê o índice gravado por outro processo (sem escritas pendentes aqui)"""
+        self._maybe_reload()
+
+    def commit(self):
+        """Funde o segmento delta ao principal, compacta e grava em disco"""
+        with self._lock:
+            alive = [i for i, deleted in enumerate(self.deleted) if not deleted]
+            remap = {old: new for new, old in enumerate(alive)}
+
+            merged: Dict[str, List[Tuple[int, int]]] = {}
+            for term, (offset, length) in self.terms.items():
+                rows = self.postings[offset:offset + length]
+                merged[term] = [(remap[int(d)], int(tf)) for d, tf in rows if int(d) in remap]
+            for term, docs in self.delta.items():
+                merged.setdefault(term, []).extend(
+                    (remap[d], tf) for d, tf in docs.items() if d in remap
+                )
+
+            terms, rows = {}, []
+            for term in sorted(merged):
+                entries = merged[term]
+                if entries:
+                    terms[term] = (len(rows), len(entries))
+                    rows.extend(entries)
+
+            self.path.mkdir(parents=True, exist_ok=True)
+            postings = np.asarray(rows, dtype=np.int32).reshape(-1, 2)
+            tmp = self.path / "postings.tmp.npy"
+            np.save(tmp, postings)
+            os.replace(tmp, self.path / "postings.npy")
+
+            tmp = self.path / "terms.json.tmp"
+            tmp.write_text(json.dumps(terms, ensure_ascii=False))
+            os.replace(tmp, self.path / "terms.json")
+
+            tmp = self.path / "docs.jsonl.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for i in alive:
+                    row = {"id": self.doc_ids[i], "length": self.lengths[i], "payload": self.payloads[i]}
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            os.replace(tmp, self.path / "docs.jsonl")
+
+            version = self.version + 1
+            tmp = self.path / "meta.json.tmp"
+            tmp.write_text(json.dumps({"version": version, "docs": len(alive), "terms": len(terms)}))
+            os.replace(tmp, self._meta_file)
+
+            self._reset()
+            self._load()
+
+        # Buscas híbridas em cache dependem do índice lexical
+        result_cache.bump(settings.QDRANT_COLLECTION_NAME)
+
+    # ── Escrita ────────────────────────────────────────────────────
+
+    def remove_documents(self, ids: Iterable):
+        with self._lock:
+            for doc_id in ids:
+                position = self.positions.pop(doc_id, None)
+                if position is None:
+                    continue
+                self.deleted[position] = True
+                self._total_length -= self.lengths[position]
+                self._alive -= 1
+
+    def add_documents(self, docs: Iterable[Tuple]):
+        """Adiciona/substitui documentos: iterável de (id, texto, payload)"""
+        with self._lock:
+            for doc_id, text, payload in docs:
+                self.remove_documents([doc_id])
+                frequencies = _term_frequencies(text)
+                position = self._append_doc({
+                    "id": doc_id,
+                    "length": sum(frequencies.values()),
+                    "payload": payload or {}
+                })
+                for term, tf in frequencies.items():
+                    self.delta.setdefault(term, {})[position] = tf
+
+    # ── Busca ──────────────────────────────────────────────────────
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict] = None) -> List[ScoredHit]:
+        self._maybe_reload()
+        with self._lock:
+            if not self._alive:
+                return []
+
+            n_docs = len(self.doc_ids)
+            avg_length = self._total_length / self._alive
+            lengths = np.asarray(self.lengths, dtype=np.float32)
+            scores = np.zeros(n_docs, dtype=np.float32)
+
+            for term in set(tokenize(query)):
+                docs, tfs = [], []
+                if term in self.terms:
+                    offset, length = self.terms[term]
+                    rows = self.postings[offset:offset + length]
+                    docs.append(rows[:, 0])
+                    tfs.append(rows[:, 1])
+                if term in self.delta:
+                    docs.append(np.fromiter(self.delta[term].keys(), dtype=np.int32))
+                    tfs.append(np.fromiter(self.delta[term].values(), dtype=np.int32))
+                if not docs:
+                    continue
+
+                docs = np.concatenate(docs)
+                tfs = np.concatenate(tfs).astype(np.float32)
+                df = len(docs)
+                idf = math.log(1 + (self._alive - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[docs] / avg_length)
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+            candidates = np.flatnonzero(scores)
+            candidates = candidates[np.argsort(-scores[candidates])]
+
+            hits = []
+            for position in candidates:
+                if self.deleted[position] or not _matches(self.payloads[position], filters):
+                    continue
+                hits.append(ScoredHit(
+                    id=self.doc_ids[position],
+                    score=float(scores[position]),
+                    payload=self.payloads[position]
+                ))
+                if len(hits) >= limit:
+                    break
+            return hits
+
+    def __len__(self) -> int:
+        return self._alive
+
+
+def reciprocal_rank_fusion(rankings: List[List], key, k: int = 60) -> List[Tuple[float, object]]:
+    """
+    Funde listas ranqueadas: score(d) = Σ 1 / (k + posição).
+
+    Retorna (score_rrf, item) na ordem fundida; para itens presentes em
+    várias listas, mantém o item da primeira lista em que aparece. Dentro
+    de uma lista só conta a melhor posição de cada chave (vários trechos
+    do mesmo caso não somam), e a posição é a da chave entre as chaves
+    distintas da lista.
+    """
+    fused: Dict = {}
+    for ranking in rankings:
+        seen = set()
+        for item in ranking:
+            item_key = key(item)
+            if item_key in seen:
+                continue
+            seen.add(item_key)
+            rank = len(seen)
+            score, kept = fused.get(item_key, (0.0, item))
+            fused[item_key] = (score + 1.0 / (k + rank), kept)
+    return sorted(fused.values(), key=lambda entry: entry[0], reverse=True)
+
+
+_index: Optional[LexicalIndex] = None
+_index_lock = threading.Lock()
+
+def get_lexical_index() -> LexicalIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LexicalIndex(settings.LEXICAL_INDEX_PATH)
+    return _index
+
+def case_document(case) -> Tuple:
+    """(id, texto, payload) de um HistoricalCase para o índice lexical"""
+    text = " ".join(filter(None, [
+        case.project_title, case.institution_name, case.summary, case.full_text
+    ]))
+    payload = {
+        "title": case.project_title,
+        "institution": case.institution_name,
+        "field": case.field,
+        "year": case.year,
+        "approved": case.is_approved,
+        "score": case.score,
+        "text": (case.summary or case.full_text or "")[:500]
+    }
+    return case.id, text, payload
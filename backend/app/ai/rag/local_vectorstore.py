@@ -0,0 +1,446 @@
+"""
+Índice vetorial local em NumPy (alternativa ao Qdrant)
+
+Para testes, demos offline e bases pequenas (alguns milhares de
+trechos). Os vetores ficam numa matriz float32/float16 mapeada em
+memória; payloads numa tabela lateral compacta (JSONL + colunas numéricas
+para os filtros). A busca é um produto matricial + `argpartition`.
+
+Arquivos em LOCAL_VECTORSTORE_PATH/<coleção>/:
+    vectors.bin     matriz [capacidade x dimensão] normalizada
+    payloads.jsonl  log {"pos", "id", "payload"} / {"pos", "id", "deleted"}:
+                    cada escrita só acrescenta linhas (a última de cada
+                    posição vale); compactado quando o log passa do dobro
+                    das posições
+    meta.json       dimensão, dtype, contagem, capacidade, versão
+
+LOCAL_VECTORSTORE_PATH/aliases.json emula os aliases do Qdrant
+({alias: coleção}); um nome sem alias é a própria coleção.
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from app.config import settings
+import numpy as np
+import threading
+import logging
+import shutil
+import json
+import os
+
+logger = logging.getLogger(__name__)
+
+_UNKNOWN = -1
+
+
+@dataclass
+class ScoredHit:
+    """Mesmo formato usado pelos chamadores do `ScoredPoint` do Qdrant"""
+    id: Any
+    score: float
+    payload: Dict = field(default_factory=dict)
+    version: int = 0
+
+
+class LocalVectorIndex:
+    def __init__(self, path: str, dtype: str = "float32"):
+        self.path = Path(path)
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+        self._meta_mtime = None
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.dim = 0
+        self.count = 0
+        self.capacity = 0
+        self.version = 0
+        self.vectors = None
+        self.ids: List[Any] = []
+        self.payloads: List[Dict] = []
+        self.positions: Dict[Any, int] = {}
+        # Linhas ainda não gravadas no log e total de linhas no arquivo
+        self._pending: List[Dict] = []
+        self._log_lines = 0
+        self.alive = np.zeros(0, dtype=bool)
+        self.columns = {
+            "approved": np.zeros(0, dtype=np.int8),
+            "year": np.zeros(0, dtype=np.int32),
+            "score": np.zeros(0, dtype=np.int32),
+            "field": np.zeros(0, dtype=np.int32),
+            "section": np.zeros(0, dtype=np.int32),
+        }
+        # Códigos das colunas de texto (field, section)
+        self.field_codes: Dict[str, int] = {}
+
+    # ── Persistência ───────────────────────────────────────────────
+
+    @property
+    def _meta_file(self) -> Path:
+        return self.path / "meta.json"
+
+    def _load(self):
+        if not self._meta_file.exists():
+            return
+
+        meta = json.loads(self._meta_file.read_text())
+        self._meta_mtime = self._meta_file.stat().st_mtime
+        self.dim = meta["dim"]
+        self.dtype = np.dtype(meta["dtype"])
+        self.count = meta["count"]
+        self.capacity = meta["capacity"]
+        self.version = meta.get("version", 0)
+
+        if self.capacity:
+            self.vectors = np.memmap(
+                self.path / "vectors.bin", dtype=self.dtype, mode="r+",
+                shape=(self.capacity, self.dim)
+            )
+
+        self._grow_columns(self.capacity)
+        self.ids = [None] * self.count
+        self.payloads = [{} for _ in range(self.count)]
+        deleted = [True] * self.count
+        with open(self.path / "payloads.jsonl", encoding="utf-8") as f:
+            for line_number, line in enumerate(f):
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    break  # linha incompleta: outro processo ainda gravando
+                self._log_lines += 1
+                # Arquivos antigos: uma linha por posição, sem "pos"
+                position = row.get("pos", line_number)
+                if position >= self.count:
+                    continue
+                self.ids[position] = row["id"]
+                if "payload" in row:
+                    self.payloads[position] = row["payload"]
+                deleted[position] = bool(row.get("deleted"))
+
+        for position, point_id in enumerate(self.ids):
+            if deleted[position]:
+                continue
+            self.positions[point_id] = position
+            self.alive[position] = True
+            self._index_payload(position, self.payloads[position])
+
+    def _save(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        if self.vectors is not None:
+            self.vectors.flush()
+
+        if self._log_lines + len(self._pending) > max(2 * self.count, 1024):
+            self._compact_payloads()
+        elif self._pending:
+            with open(self.path / "payloads.jsonl", "a", encoding="utf-8") as f:
+                for row in self._pending:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self._log_lines += len(self._pending)
+        self._pending = []
+
+        self.version += 1
+        tmp = self.path / "meta.json.tmp"
+        tmp.write_text(json.dumps({
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "count": self.count,
+            "capacity": self.capacity,
+            "version": self.version
+        }))
+        os.replace(tmp, self._meta_file)
+        self._meta_mtime = self._meta_file.stat().st_mtime
+
+    def _compact_payloads(self):
+        """Reescreve o log com uma linha por posição"""
+        tmp = self.path / "payloads.jsonl.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for position, (point_id, payload) in enumerate(zip(self.ids, self.payloads)):
+                row = {"pos": position, "id": point_id, "payload": payload}
+                if not self.alive[position]:
+                    row["deleted"] = True
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path / "payloads.jsonl")
+        self._log_lines = self.count
+
+    def _maybe_reload(self):
+        """Recarrega se outro processo (ex: importação) gravou o índice"""
+        try:
+            mtime = self._meta_file.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._meta_mtime:
+            with self._lock:
+                self._reset()
+                self._load()
+
+    # ── Estrutura ──────────────────────────────────────────────────
+
+    def _grow_columns(self, capacity: int):
+        grow = capacity - len(self.alive)
+        if grow <= 0:
+            return
+        self.alive = np.concatenate([self.alive, np.zeros(grow, dtype=bool)])
+        for name, column in self.columns.items():
+            padding = np.full(grow, _UNKNOWN, dtype=column.dtype)
+            self.columns[name] = np.concatenate([column, padding])
+
+    def _ensure_capacity(self, needed: int):
+        if needed <= self.capacity:
+            return
+
+        capacity = max(needed, self.capacity * 2, 1024)
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.path / "vectors.bin.tmp"
+        grown = np.memmap(tmp_file, dtype=self.dtype, mode="w+", shape=(capacity, self.dim))
+        if self.vectors is not None and self.count:
+            grown[:self.count] = self.vectors[:self.count]
+        grown.flush()
+        del grown
+        os.replace(tmp_file, self.path / "vectors.bin")
+
+        self.vectors = np.memmap(
+            self.path / "vectors.bin", dtype=self.dtype, mode="r+", shape=(capacity, self.dim)
+        )
+        self.capacity = capacity
+        self._grow_columns(capacity)
+
+    def _index_payload(self, position: int, payload: Dict):
+        approved = payload.get("approved")
+        self.columns["approved"][position] = _UNKNOWN if approved is None else int(bool(approved))
+        for name in ("year", "score"):
+            value = payload.get(name)
+            self.columns[name][position] = _UNKNOWN if value is None else int(value)
+
+        for name in ("field", "section"):
+            value = payload.get(name)
+            if value is None:
+                self.columns[name][position] = _UNKNOWN
+            else:
+                self.columns[name][position] = self.field_codes.setdefault(value, len(self.field_codes))
+
+    # ── Escrita ────────────────────────────────────────────────────
+
+    def upsert(self, points: Iterable):
+        """Insere/substitui pontos (objetos com .id, .vector, .payload)"""
+        points = list(points)
+        if not points:
+            return
+
+        self._maybe_reload()
+        with self._lock:
+            if not self.dim:
+                self.dim = len(points[0].vector)
+
+            self._ensure_capacity(self.count + len(points))
+            for point in points:
+                vector = np.asarray(point.vector, dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                if norm:
+                    vector = vector / norm
+
+                position = self.positions.get(point.id)
+                if position is None:
+                    position = self.count
+                    self.count += 1
+                    self.ids.append(point.id)
+                    self.payloads.append({})
+                    self.positions[point.id] = position
+
+                self.vectors[position] = vector.astype(self.dtype)
+                self.payloads[position] = point.payload or {}
+                self.alive[position] = True
+                self._index_payload(position, self.payloads[position])
+                self._pending.append({"pos": position, "id": point.id,
+                                      "payload": self.payloads[position]})
+
+            self._save()
+
+    def delete(self, ids: Iterable):
+        self._maybe_reload()
+        with self._lock:
+            for point_id in ids:
+                position = self.positions.pop(point_id, None)
+                if position is not None:
+                    self.alive[position] = False
+                    self._pending.append({"pos": position, "id": point_id, "deleted": True})
+            self._save()
+
+    # ── Busca ──────────────────────────────────────────────────────
+
+    def _filter_mask(self, filters: Optional[Dict]) -> np.ndarray:
+        mask = self.alive[:self.count].copy()
+        if not filters:
+            return mask
+
+        approved = filters.get("approved")
+        if approved is not None:
+            mask &= self.columns["approved"][:self.count] == int(bool(approved))
+
+        for name in ("field", "section", "year"):
+            value = filters.get(name)
+            if value is None:
+                continue
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            if name != "year":
+                values = [self.field_codes.get(v, -2) for v in values]
+            mask &= np.isin(self.columns[name][:self.count], list(values))
+
+        ranges = {
+            "year": (filters.get("year_from"), filters.get("year_to")),
+            "score": (filters.get("min_score"), filters.get("max_score")),
+        }
+        for name, (gte, lte) in ranges.items():
+            column = self.columns[name][:self.count]
+            if gte is not None:
+                mask &= (column != _UNKNOWN) & (column >= gte)
+            if lte is not None:
+                mask &= (column != _UNKNOWN) & (column <= lte)
+
+        return mask
+
+    def search(self, query_vector, limit: int = 5, filters: Optional[Dict] = None) -> List[ScoredHit]:
+        self._maybe_reload()
+        with self._lock:
+            if not self.count:
+                return []
+
+            query = np.asarray(query_vector, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            if norm:
+                query = query / norm
+
+            scores = np.asarray(self.vectors[:self.count] @ query.astype(self.dtype), dtype=np.float32)
+            mask = self._filter_mask(filters)
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+
+            candidate_scores = scores[candidates]
+            k = min(limit, len(candidates))
+            top = np.argpartition(-candidate_scores, k - 1)[:k]
+            top = top[np.argsort(-candidate_scores[top])]
+
+            return [
+                ScoredHit(
+                    id=self.ids[candidates[i]],
+                    score=float(candidate_scores[i]),
+                    payload=self.payloads[candidates[i]]
+                )
+                for i in top
+            ]
+
+    def search_groups(self, query_vector, limit: int = 5, filters: Optional[Dict] = None,
+                      group_by: str = "case_id") -> List[ScoredHit]:
+        """
+        Melhor ponto de cada valor de `group_by`, até `limit` grupos
+        distintos (como o search_groups do Qdrant, pontos sem o campo ficam
+        de fora)
+        """
+        self._maybe_reload()
+        with self._lock:
+            if not self.count:
+                return []
+
+            query = np.asarray(query_vector, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            if norm:
+                query = query / norm
+
+            scores = np.asarray(self.vectors[:self.count] @ query.astype(self.dtype), dtype=np.float32)
+            candidates = np.flatnonzero(self._filter_mask(filters))
+
+            results, seen = [], set()
+            for i in candidates[np.argsort(-scores[candidates])]:
+                group = self.payloads[i].get(group_by)
+                if group is None or group in seen:
+                    continue
+                seen.add(group)
+                results.append(ScoredHit(id=self.ids[i], score=float(scores[i]), payload=self.payloads[i]))
+                if len(results) >= limit:
+                    break
+            return results
+
+    def __len__(self) -> int:
+        return int(self.alive[:self.count].sum())
+
+
+_indexes: Dict[str, LocalVectorIndex] = {}
+_indexes_lock = threading.Lock()
+_aliases: Dict[str, str] = {}
+_aliases_mtime = None
+
+def _aliases_file() -> Path:
+    return Path(settings.LOCAL_VECTORSTORE_PATH) / "aliases.json"
+
+def get_aliases() -> Dict[str, str]:
+    """Aliases atuais (relidos se outro processo trocou o arquivo)"""
+    global _aliases, _aliases_mtime
+    try:
+        mtime = _aliases_file().stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    with _indexes_lock:
+        if mtime != _aliases_mtime:
+            _aliases = json.loads(_aliases_file().read_text()) if mtime else {}
+            _aliases_mtime = mtime
+        return dict(_aliases)
+
+def set_alias(alias: str, collection_name: str):
+    """Aponta o alias para a coleção (troca atômica do arquivo)"""
+    aliases = get_aliases()
+    if collection_name == alias:
+        aliases.pop(alias, None)  # volta a ser a coleção física de mesmo nome
+    else:
+        aliases[alias] = collection_name
+    path = _aliases_file()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name("aliases.json.tmp")
+    tmp.write_text(json.dumps(aliases, indent=2))
+    os.replace(tmp, path)
+
+def resolve(name: str) -> str:
+    return get_aliases().get(name, name)
+
+def list_collections() -> List[str]:
+    root = Path(settings.LOCAL_VECTORSTORE_PATH)
+    if not root.exists():
+        return []
+    return sorted(p.name for p in root.iterdir() if (p / "meta.json").exists())
+
+def delete_collection(collection_name: str):
+    with _indexes_lock:
+        _indexes.pop(collection_name, None)
+    shutil.rmtree(Path(settings.LOCAL_VECTORSTORE_PATH) / collection_name, ignore_errors=True)
+
+def get_local_index(collection_name: str) -> LocalVectorIndex:
+    collection_name = resolve(collection_name)
+    with _indexes_lock:
+        if collection_name not in _indexes:
+            _indexes[collection_name] = LocalVectorIndex(
+                Path(settings.LOCAL_VECTORSTORE_PATH) / collection_name,
+                dtype=settings.LOCAL_VECTORSTORE_DTYPE
+            )
+        return _indexes[collection_name]
+
+def init_collection(collection_name: str) -> bool:
+    index = get_local_index(collection_name)
+    index.path.mkdir(parents=True, exist_ok=True)
+    # Sem meta.json o índice ainda não aparece em list_collections
+    if not index._meta_file.exists():
+        with index._lock:
+            index._save()
+    logger.info(f"✅ Índice local '{index.path.name}' pronto ({len(index)} pontos)")
+    return True
+
+def search_similar_cases(collection_name: str, query_vector, limit=5, filters: Optional[Dict] = None):
+    return get_local_index(collection_name).search(query_vector, limit=limit, filters=filters)
+
+def search_groups(collection_name: str, query_vector, limit=5, filters: Optional[Dict] = None, group_by: str = "case_id"):
+    return get_local_index(collection_name).search_groups(query_vector, limit=limit, filters=filters, group_by=group_by)
+
+def upsert_points(collection_name: str, points):
+    get_local_index(collection_name).upsert(points)
+
+def delete_points(collection_name: str, ids):
+    get_local_index(collection_name).delete(ids)
@@ -0,0 +1,170 @@
+"""
+Re-ranking de candidatos do RAG com cross-encoder multilíngue
+
+Busca-se mais candidatos no Qdrant (RERANK_CANDIDATES) e o cross-encoder
+reordena os pares (consulta, texto) antes de escolher os exemplos do
+prompt. Há um orçamento rígido de latência (RERANK_BUDGET_MS): se
+estourar, mantém-se a ordem original da busca. O modelo roda numa thread
+dedicada: se uma pontuação anterior (mesmo já abandonada por tempo) ainda
+estiver rodando, a nova chamada não espera nem empilha — mantém a ordem.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+from app.config import settings
+from app.utils.lru import LRUCache
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import hashlib
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name: str, batch_size: int, max_chars: int, cache_size: int):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_chars = max_chars
+        self.pair_scores = LRUCache(cache_size)
+        self._model = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._busy = threading.Event()
+        self.calls = 0
+        self.reranked = 0
+        self.fallbacks = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    logger.info(f"Carregando cross-encoder: {self.model_name}")
+                    self._model = CrossEncoder(self.model_name, max_length=256, device="cpu")
+        return self._model
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        """Pontua pares (consulta, texto), reaproveitando pares já vistos"""
+        query_key = _digest(query)
+        keys = [(query_key, _digest(text)) for text in texts]
+        scores: List[Optional[float]] = [self.pair_scores.get(key) for key in keys]
+
+        pending = [i for i, s in enumerate(scores) if s is None]
+        if pending:
+            pairs = [(query, texts[i][:self.max_chars]) for i in pending]
+            predicted = self._get_model().predict(
+                pairs, batch_size=self.batch_size, show_progress_bar=False
+            )
+            for i, value in zip(pending, predicted):
+                scores[i] = float(value)
+                self.pair_scores.set(keys[i], float(value))
+        return scores
+
+    def _record(self, seconds: float, outcome: str):
+        with self._lock:
+            self.calls += 1
+            self.total_seconds += seconds
+            if outcome == "reranked":
+                self.reranked += 1
+            elif outcome in ("budget", "busy"):
+                self.fallbacks += 1
+            else:
+                self.errors += 1
+
+    async def arerank(
+        self,
+        query: str,
+        candidates: List,
+        text_of: Callable,
+        top_k: int,
+        budget_ms: Optional[float] = None
+    ) -> Tuple[List, Dict]:
+        """
+        Reordena `candidates` pela pontuação do cross-encoder
+
+        Returns:
+            (top_k candidatos, info) — info["reranked"] é False quando o
+            orçamento estourou, o modelo estava ocupado ou houve erro (ordem
+            original mantida)
+        """
+        budget = (budget_ms if budget_ms is not None else settings.RERANK_BUDGET_MS) / 1000
+        texts = [text_of(c) or "" for c in candidates]
+        started = time.perf_counter()
+
+        with self._lock:
+            busy = self._busy.is_set()
+            self._busy.set()
+        if busy:
+            self._record(0.0, "busy")
+            logger.warning("⏱️  Re-ranking anterior ainda em execução; mantendo ordem original")
+            return candidates[:top_k], {"reranked": False, "reason": "busy"}
+
+        try:
+            future = self._executor.submit(self.score, query, texts)
+        except Exception:
+            self._busy.clear()
+            raise
+        # Só libera quando a thread terminar, mesmo que o await desista antes
+        future.add_done_callback(lambda _: self._busy.clear())
+
+        try:
+            scores = await asyncio.wait_for(asyncio.wrap_future(future), timeout=budget)
+        except asyncio.TimeoutError:
+            elapsed = time.perf_counter() - started
+            self._record(elapsed, "budget")
+            logger.warning(f"⏱️  Re-ranking excedeu {budget * 1000:.0f}ms; mantendo ordem original")
+            return candidates[:top_k], {"reranked": False, "reason": "budget"}
+        except Exception as e:
+            elapsed = time.perf_counter() - started
+            self._record(elapsed, "error")
+            logger.error(f"❌ Erro no re-ranking: {e}")
+            return candidates[:top_k], {"reranked": False, "reason": "error"}
+
+        elapsed = time.perf_counter() - started
+        self._record(elapsed, "reranked")
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+        return [candidates[i] for i in order[:top_k]], {
+            "reranked": True,
+            "latency_ms": int(elapsed * 1000),
+            "scores": [scores[i] for i in order[:top_k]]
+        }
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": settings.RERANK_ENABLED,
+            "model": self.model_name,
+            "calls": self.calls,
+            "reranked": self.reranked,
+            "budget_fallbacks": self.fallbacks,
+            "errors": self.errors,
+            "avg_latency_ms": round(self.total_seconds / self.calls * 1000, 2) if self.calls else 0.0,
+            "pair_cache": self.pair_scores.get_stats()
+        }
+
+
+reranker = CrossEncoderReranker(
+    model_name=settings.RERANK_MODEL,
+    batch_size=settings.RERANK_BATCH_SIZE,
+    max_chars=settings.RERANK_MAX_CHARS,
+    cache_size=settings.RERANK_CACHE_SIZE
+)
+
+
+async def rerank_if_enabled(query: str, candidates: List, text_of: Callable, top_k: int) -> List:
+    """Atalho para os agentes: sem RERANK_ENABLED, só corta em top_k"""
+    if not settings.RERANK_ENABLED or len(candidates) <= 1:
+        return candidates[:top_k]
+    ranked, _ = await reranker.arerank(query, candidates, text_of, top_k)
+    return ranked
+
+
+def candidate_limit(default: int) -> int:
+    """Quantos candidatos buscar no Qdrant antes do re-ranking"""
+    return max(default, settings.RERANK_CANDIDATES) if settings.RERANK_ENABLED else default
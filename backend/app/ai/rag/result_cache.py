@@ -0,0 +1,87 @@
+"""
+Cache de resultados de busca vetorial
+
+Chave = (coleção, versão da coleção, impressão digital do vetor, texto
+normalizado, filtros, limite). Qualquer escrita na coleção incrementa a
+versão (compartilhada via Redis), invalidando todas as entradas.
+"""
+from array import array
+from typing import Dict, List, Optional
+from app.config import settings
+from app.utils.lru import LRUCache
+from app.utils.version_counter import VersionCounter
+from app.ai.rag.embedding_cache import normalize_text
+import threading
+import hashlib
+import json
+
+
+def vector_fingerprint(query_vector) -> str:
+    values = query_vector if isinstance(query_vector, list) else query_vector.tolist()
+    return hashlib.sha1(array("f", values).tobytes()).hexdigest()
+
+
+class SearchResultCache:
+    def __init__(self, max_items: int, ttl_seconds: float):
+        self.cache = LRUCache(max_items, ttl_seconds)
+        self._versions: Dict[str, VersionCounter] = {}
+        self._lock = threading.Lock()
+        self.saved_seconds = 0.0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache.max_items > 0
+
+    def _counter(self, collection_name: str) -> VersionCounter:
+        with self._lock:
+            if collection_name not in self._versions:
+                self._versions[collection_name] = VersionCounter(f"collection:{collection_name}")
+            return self._versions[collection_name]
+
+    def version(self, collection_name: str) -> int:
+        return self._counter(collection_name).get()
+
+    def bump(self, collection_name: str):
+        """Chamado por todo caminho de escrita (upsert/delete/reindex)"""
+        self._counter(collection_name).bump()
+        with self._lock:
+            self.invalidations += 1
+
+    def key(self, collection_name: str, query_vector, query_text: Optional[str],
+            filters: Optional[Dict], limit: int) -> tuple:
+        return (
+            collection_name,
+            self.version(collection_name),
+            vector_fingerprint(query_vector),
+            normalize_text(query_text) if query_text else "",
+            json.dumps(filters or {}, sort_keys=True, default=str),
+            limit
+        )
+
+    def get(self, key: tuple) -> Optional[List]:
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        hits, latency = entry
+        with self._lock:
+            self.saved_seconds += latency
+        return hits
+
+    def set(self, key: tuple, hits: List, latency: float):
+        self.cache.set(key, (hits, latency))
+
+    def get_stats(self) -> dict:
+        stats = self.cache.get_stats()
+        stats.update({
+            "saved_latency_seconds": round(self.saved_seconds, 3),
+            "invalidations": self.invalidations,
+            "versions": {name: counter._cached for name, counter in self._versions.items()}
+        })
+        return stats
+
+
+result_cache = SearchResultCache(
+    max_items=settings.SEARCH_CACHE_SIZE,
+    ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS
+)
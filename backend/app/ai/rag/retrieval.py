@@ -0,0 +1,73 @@
+"""
+Recuperação em lote para vários campos de um anexo
+
+Um único lote de embeddings + uma única requisição `search_batch` ao
+Qdrant, em vez de um ciclo embed/busca por campo.
+"""
+from typing import Dict, List, Optional, Tuple
+from app.ai.rag.embeddings import aembed_many
+from app.ai.rag.sections import section_for_field
+from app.ai.rag.vectorstore import asearch_batch, asearch_similar_cases
+
+
+def hit_to_dict(hit) -> Dict:
+    payload = hit.payload or {}
+    return {
+        "id": str(payload.get("case_id", hit.id)),
+        "score": float(hit.score),
+        "title": payload.get("title", ""),
+        "institution": payload.get("institution", ""),
+        "approved": payload.get("approved"),
+        "section": payload.get("section"),
+        "text": payload.get("text", "")
+    }
+
+
+async def retrieve_fields(
+    queries: List[Tuple[str, str]],
+    limit: int = 3,
+    filters: Optional[Dict] = None
+) -> Dict[str, List]:
+    """
+    Busca casos para N pares (campo, consulta) de uma vez
+
+    Returns:
+        {campo: [hits]} na ordem de relevância
+    """
+    if not queries:
+        return {}
+
+    texts = [query for _, query in queries]
+    vectors = await aembed_many(texts)
+    results = await asearch_batch(vectors, limit=limit, filters=filters, query_texts=texts)
+
+    return {field_name: hits for (field_name, _), hits in zip(queries, results)}
+
+
+async def retrieve_section_examples(
+    field_name: str,
+    query: str,
+    limit: int = 3,
+    filters: Optional[Dict] = None
+) -> List[Dict]:
+    """
+    Exemplos de projetos aprovados só da seção do campo (um por caso), no
+    formato dos casos do IntelligentTextAgent: `metadata[field_name]`
+    traz o texto da seção.
+    """
+    section = section_for_field(field_name)
+    if section is None:
+        return []
+
+    vector = (await aembed_many([query]))[0]
+    # Sem fusão lexical: o índice BM25 é por caso, não por seção
+    hits = await asearch_similar_cases(
+        vector, limit=limit, filters=dict(filters or {}, section=section), group_by_case=True
+    )
+
+    cases = []
+    for hit in hits:
+        case = hit_to_dict(hit)
+        case["metadata"] = {field_name: case["text"]}
+        cases.append(case)
+    return cases
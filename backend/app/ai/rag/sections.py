@@ -0,0 +1,112 @@
+"""
+Seções do formulário PRONAS/PCD nos projetos aprovados
+
+Os anexos seguem o roteiro do Ministério ("b) Apresentar a justificativa
+e aplicabilidade do projeto", "Objetivo Geral:", "META DE ATENDIMENTO..."),
+então um título de seção é reconhecido por palavras-chave numa linha que:
+    - começa com marcador de item (a), 1.2, A.1., iv.) e cita a seção
+    - está toda em maiúsculas e é curta
+    - começa com a palavra-chave seguida de ":" (conteúdo na mesma linha)
+
+O texto de cada seção vai até o próximo título. Cada seção vira um vetor
+próprio com `section` no payload, e a geração de um campo busca só
+exemplos daquela seção.
+"""
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.ai.rag.lexical_index import fold
+import re
+
+# seção → palavras-chave (texto sem acentos, minúsculo)
+SECTIONS = {
+    "apresentacao": r"apresentacao d[ao] (instituicao|entidade|proponente)|historico d[ao] (instituicao|entidade)",
+    "justificativa": r"justificativa",
+    "objetivos": r"objetivos?( gera(l|is)| especificos?| do projeto)?\b",
+    "publico_alvo": r"publico[ -]alvo|populacao (beneficiada|atendida|alvo)|beneficiarios",
+    "metodologia": (
+        r"metodologia|estrategias? de (acao|execucao|intervencao)|(descricao|detalhamento) das acoes"
+        r"|acoes (a serem )?desenvolvidas|plano de (acao|trabalho)"
+    ),
+    "metas": r"\bmetas?\b|resultados esperados|indicadores",
+    "orcamento": (
+        r"orcamento|planilha (de despesas|orcamentaria)|estimativa orcamentaria"
+        r"|custos? (diretos|indiretos|do projeto)|previsao (de despesas|orcamentaria)"
+    ),
+    "cronograma": r"cronograma",
+    "monitoramento": r"monitoramento|(avaliacao|acompanhamento) (do projeto|da execucao)",
+    "disseminacao": r"disseminacao",
+}
+
+_PATTERNS = {name: re.compile(pattern) for name, pattern in SECTIONS.items()}
+_MARKER = re.compile(r"^(?:[a-z]{1,2}[.)]|[a-z]\.\d+\.?|\d+(?:\.\d+)*[.)]?|[ivx]+[.)])\s+")
+_SPACES = re.compile(r"\s+")
+
+
+def _first_section(text: str, within: int) -> Optional[str]:
+    """Seção cuja palavra-chave aparece primeiro nos `within` primeiros caracteres"""
+    found = [
+        (match.start(), name)
+        for name, pattern in _PATTERNS.items()
+        for match in [pattern.search(text[:within])] if match
+    ]
+    return min(found)[1] if found else None
+
+
+def _heading(line: str) -> Optional[Tuple[str, str]]:
+    """(seção, conteúdo na mesma linha) se a linha for um título"""
+    folded = fold(line)
+    marker = _MARKER.match(folded)
+    if marker and len(folded) <= 200:
+        section = _first_section(folded[marker.end():], 60)
+        if section:
+            # Enunciado do roteiro ("b) Apresentar a justificativa..."): descartado
+            _, _, inline = line.partition(":")
+            return section, inline.strip()
+
+    letters = [c for c in line if c.isalpha()]
+    if letters and len(line) <= 80 and all(c.isupper() for c in letters):
+        section = _first_section(folded, 80)
+        if section:
+            _, _, inline = line.partition(":")
+            return section, inline.strip()
+
+    label, colon, inline = folded.partition(":")
+    if colon and len(label) <= 40:
+        section = _first_section(label, 40)
+        if section and _PATTERNS[section].match(label.strip()):
+            return section, line.partition(":")[2].strip()
+    return None
+
+
+def extract_sections(text: str) -> Dict[str, str]:
+    """Texto de cada seção reconhecida (trechos da mesma seção são unidos)"""
+    parts: Dict[str, List[str]] = {}
+    current: Optional[List[str]] = None
+
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        heading = _heading(line)
+        if heading:
+            section, inline = heading
+            current = parts.setdefault(section, [])
+            if inline:
+                current.append(inline)
+        elif current is not None:
+            current.append(line)
+
+    sections = {}
+    for section, lines in parts.items():
+        body = _SPACES.sub(" ", " ".join(lines)).strip()
+        if len(body) >= settings.SECTION_MIN_CHARS:
+            sections[section] = body[:settings.SECTION_MAX_CHARS]
+    return sections
+
+
+def section_for_field(field_name: str) -> Optional[str]:
+    """Seção correspondente a um campo do formulário (ex: objetivo_geral → objetivos)"""
+    name = fold(field_name).replace("_", " ").replace("-", " ")
+    if name in SECTIONS:
+        return name
+    return _first_section(name, len(name))
@@ -1,59 +1,278 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct,
+    Filter, FieldCondition, MatchValue, MatchAny, Range, PayloadSchemaType, SearchRequest,
+    CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
+)
+from typing import Dict, List, Optional
 from app.config import settings
+from app.ai.rag import local_vectorstore
+from app.ai.rag.local_vectorstore import ScoredHit
+from app.ai.rag.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from app.ai.rag.result_cache import result_cache
+import threading
 import logging
+import httpx
+import time
 
 logger = logging.getLogger(__name__)
 
-# Nome da coleção
-COLLECTION_NAME = settings.QDRANT_COLLECTION_NAME if hasattr(settings, 'QDRANT_COLLECTION_NAME') else "pronas_cases"
+# Nome lido pelas buscas: um alias que aponta para a coleção versionada
+# ativa (<nome>_v<data>); a reindexação troca o alias sem parar as buscas
+COLLECTION_NAME = settings.QDRANT_COLLECTION_NAME
+
+def _use_local() -> bool:
+    """VECTOR_STORE_BACKEND=local usa o índice NumPy em vez do Qdrant"""
+    return settings.VECTOR_STORE_BACKEND == "local"
+
+# Campos de payload gravados na importação e indexados para filtros
+PAYLOAD_INDEXES = {
+    "approved": PayloadSchemaType.BOOL,
+    "case_id": PayloadSchemaType.INTEGER,
+    "field": PayloadSchemaType.KEYWORD,
+    "section": PayloadSchemaType.KEYWORD,
+    "score": PayloadSchemaType.INTEGER,
+    "year": PayloadSchemaType.INTEGER,
+}
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+def _client_kwargs() -> dict:
+    return {
+        "url": settings.QDRANT_URL,
+        "api_key": settings.QDRANT_API_KEY or None,
+        "timeout": settings.QDRANT_TIMEOUT,
+        "prefer_grpc": settings.QDRANT_PREFER_GRPC,
+        "limits": httpx.Limits(
+            max_connections=settings.QDRANT_POOL_SIZE,
+            max_keepalive_connections=settings.QDRANT_POOL_SIZE
+        )
+    }
 
 def get_qdrant_client():
-    """Retorna cliente Qdrant"""
-    return QdrantClient(
-        url=settings.QDRANT_URL,
-        api_key=settings.QDRANT_API_KEY if hasattr(settings, 'QDRANT_API_KEY') else None,
-        timeout=30
-    )
+    """Retorna o cliente Qdrant compartilhado (conexões reaproveitadas)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = QdrantClient(**_client_kwargs())
+    return _client
+
+def get_async_qdrant_client():
+    """Retorna o cliente Qdrant assíncrono compartilhado (rotas async)"""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncQdrantClient(**_client_kwargs())
+    return _async_client
+
+async def close_qdrant_clients():
+    """Fecha os clientes compartilhados (shutdown da aplicação)"""
+    global _client, _async_client
+    with _client_lock:
+        client, _client = _client, None
+        async_client, _async_client = _async_client, None
+
+    try:
+        if async_client is not None:
+            await async_client.close()
+        if client is not None:
+            client.close()
+    except Exception as e:
+        logger.warning(f"⚠️  Erro ao fechar cliente Qdrant: {e}")
 
 # Cliente global
 qdrant_client = get_qdrant_client()
 
-def init_collection():
-    """Inicializa coleção no Qdrant"""
+def ensure_payload_indexes(client=None, collection_name: str = COLLECTION_NAME):
+    """Cria (idempotente) os índices de payload usados pelos filtros"""
+    client = client or get_qdrant_client()
+    existing = client.get_collection(collection_name).payload_schema or {}
+    for field_name, schema in PAYLOAD_INDEXES.items():
+        if field_name in existing:
+            continue
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=schema
+        )
+        logger.info(f"✅ Índice de payload '{field_name}' criado")
+
+def new_collection_name(alias: str = COLLECTION_NAME) -> str:
+    """Nome físico de uma nova versão da coleção"""
+    return f"{alias}_v{time.strftime('%Y%m%d%H%M%S')}"
+
+def resolve_collection(name: str = COLLECTION_NAME) -> Optional[str]:
+    """Coleção física por trás do alias (o próprio nome se não for alias; None se não existir)"""
+    if _use_local():
+        target = local_vectorstore.resolve(name)
+        return target if target in local_vectorstore.list_collections() else None
+
+    client = get_qdrant_client()
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == name:
+            return alias.collection_name
     try:
-        client = get_qdrant_client()
-        
-        # Tentar pegar coleção existente
-        try:
-            client.get_collection(COLLECTION_NAME)
-            logger.info(f"✅ Coleção '{COLLECTION_NAME}' já existe")
-            return True
-        except:
-            pass
-        
-        # Criar nova coleção
-        client.create_collection(
-            collection_name=COLLECTION_NAME,
-            vectors_config=VectorParams(
-                size=768,  # Dimensão do embedding do Gemini
-                distance=Distance.COSINE
-            )
+        client.get_collection(name)
+        return name
+    except Exception:
+        return None
+
+def list_collections(alias: str = COLLECTION_NAME) -> List[str]:
+    """Coleções físicas da família do alias (versões e a coleção legada)"""
+    if _use_local():
+        names = local_vectorstore.list_collections()
+    else:
+        names = [c.name for c in get_qdrant_client().get_collections().collections]
+    return sorted(n for n in names if n == alias or n.startswith(f"{alias}_v"))
+
+def count_points(collection_name: str = COLLECTION_NAME) -> int:
+    if _use_local():
+        return len(local_vectorstore.get_local_index(collection_name))
+    return get_qdrant_client().count(collection_name=collection_name, exact=True).count
+
+def create_collection(collection_name: str, dimension: Optional[int] = None):
+    """Cria a coleção física com a dimensão do modelo de embeddings atual"""
+    if _use_local():
+        return local_vectorstore.init_collection(collection_name)
+
+    from app.ai.rag.embeddings import get_embedding_dimension
+
+    client = get_qdrant_client()
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=VectorParams(
+            size=dimension or get_embedding_dimension(),
+            distance=Distance.COSINE
         )
-        logger.info(f"✅ Coleção '{COLLECTION_NAME}' criada")
+    )
+    logger.info(f"✅ Coleção '{collection_name}' criada")
+    ensure_payload_indexes(client, collection_name)
+    return True
+
+def switch_alias(collection_name: str, alias: str = COLLECTION_NAME) -> Optional[str]:
+    """
+    Aponta o alias para `collection_name` numa única operação e retorna a
+    coleção anterior. Invalida o cache de buscas.
+    """
+    previous = resolve_collection(alias)
+    if _use_local():
+        local_vectorstore.set_alias(alias, collection_name)
+    else:
+        if previous == alias:
+            raise RuntimeError(
+                f"'{alias}' é uma coleção (legada), não um alias: remova-a com "
+                f"drop_legacy antes da primeira troca"
+            )
+        operations = [CreateAliasOperation(create_alias=CreateAlias(
+            collection_name=collection_name, alias_name=alias
+        ))]
+        if previous is not None:
+            operations.insert(0, DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+        get_qdrant_client().update_collection_aliases(change_aliases_operations=operations)
+
+    result_cache.bump(alias)
+    logger.info(f"🔀 Alias '{alias}': {previous} → {collection_name}")
+    return previous
+
+def delete_collection(collection_name: str):
+    if _use_local():
+        local_vectorstore.delete_collection(collection_name)
+    else:
+        get_qdrant_client().delete_collection(collection_name)
+    result_cache.bump(collection_name)
+    logger.info(f"🗑️  Coleção '{collection_name}' removida")
+
+def init_collection(collection_name: str = COLLECTION_NAME):
+    """
+    Garante que a coleção exista. Para o alias COLLECTION_NAME, cria a
+    primeira versão e aponta o alias para ela.
+    """
+    try:
+        if resolve_collection(collection_name) is not None:
+            if not _use_local():
+                ensure_payload_indexes(collection_name=resolve_collection(collection_name))
+            return True
+
+        if collection_name != COLLECTION_NAME:
+            return create_collection(collection_name)
+
+        version = new_collection_name(collection_name)
+        create_collection(version)
+        switch_alias(version, collection_name)
         return True
-        
+
     except Exception as e:
         logger.error(f"❌ Erro ao inicializar Qdrant: {e}")
         return False
 
-def search_similar_cases(query_vector, limit=5):
-    """Busca casos similares no Qdrant"""
+def _as_list(query_vector):
+    return query_vector if isinstance(query_vector, list) else query_vector.tolist()
+
+def build_payload_filter(filters: Optional[Dict]) -> Optional[Filter]:
+    """
+    Converte filtros simples em condições do Qdrant
+
+    Chaves aceitas: approved (bool), field/section (str ou lista), year
+    (int ou lista), year_from/year_to, min_score/max_score.
+    """
+    if not filters:
+        return None
+
+    must = []
+    for key in ("approved", "field", "section", "year"):
+        value = filters.get(key)
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            must.append(FieldCondition(key=key, match=MatchAny(any=list(value))))
+        else:
+            must.append(FieldCondition(key=key, match=MatchValue(value=value)))
+
+    ranges = {
+        "year": (filters.get("year_from"), filters.get("year_to")),
+        "score": (filters.get("min_score"), filters.get("max_score")),
+    }
+    for key, (gte, lte) in ranges.items():
+        if gte is not None or lte is not None:
+            must.append(FieldCondition(key=key, range=Range(gte=gte, lte=lte)))
+
+    return Filter(must=must) if must else None
+
+def _dense_search(query_vector, limit, filters, collection_name: str = COLLECTION_NAME):
+    if _use_local():
+        return local_vectorstore.search_similar_cases(collection_name, query_vector, limit, filters)
+
     try:
         client = get_qdrant_client()
         results = client.search(
+            collection_name=collection_name,
+            query_vector=_as_list(query_vector),
+            query_filter=build_payload_filter(filters),
+            limit=limit
+        )
+        return results
+    except Exception as e:
+        logger.error(f"Erro na busca: {e}")
+        return []
+
+def search_collection(collection_name: str, query_vector, limit=5, filters: Optional[Dict] = None):
+    """Só a busca densa numa coleção específica (sem cache nem fusão lexical)"""
+    return _dense_search(query_vector, limit, filters, collection_name=collection_name)
+
+async def _adense_search(query_vector, limit, filters):
+    if _use_local():
+        return local_vectorstore.search_similar_cases(COLLECTION_NAME, query_vector, limit, filters)
+
+    try:
+        client = get_async_qdrant_client()
+        results = await client.search(
             collection_name=COLLECTION_NAME,
-            query_vector=query_vector if isinstance(query_vector, list) else query_vector.tolist(),
+            query_vector=_as_list(query_vector),
+            query_filter=build_payload_filter(filters),
             limit=limit
         )
         return results
@@ -61,11 +280,220 @@ def search_similar_cases(query_vector, limit=5):
         logger.error(f"Erro na busca: {e}")
         return []
 
+async def _adense_search_groups(query_vector, limit, filters):
+    """Melhor trecho de cada caso (group_by case_id), até `limit` casos distintos"""
+    if _use_local():
+        return local_vectorstore.search_groups(COLLECTION_NAME, query_vector, limit, filters, group_by="case_id")
+
+    try:
+        client = get_async_qdrant_client()
+        result = await client.search_groups(
+            collection_name=COLLECTION_NAME,
+            query_vector=_as_list(query_vector),
+            query_filter=build_payload_filter(filters),
+            group_by="case_id",
+            limit=limit,
+            group_size=1
+        )
+        return [group.hits[0] for group in result.groups if group.hits]
+    except Exception as e:
+        logger.error(f"Erro na busca agrupada: {e}")
+        return []
+
+def _use_hybrid(query_text: Optional[str]) -> bool:
+    return bool(query_text) and settings.HYBRID_SEARCH_ENABLED
+
+def _candidate_limit(limit: int, query_text: Optional[str]) -> int:
+    return max(limit, settings.HYBRID_CANDIDATES) if _use_hybrid(query_text) else limit
+
+def _case_key(hit):
+    """Pontos de trechos carregam case_id; pontos antigos usam o próprio id"""
+    return (hit.payload or {}).get("case_id", hit.id)
+
+def _fuse_with_lexical(dense_hits, query_text: str, limit: int, filters: Optional[Dict]):
+    """
+    Funde resultados densos e BM25 por reciprocal rank fusion.
+
+    A ordem vem do RRF; hits densos mantêm a similaridade de cosseno em
+    `score`, hits só lexicais chegam com o BM25 normalizado pelo melhor
+    BM25 da consulta (0..1).
+    """
+    try:
+        lexical_hits = get_lexical_index().search(
+            query_text, limit=settings.HYBRID_CANDIDATES, filters=filters
+        )
+    except Exception as e:
+        logger.warning(f"⚠️  Busca lexical falhou: {e}")
+        lexical_hits = []
+
+    if not lexical_hits:
+        return dense_hits[:limit]
+
+    dense_keys = {_case_key(hit) for hit in dense_hits}
+    fused = reciprocal_rank_fusion(
+        [dense_hits, lexical_hits], key=_case_key, k=settings.HYBRID_RRF_K
+    )
+
+    top_bm25 = max(hit.score for hit in lexical_hits) or 1.0
+    results = []
+    for _, hit in fused[:limit]:
+        if _case_key(hit) not in dense_keys:
+            hit = ScoredHit(id=hit.id, score=hit.score / top_bm25, payload=hit.payload)
+        results.append(hit)
+    return results
+
+def _cache_key(query_vector, limit, filters, query_text, group_by_case: bool = False):
+    if not result_cache.enabled:
+        return None
+    if group_by_case:
+        filters = dict(filters or {}, group_by="case_id")
+    return result_cache.key(
+        COLLECTION_NAME, query_vector, query_text if _use_hybrid(query_text) else None, filters, limit
+    )
+
+def search_similar_cases(query_vector, limit=5, filters: Optional[Dict] = None, query_text: Optional[str] = None):
+    """
+    Busca casos similares no Qdrant (filtros aplicados no servidor)
+
+    Com `query_text` (e HYBRID_SEARCH_ENABLED), funde o resultado denso
+    com o índice lexical BM25. Resultados ficam no cache até a próxima
+    escrita na coleção.
+    """
+    key = _cache_key(query_vector, limit, filters, query_text)
+    if key is not None:
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+
+    started = time.perf_counter()
+    hits = _dense_search(query_vector, _candidate_limit(limit, query_text), filters)
+    if _use_hybrid(query_text):
+        hits = _fuse_with_lexical(hits, query_text, limit, filters)
+
+    if key is not None and hits:
+        result_cache.set(key, hits, time.perf_counter() - started)
+    return hits
+
+async def asearch_similar_cases(query_vector, limit=5, filters: Optional[Dict] = None,
+                                query_text: Optional[str] = None, group_by_case: bool = False):
+    """
+    Versão assíncrona de `search_similar_cases`
+
+    Com `group_by_case`, a busca densa devolve só o melhor trecho de cada
+    caso, então `limit` resultados são `limit` casos distintos.
+    """
+    key = _cache_key(query_vector, limit, filters, query_text, group_by_case)
+    if key is not None:
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+
+    started = time.perf_counter()
+    dense_search = _adense_search_groups if group_by_case else _adense_search
+    hits = await dense_search(query_vector, _candidate_limit(limit, query_text), filters)
+    if _use_hybrid(query_text):
+        hits = _fuse_with_lexical(hits, query_text, limit, filters)
+
+    if key is not None and hits:
+        result_cache.set(key, hits, time.perf_counter() - started)
+    return hits
+
+def _batch_requests(query_vectors, limit, filters):
+    query_filter = build_payload_filter(filters)
+    return [
+        SearchRequest(vector=_as_list(v), filter=query_filter, limit=limit, with_payload=True)
+        for v in query_vectors
+    ]
+
+async def asearch_batch(
+    query_vectors: List,
+    limit=5,
+    filters: Optional[Dict] = None,
+    query_texts: Optional[List[str]] = None
+) -> List[List]:
+    """
+    Várias buscas em uma única requisição ao Qdrant (`search_batch`)
+
+    Retorna uma lista de resultados por vetor, na mesma ordem. Com
+    `query_texts`, cada resultado é fundido com o índice lexical.
+    """
+    if not query_vectors:
+        return []
+
+    texts = query_texts or [None] * len(query_vectors)
+    keys = [_cache_key(v, limit, filters, t) for v, t in zip(query_vectors, texts)]
+    results = [result_cache.get(k) if k is not None else None for k in keys]
+    pending = [i for i, hits in enumerate(results) if hits is None]
+    if not pending:
+        return results
+
+    started = time.perf_counter()
+    candidate_limit = max(_candidate_limit(limit, texts[i]) for i in pending)
+
+    if _use_local():
+        batches = [
+            local_vectorstore.search_similar_cases(COLLECTION_NAME, query_vectors[i], candidate_limit, filters)
+            for i in pending
+        ]
+    else:
+        try:
+            batches = await get_async_qdrant_client().search_batch(
+                collection_name=COLLECTION_NAME,
+                requests=_batch_requests([query_vectors[i] for i in pending], candidate_limit, filters)
+            )
+        except Exception as e:
+            logger.error(f"Erro na busca em lote: {e}")
+            batches = [[] for _ in pending]
+
+    latency = (time.perf_counter() - started) / len(pending)
+    for i, hits in zip(pending, batches):
+        text = texts[i]
+        hits = _fuse_with_lexical(hits, text, limit, filters) if _use_hybrid(text) else hits[:limit]
+        if keys[i] is not None and hits:
+            result_cache.set(keys[i], hits, latency)
+        results[i] = hits
+
+    return results
+
+def upsert_points(points: List[PointStruct], collection_name: str = COLLECTION_NAME):
+    """Insere/atualiza pontos no backend vetorial configurado"""
+    if _use_local():
+        local_vectorstore.upsert_points(collection_name, points)
+    else:
+        get_qdrant_client().upsert(collection_name=collection_name, points=points)
+    result_cache.bump(collection_name)
+
+def delete_points(ids: List, collection_name: str = COLLECTION_NAME):
+    """Remove pontos pelo id no backend vetorial configurado"""
+    if not ids:
+        return
+    if _use_local():
+        local_vectorstore.delete_points(collection_name, ids)
+    else:
+        get_qdrant_client().delete(collection_name=collection_name, points_selector=list(ids))
+    result_cache.bump(collection_name)
+
 # Exportar tudo
 __all__ = [
     'qdrant_client',
-    'get_qdrant_client', 
-    'COLLECTION_NAME', 
-    'init_collection', 
-    'search_similar_cases'
+    'get_qdrant_client',
+    'get_async_qdrant_client',
+    'close_qdrant_clients',
+    'COLLECTION_NAME',
+    'init_collection',
+    'new_collection_name',
+    'resolve_collection',
+    'list_collections',
+    'count_points',
+    'create_collection',
+    'switch_alias',
+    'delete_collection',
+    'ensure_payload_indexes',
+    'build_payload_filter',
+    'search_collection',
+    'search_similar_cases',
+    'asearch_similar_cases',
+    'asearch_batch',
+    'upsert_points',
+    'delete_points'
 ]
@@ -1,10 +1,17 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import Optional, Dict, List
 import logging
+import json
 from datetime import datetime
 from pydantic import BaseModel
 
 from app.ai.agents.intelligent_text_agent import IntelligentTextAgent
+from app.ai.agents.response_cache import generation_cache
+from app.ai.rag.embeddings import get_embedding_stats
+from app.ai.rag.retrieval import retrieve_fields, retrieve_section_examples, hit_to_dict
+from app.ai.rag.result_cache import result_cache
+from app.ai.rag.reranker import reranker, candidate_limit
 
 router = APIRouter()
 text_agent = IntelligentTextAgent()
@@ -18,6 +25,16 @@ class GenerateFieldRequest(BaseModel):
     field_name: str
     project_context: Dict
     max_length: Optional[int] = 1500
+    no_cache: Optional[bool] = False  # força nova geração (e atualiza o cache)
+
+class FieldQuery(BaseModel):
+    field_name: str
+    query: str
+
+class BatchRetrieveRequest(BaseModel):
+    queries: List[FieldQuery]
+    limit: Optional[int] = 3
+    only_approved: Optional[bool] = False
 
 class ProjectContextSimple(BaseModel):
     titulo: str
@@ -29,6 +46,24 @@ class ProjectContextSimple(BaseModel):
 # ENDPOINTS
 # ============================================================================
 
+async def _section_examples(request: GenerateFieldRequest) -> List[Dict]:
+    """
+    Exemplos da mesma seção em projetos aprovados (vazio se o campo não
+    corresponde a uma seção ou a busca falhar)
+    """
+    context = request.project_context
+    query = " ".join(
+        str(v) for v in (request.field_name, context.get("titulo"), context.get("tipo"), context.get("publico_alvo")) if v
+    )
+    try:
+        return await retrieve_section_examples(
+            request.field_name, query, limit=candidate_limit(3), filters={"approved": True}
+        )
+    except Exception as e:
+        logger.warning(f"⚠️  Busca de exemplos falhou: {e}")
+        return []
+
+
 @router.post("/generate-field-simple")
 async def generate_field_simple(request: GenerateFieldRequest):
     """
@@ -44,21 +79,22 @@ async def generate_field_simple(request: GenerateFieldRequest):
             "tipo": "Tipo do projeto",
             "publico_alvo": "Público alvo"
         },
-        "max_length": 1500
+        "max_length": 1500,
+        "no_cache": false
     }
     """
     try:
         logger.info(f"📝 Gerando campo '{request.field_name}' (modo simples)")
         
-        # Casos similares vazios por enquanto (RAG será integrado depois)
-        similar_cases = []
+        similar_cases = await _section_examples(request)
         
         # Gerar texto contextualizado
         result = await text_agent.generate_contextual_text(
             field_name=request.field_name,
             project_context=request.project_context,
             similar_cases=similar_cases,
-            max_length=request.max_length
+            max_length=request.max_length,
+            use_cache=not request.no_cache
         )
         
         logger.info(f"✅ Geração concluída: {result['provider']} | {result.get('latency_ms', 0)}ms")
@@ -69,8 +105,94 @@ async def generate_field_simple(request: GenerateFieldRequest):
         logger.error(f"❌ Erro na geração: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erro ao gerar conteúdo: {str(e)}")
 
+@router.post("/generate-field-stream")
+async def generate_field_stream(request: GenerateFieldRequest):
+    """
+    Versão em streaming de /generate-field-simple (Server-Sent Events):
+    o texto chega conforme o provider gera.
+    
+    Eventos:
+        token   {"text": "..."}        trecho a acrescentar
+        reset   {"provider", "error"}  provider falhou no meio; descarte o
+                                       texto recebido (o próximo recomeça)
+        done    {"provider", "confidence", "references", "latency_ms", "ttft_ms"}
+        error   {"detail": "..."}
+    """
+    logger.info(f"📝 Gerando campo '{request.field_name}' (streaming)")
+    similar_cases = await _section_examples(request)
+    
+    async def events():
+        try:
+            async for event in text_agent.stream_contextual_text(
+                field_name=request.field_name,
+                project_context=request.project_context,
+                similar_cases=similar_cases,
+                max_length=request.max_length,
+                use_cache=not request.no_cache
+            ):
+                if event["event"] == "done":
+                    logger.info(
+                        f"✅ Geração concluída: {event['data']['provider']} | {event['data']['latency_ms']}ms "
+                        f"(primeiro trecho em {event['data']['ttft_ms']}ms)"
+                    )
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False, default=str)}\n\n"
+        except Exception as e:
+            logger.error(f"❌ Erro na geração (streaming): {str(e)}", exc_info=True)
+            detail = json.dumps({"detail": f"Erro ao gerar conteúdo: {str(e)}"}, ensure_ascii=False)
+            yield f"event: error\ndata: {detail}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Sem buffer em proxies: cada trecho sai assim que é gerado
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/retrieve-batch")
+async def retrieve_batch(request: BatchRetrieveRequest):
+    """
+    Busca casos de referência para vários campos de um anexo de uma vez
+    (um lote de embeddings + uma busca em lote no Qdrant)
+    
+    Body JSON:
+    {
+        "queries": [
+            {"field_name": "justificativa", "query": "fisioterapia APAE ..."},
+            {"field_name": "objetivos", "query": "..."}
+        ],
+        "limit": 3,
+        "only_approved": true
+    }
+    """
+    if len(request.queries) > 50:
+        raise HTTPException(status_code=400, detail="Máximo de 50 campos por requisição")
+    
+    start_time = datetime.now()
+    filters = {"approved": True} if request.only_approved else None
+    
+    try:
+        results = await retrieve_fields(
+            [(q.field_name, q.query) for q in request.queries],
+            limit=request.limit,
+            filters=filters
+        )
+    except Exception as e:
+        logger.error(f"❌ Erro na busca em lote: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar referências: {str(e)}")
+    
+    latency = (datetime.now() - start_time).total_seconds()
+    logger.info(f"📚 Busca em lote: {len(request.queries)} campos em {latency:.2f}s")
+    
+    return {
+        "results": {
+            field_name: [hit_to_dict(hit) for hit in hits]
+            for field_name, hits in results.items()
+        },
+        "latency_ms": int(latency * 1000)
+    }
+
 @router.post("/test-generation")
-async def test_generation(campo: str = "justificativa"):
+async def test_generation(campo: str = "justificativa", no_cache: bool = False):
     """
     Endpoint de teste rápido para validar geração de IA
     """
@@ -89,22 +211,40 @@ async def test_generation(campo: str = "justificativa"):
         field_name=campo,
         project_context=project_context,
         similar_cases=similar_cases,
-        max_length=800
+        max_length=800,
+        use_cache=not no_cache
     )
     
     return result
 
 @router.get("/health")
 async def health_check():
-    """Verifica health dos providers de IA"""
+    """Verifica health dos providers de IA (circuit breaker, latência e roteamento)"""
     health_status = text_agent.get_health_status()
     
+    # Sem nenhum LLM com circuito fechado, só o fallback RAG puro responde
+    llm_up = any(
+        provider.get("available") and provider.get("state") == "closed"
+        for name, provider in health_status.items() if name != "routing"
+    )
     return {
-        "status": "healthy",
+        "status": "healthy" if llm_up else "degraded",
         "timestamp": datetime.now().isoformat(),
         "providers": health_status
     }
 
+@router.get("/metrics")
+async def metrics():
+    """Métricas de desempenho do pipeline de IA (embeddings, caches)"""
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "embeddings": get_embedding_stats(),
+        "search_cache": result_cache.get_stats(),
+        "reranker": reranker.get_stats(),
+        "generation_cache": generation_cache.get_stats(),
+        "hedging": text_agent.hedging.get_stats()
+    }
+
 # ============================================================================
 # ENDPOINT COM BANCO DE DADOS (DESABILITADO ATÉ CORRIGIR IMPORTS)
 # ============================================================================
@@ -1,21 +1,112 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from typing import List
-import shutil
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from app.config import settings
+from app.services.jobs import job_queue
+from app.services.ingestion import CATEGORY_RULES, file_sha256
+from app.services.manifest import get_manifest
+from app.services.catalog import catalog_watcher, get_catalog
+from app.services import reindex
 from pathlib import Path
+import hashlib
+import asyncio
 import logging
+import anyio
+import uuid
+import os
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 # Path correto dentro do container
-KNOWLEDGE_BASE = Path("/app/knowledge_base")
+KNOWLEDGE_BASE = Path(settings.KNOWLEDGE_BASE_PATH)
+
+
+class ReindexRequest(BaseModel):
+    """Com switch=False a nova coleção só é validada; ative depois"""
+    switch: bool = True
+
+
+class ProcessRequest(BaseModel):
+    """Sem `paths`, sincroniza a knowledge_base inteira (ou as `categories`)"""
+    paths: Optional[List[str]] = None
+    categories: Optional[List[str]] = None
+
+
+async def _save_upload(file: UploadFile, upload_dir: Path, pasta: str, seen: Dict[str, str]) -> Dict:
+    """
+    Grava o upload em blocos (sha256 incremental) num arquivo temporário e
+    só então decide: duplicata (descarta), nome já usado por outro conteúdo
+    (grava com sufixo) ou novo.
+    """
+    name = Path(file.filename or "").name
+    if not name.lower().endswith(('.pdf', '.docx')):
+        return {"file": name, "status": "ignored", "error": "formato inválido"}
+    if file.size is not None and file.size > settings.UPLOAD_MAX_BYTES:
+        return {"file": name, "status": "error", "error": f"excede {settings.UPLOAD_MAX_BYTES} bytes"}
+
+    tmp_path = upload_dir / f".{name}.{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with await anyio.open_file(tmp_path, "wb") as buffer:
+            while True:
+                chunk = await file.read(settings.UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > settings.UPLOAD_MAX_BYTES:
+                    raise ValueError(f"excede {settings.UPLOAD_MAX_BYTES} bytes")
+                digest.update(chunk)
+                await buffer.write(chunk)
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        return {"file": name, "status": "error", "error": str(e)}
+    finally:
+        await file.close()
+
+    sha256 = digest.hexdigest()
+    target = upload_dir / name
+    original = seen.get(sha256)
+    if original is None:
+        # Reserva antes de qualquer await: cópias no mesmo envio viram duplicatas
+        seen[sha256] = f"{pasta}/{name}"
+        original = await anyio.to_thread.run_sync(_indexed_copy, sha256)
+        if original is None and target.exists() and await anyio.to_thread.run_sync(file_sha256, target) == sha256:
+            original = f"{pasta}/{name}"
+        if original is not None:
+            seen[sha256] = original
+    if original is not None:
+        tmp_path.unlink(missing_ok=True)
+        return {"file": name, "status": "duplicate", "duplicate_of": original, "sha256": sha256}
+
+    if target.exists():
+        # Mesmo nome, conteúdo diferente: não sobrescreve
+        target = upload_dir / f"{Path(name).stem}-{sha256[:8]}{Path(name).suffix}"
+    os.replace(tmp_path, target)
+    seen[sha256] = f"{pasta}/{target.name}"
+    await anyio.to_thread.run_sync(lambda: get_catalog().record(
+        f"{pasta}/{target.name}", category=pasta, size=size, mtime_ns=target.stat().st_mtime_ns,
+        sha256=sha256, status="pending", chunk_count=0, case_id=None, duplicate_of=None, error=None
+    ))
+    return {"file": target.name, "status": "saved", "size": size, "sha256": sha256}
+
+
+def _indexed_copy(sha256: str) -> Optional[str]:
+    """Arquivo com o mesmo conteúdo já registrado no manifesto da ingestão"""
+    for entry in get_manifest().by_sha256(sha256):
+        if (KNOWLEDGE_BASE / entry.path).exists():
+            return entry.path
+    return None
+
 
 @router.post("/upload")
 async def upload_documentos(
     categoria: str = Form(...),
-    files: List[UploadFile] = File(...)
+    files: List[UploadFile] = File(...),
+    process: bool = Form(False)
 ):
-    """Upload de múltiplos PDFs"""
+    """Upload de múltiplos PDFs (gravação em streaming, sem duplicatas)"""
     
     logger.info(f"📤 Upload iniciado - Categoria: {categoria}, Arquivos: {len(files)}")
     
@@ -40,65 +131,147 @@ async def upload_documentos(
     
     logger.info(f"📁 Salvando em: {upload_dir}")
     
-    uploaded = []
-    errors = []
+    # Arquivos gravados em paralelo (limitado); `seen` pega duplicatas no mesmo envio
+    limiter = anyio.Semaphore(settings.UPLOAD_CONCURRENCY)
+    seen: Dict[str, str] = {}
     
-    for file in files:
-        if not file.filename.lower().endswith(('.pdf', '.docx')):
-            logger.warning(f"⚠️ Ignorado (formato inválido): {file.filename}")
-            continue
-        
-        file_path = upload_dir / file.filename
-        
-        try:
-            with file_path.open("wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-            
-            uploaded.append(file.filename)
-            logger.info(f"✅ SALVO: {file.filename} em {file_path}")
-            
-        except Exception as e:
-            error_msg = f"Erro ao salvar {file.filename}: {str(e)}"
-            logger.error(f"❌ {error_msg}")
-            errors.append(error_msg)
+    async def save(file: UploadFile) -> Dict:
+        async with limiter:
+            return await _save_upload(file, upload_dir, pasta, seen)
+    
+    results = await asyncio.gather(*(save(file) for file in files))
+    
+    uploaded = [r["file"] for r in results if r["status"] == "saved"]
+    duplicates = [r for r in results if r["status"] == "duplicate"]
+    errors = [f"Erro ao salvar {r['file']}: {r['error']}" for r in results if r["status"] == "error"]
+    for r in results:
+        if r["status"] == "ignored":
+            logger.warning(f"⚠️ Ignorado (formato inválido): {r['file']}")
+        elif r["status"] == "duplicate":
+            logger.info(f"♻️  Duplicata: {r['file']} (= {r['duplicate_of']})")
+    for error in errors:
+        logger.error(f"❌ {error}")
     
     logger.info(f"🎉 Upload concluído: {len(uploaded)}/{len(files)} arquivos")
     
+    # Processamento em segundo plano, só dos arquivos deste upload
+    job = None
+    if process and uploaded:
+        job = await anyio.to_thread.run_sync(job_queue.submit, "knowledge_sync", {
+            "paths": [f"{pasta}/{name}" for name in uploaded]
+        })
+    
     return {
         "uploaded": len(uploaded),
         "files": uploaded,
+        "duplicates": [{"file": d["file"], "duplicate_of": d["duplicate_of"]} for d in duplicates],
         "errors": errors,
         "categoria": categoria,
-        "pasta": str(upload_dir)
+        "pasta": str(upload_dir),
+        "job_id": job.id if job else None
     }
 
 @router.get("/status")
 async def get_status():
-    """Status da base de conhecimento"""
-    
-    stats = {}
-    for folder in ["aprovados", "reprovados", "diligencias", "portarias", "exemplos"]:
-        folder_path = KNOWLEDGE_BASE / folder
-        if folder_path.exists():
-            pdfs = list(folder_path.glob("*.pdf"))
-            stats[folder] = {
-                "count": len(pdfs),
-                "files": [p.name for p in pdfs[:5]]  # Primeiros 5
-            }
-        else:
-            stats[folder] = {"count": 0, "files": []}
+    """Status da base de conhecimento (totais do catálogo, em cache)"""
+    summary = await anyio.to_thread.run_sync(get_catalog().summary)
+    return dict(summary, base_path=str(KNOWLEDGE_BASE), watcher=catalog_watcher.get_stats())
+
+@router.get("/documents")
+async def list_documents(
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    q: Optional[str] = None,
+    offset: int = 0,
+    limit: int = 50
+):
+    """Documentos do catálogo (paginado; filtro por categoria, estado e nome/sha256)"""
+    limit = max(1, min(limit, 500))
+    offset = max(0, offset)
+    total, documents = await anyio.to_thread.run_sync(
+        lambda: get_catalog().list(category, status, q, offset, limit)
+    )
+    return {"total": total, "offset": offset, "limit": limit, "documents": documents}
+
+@router.post("/documents/reconcile")
+async def reconcile_documents():
+    """Alinha o catálogo com as pastas (arquivos copiados/apagados por fora da API)"""
+    result = await anyio.to_thread.run_sync(get_catalog().reconcile)
+    return {"added": result["added"], "missing": result["missing"], "updated": result["updated"]}
+
+@router.post("/process", status_code=202)
+async def process_documents(request: Optional[ProcessRequest] = None):
+    """Enfileira a ingestão (executada pelos workers, fora da requisição)"""
+    request = request or ProcessRequest()
+    unknown = set(request.categories or []) - set(CATEGORY_RULES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Categorias inválidas: {sorted(unknown)}")
     
+    job = await anyio.to_thread.run_sync(job_queue.submit, "knowledge_sync", request.model_dump(exclude_none=True))
     return {
-        "total": sum(s["count"] for s in stats.values()),
-        "by_category": stats,
-        "base_path": str(KNOWLEDGE_BASE)
+        "status": job.status,
+        "job_id": job.id,
+        "status_url": f"/api/knowledge/jobs/{job.id}"
     }
 
-@router.post("/process")
-async def process_documents():
-    """Processar documentos com IA (endpoint para compatibilidade)"""
+@router.get("/jobs")
+async def list_jobs(limit: int = 20):
+    """Jobs mais recentes"""
+    jobs = await anyio.to_thread.run_sync(job_queue.list, min(limit, 100))
     return {
-        "status": "ok",
-        "message": "Use ./import_now.sh no servidor para processar"
+        "jobs": [job.as_dict() for job in jobs],
+        "queue": await anyio.to_thread.run_sync(job_queue.get_stats)
     }
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status e progresso de um job"""
+    job = await anyio.to_thread.run_sync(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job.as_dict()
+
+@router.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str, offset: int = 0, limit: int = 100):
+    """Resultado por arquivo (paginado)"""
+    if await anyio.to_thread.run_sync(job_queue.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    limit = min(limit, 500)
+    return {
+        "job_id": job_id,
+        "offset": offset,
+        "results": await anyio.to_thread.run_sync(job_queue.results, job_id, offset, limit)
+    }
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancela um job na fila ou em execução (para entre lotes)"""
+    job = await anyio.to_thread.run_sync(job_queue.cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job.as_dict()
+
+@router.post("/reindex", status_code=202)
+async def reindex_documents(request: Optional[ReindexRequest] = None):
+    """Enfileira a reindexação numa nova versão da coleção (sem parar as buscas)"""
+    job = await anyio.to_thread.run_sync(
+        job_queue.submit, "knowledge_reindex", (request or ReindexRequest()).model_dump()
+    )
+    return {
+        "status": job.status,
+        "job_id": job.id,
+        "status_url": f"/api/knowledge/jobs/{job.id}"
+    }
+
+@router.get("/collections")
+async def list_collection_versions():
+    """Versões da coleção e qual está ativa no alias"""
+    return await asyncio.to_thread(reindex.list_versions)
+
+@router.post("/collections/rollback")
+async def rollback_collection():
+    """Volta o alias para a versão anterior"""
+    try:
+        return await asyncio.to_thread(reindex.rollback_collection)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -9,6 +9,43 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     QDRANT_URL: str
     QDRANT_COLLECTION_NAME: str = "pronas_pcd_cases"
+    QDRANT_API_KEY: str = ""
+    QDRANT_TIMEOUT: int = 30
+    QDRANT_PREFER_GRPC: bool = False
+    QDRANT_POOL_SIZE: int = 20
+    VECTOR_STORE_BACKEND: str = "qdrant"  # qdrant | local
+    LOCAL_VECTORSTORE_PATH: str = "/data/vectorstore"
+    LOCAL_VECTORSTORE_DTYPE: str = "float32"  # float32 | float16
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_CANDIDATES: int = 20
+    HYBRID_RRF_K: int = 60
+    LEXICAL_INDEX_PATH: str = "/data/lexical_index"
+    SEARCH_CACHE_SIZE: int = 2000
+    SEARCH_CACHE_TTL_SECONDS: int = 300
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    RERANK_CANDIDATES: int = 20
+    RERANK_BUDGET_MS: float = 250.0
+    RERANK_BATCH_SIZE: int = 16
+    RERANK_MAX_CHARS: int = 512
+    RERANK_CACHE_SIZE: int = 5000
+    GENERATION_CACHE_SIZE: int = 1000  # 0 = desativado
+    GENERATION_CACHE_TTL_SECONDS: int = 3600
+    GENERATION_SEMANTIC_CACHE_ENABLED: bool = False
+    GENERATION_SEMANTIC_CACHE_SIZE: int = 500
+    GENERATION_SEMANTIC_THRESHOLD: float = 0.97
+    GENERATION_HEDGE_ENABLED: bool = False  # secundário em paralelo se o primário demorar
+    GENERATION_HEDGE_PERCENTILE: float = 95.0
+    GENERATION_HEDGE_DEFAULT_DELAY: float = 4.0  # até haver amostras de latência
+    GENERATION_HEDGE_MIN_DELAY: float = 0.5
+    GENERATION_HEDGE_MAX_DELAY: float = 10.0
+    LLM_ROUTING: str = "latency"  # latency (mais rápido primeiro) | priority
+    LLM_BREAKER_FAILURES: int = 3  # falhas seguidas para abrir o circuito
+    LLM_BREAKER_ERROR_RATE: float = 0.5
+    LLM_BREAKER_WINDOW: int = 20
+    LLM_BREAKER_MIN_CALLS: int = 10
+    LLM_BREAKER_COOLDOWN_SECONDS: float = 30.0
+    LLM_LATENCY_EWMA_ALPHA: float = 0.2
     REDIS_URL: str
     
     SECRET_KEY: str
@@ -21,8 +58,52 @@ class Settings(BaseSettings):
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000"]
     
     EMBEDDING_MODEL: str = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+    EMBEDDING_BACKEND: str = "torch"  # torch | onnx
+    EMBEDDING_ONNX_DIR: str = "/data/models/embeddings-onnx"
+    EMBEDDING_ONNX_QUANTIZED: bool = True
+    EMBEDDING_ONNX_THREADS: int = 0
+    EMBEDDING_SERVER_URL: str = ""  # ex: http://127.0.0.1:8001 ou unix:///tmp/pronas-embed.sock
+    EMBEDDING_SERVER_TIMEOUT: float = 30.0
+    EMBEDDING_SERVER_FALLBACK_LOCAL: bool = False
+    EMBEDDING_SERVER_MAX_TEXTS: int = 512
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
+    EMBEDDING_MICROBATCH_ENABLED: bool = True
+    EMBEDDING_REQUEST_TIMEOUT: float = 60.0  # espera máxima por um lote do micro-batcher
+    EMBEDDING_EXECUTOR_WORKERS: int = 4
+    EMBEDDING_CACHE_SIZE: int = 10000
+    EMBEDDING_CACHE_BACKEND: str = "memory"  # memory | redis | disk
+    EMBEDDING_CACHE_DIR: str = "/data/embedding_cache"
+    EMBEDDING_CACHE_TTL_SECONDS: int = 0
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    KNOWLEDGE_BASE_PATH: str = "/app/knowledge_base"
+    INGEST_BATCH_SIZE: int = 64
+    INGEST_EXTRACT_WORKERS: int = 0  # 0 = núcleos - 1
+    INGEST_EXTRACT_TIMEOUT: float = 120.0
+    TEXT_STORE_ENABLED: bool = True
+    TEXT_STORE_PATH: str = "/data/text_store"
+    SECTION_INDEX_ENABLED: bool = True  # vetores por seção dos aprovados
+    SECTION_MIN_CHARS: int = 200
+    SECTION_MAX_CHARS: int = 4000
+    REINDEX_MAX_POINTS_PER_SECOND: float = 500.0  # 0 = sem limite
+    REINDEX_SAMPLE_SIZE: int = 50
+    REINDEX_RECALL_TOP_K: int = 5
+    REINDEX_MIN_RECALL: float = 0.9
+    REINDEX_KEEP_VERSIONS: int = 2  # além da ativa, ao podar
+    JOB_BACKEND: str = "auto"  # auto | redis | local
+    JOB_WORKERS: int = 2  # jobs simultâneos neste processo (0 = só enfileira)
+    JOB_EXTRACT_WORKERS: int = 2  # processos de extração por job
+    JOB_TTL_SECONDS: int = 7 * 24 * 3600
+    JOB_HEARTBEAT_SECONDS: float = 15.0  # sem renovação por 3x isso, job "running" vira "failed"
+    UPLOAD_MAX_BYTES: int = 100 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+    UPLOAD_CONCURRENCY: int = 4
+    INGEST_MANIFEST_PATH: str = "/data/ingest_manifest"
+    CATALOG_WATCH_ENABLED: bool = False  # observa cópias feitas por fora da API
+    CATALOG_WATCH_INTERVAL: float = 30.0  # polling (sem watchfiles)
+    CATALOG_WATCH_DEBOUNCE: float = 2.0
+    CATALOG_WATCH_AUTO_SYNC: bool = False  # enfileira a sincronização do que o observador achar
     
     class Config:
         env_file = ".env"
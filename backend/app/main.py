@@ -2,6 +2,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import auth, projects, anexos, ai_assistant, knowledge_base
 from app.database.session import engine, Base
+from app.ai.rag.embeddings import shutdown_embedding_executor
+from app.ai.rag.vectorstore import close_qdrant_clients
+from app.services.jobs import job_queue
+from app.services.catalog import catalog_watcher
 import logging
 
 # Configurar logging
@@ -41,6 +45,20 @@ async def startup_event():
         logger.info("✅ Tabelas criadas/verificadas")
     except Exception as e:
         logger.error(f"❌ Erro ao criar tabelas: {e}")
+    
+    # Workers da fila de ingestão (JOB_WORKERS=0: só enfileira)
+    job_queue.start()
+    
+    # Observador do catálogo da knowledge_base (CATALOG_WATCH_ENABLED)
+    catalog_watcher.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    catalog_watcher.stop()
+    job_queue.stop()
+    shutdown_embedding_executor()
+    await close_qdrant_clients()
+    logger.info("👋 Recursos de IA liberados")
 
 # ═══════════════════════════════════════════════════════════════
 # ROTAS
@@ -1,3 +1,4 @@
 from .user import User
 from .project import Project
 from .anexo import Anexo
+from .knowledge_document import KnowledgeDocument
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text
+from datetime import datetime
+from app.database.session import Base
+
+class KnowledgeDocument(Base):
+    """Catálogo da knowledge_base: um registro por arquivo (ver app/services/catalog.py)"""
+    __tablename__ = "knowledge_documents"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String, unique=True, nullable=False, index=True)  # relativo à knowledge_base
+    category = Column(String, nullable=False, index=True)
+    filename = Column(String, index=True)
+    size = Column(BigInteger, default=0)
+    mtime_ns = Column(BigInteger, default=0)
+    sha256 = Column(String(64), index=True)
+    # pending | partial | complete | empty | duplicate | failed | missing
+    status = Column(String, default="pending", index=True)
+    chunk_count = Column(Integer, default=0)
+    case_id = Column(Integer)
+    duplicate_of = Column(String)
+    error = Column(Text)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,370 @@
+"""
+Catálogo da knowledge_base (tabela knowledge_documents)
+
+Um registro por arquivo com tamanho, sha256, categoria, estado da
+ingestão e número de trechos, mantido por quem altera a base:
+    upload           → pending
+    sincronização    → complete | empty | duplicate | failed; removidos saem
+    reindexação      → reconciliado com o manifesto da versão ativada
+    reconcile()      → arquivos copiados por fora (pending) e apagados (missing)
+
+/status lê os totais agregados em cache, recalculados só quando o
+catálogo muda (VersionCounter "knowledge_catalog", compartilhado entre
+processos): não percorre mais as pastas a cada chamada.
+
+O observador (CATALOG_WATCH_ENABLED) reconcilia ao iniciar e a cada
+mudança nas pastas — com `watchfiles` instalado, por eventos do sistema
+de arquivos; sem ele, a cada CATALOG_WATCH_INTERVAL segundos — e, com
+CATALOG_WATCH_AUTO_SYNC, enfileira a sincronização do que apareceu ou
+sumiu. Só um processo por máquina observa (lock em INGEST_MANIFEST_PATH).
+Desligado, o catálogo é reconciliado sob demanda (POST
+/api/knowledge/documents/reconcile ou scripts/ingest_knowledge_base.py
+catalog).
+"""
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, or_
+from app.config import settings
+from app.database.session import SessionLocal
+from app.models.knowledge_document import KnowledgeDocument
+from app.services.ingestion import CATEGORY_RULES, discover_documents
+from app.services.manifest import IngestManifest, ManifestEntry, get_manifest
+from app.utils.process_lock import ProcessLock
+from app.utils.version_counter import VersionCounter
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+try:
+    import watchfiles
+except ImportError:  # opcional: sem ele o observador faz polling
+    watchfiles = None
+
+FIELDS = ("category", "size", "mtime_ns", "sha256", "status", "chunk_count", "case_id", "duplicate_of", "error")
+
+
+def entry_fields(entry: ManifestEntry) -> Dict:
+    """Campos do catálogo a partir de uma entrada do manifesto"""
+    return {
+        "category": entry.category or entry.path.split("/", 1)[0],
+        "size": entry.size,
+        "mtime_ns": entry.mtime_ns,
+        "sha256": entry.sha256,
+        "status": entry.status,
+        "chunk_count": len(entry.point_ids),
+        "case_id": entry.case_id,
+        "duplicate_of": entry.duplicate_of,
+        "error": None
+    }
+
+
+class KnowledgeCatalog:
+    def __init__(self):
+        self.version = VersionCounter("knowledge_catalog")
+        self._summary: Optional[Dict] = None
+        self._summary_version = -1
+        self._lock = threading.Lock()
+
+    # ── Escrita ────────────────────────────────────────────────────
+
+    def _apply(self, db, path: str, fields: Dict) -> bool:
+        row = db.query(KnowledgeDocument).filter(KnowledgeDocument.path == path).first()
+        if row is None:
+            row = KnowledgeDocument(path=path, filename=path.rsplit("/", 1)[-1])
+            db.add(row)
+        elif all(getattr(row, key) == value for key, value in fields.items()):
+            return False
+        for key, value in fields.items():
+            setattr(row, key, value)
+        return True
+
+    def record_many(self, records: Dict[str, Dict]):
+        """Cria/atualiza registros {caminho relativo: campos}"""
+        if not records:
+            return
+        db = SessionLocal()
+        try:
+            changed = False
+            for path, fields in records.items():
+                fields = {key: value for key, value in fields.items() if key in FIELDS}
+                changed = self._apply(db, path, fields) or changed
+            db.commit()
+        except Exception as e:
+            # O catálogo é derivado: uma falha aqui não interrompe upload/ingestão
+            db.rollback()
+            logger.warning(f"⚠️  Catálogo não atualizado ({len(records)} arquivos): {e}")
+            return
+        finally:
+            db.close()
+        if changed:
+            self.version.bump()
+
+    def record(self, path: str, **fields):
+        self.record_many({path: fields})
+
+    def record_entry(self, entry: ManifestEntry):
+        self.record_many({entry.path: entry_fields(entry)})
+
+    def remove(self, paths: Iterable[str]):
+        paths = list(paths)
+        if not paths:
+            return
+        db = SessionLocal()
+        try:
+            deleted = db.query(KnowledgeDocument).filter(
+                KnowledgeDocument.path.in_(paths)
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️  Catálogo não atualizado ({len(paths)} removidos): {e}")
+            return
+        finally:
+            db.close()
+        if deleted:
+            self.version.bump()
+
+    def reconcile(self, root: Optional[str] = None, manifest: Optional[IngestManifest] = None) -> Dict:
+        """
+        Alinha o catálogo com as pastas e o manifesto (só stat, sem ler os
+        arquivos). Retorna o que mudou desde a última reconciliação:
+        `added` (novos/alterados fora da ingestão) e `missing` (apagados do
+        disco, ainda no índice até a próxima sincronização).
+        """
+        root_path = Path(root or settings.KNOWLEDGE_BASE_PATH)
+        manifest = manifest or get_manifest()
+        entries = {entry.path: entry for entry in manifest.snapshot()}
+
+        db = SessionLocal()
+        try:
+            rows = {row.path: row for row in db.query(KnowledgeDocument).all()}
+        finally:
+            db.close()
+
+        records: Dict[str, Dict] = {}
+        added: List[str] = []
+        missing: List[str] = []
+        seen = set()
+
+        for source in discover_documents(root_path):
+            rel = source.path.relative_to(root_path).as_posix()
+            seen.add(rel)
+            stat = source.path.stat()
+            entry = entries.get(rel)
+            if entry is not None and (entry.size, entry.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                fields = entry_fields(entry)
+            else:
+                row = rows.get(rel)
+                if row is not None and (row.size, row.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                    continue  # já catalogado (pending/failed) e não mudou
+                fields = {
+                    "category": source.category, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                    "sha256": None, "status": "pending", "chunk_count": 0, "case_id": None,
+                    "duplicate_of": None, "error": None
+                }
+                added.append(rel)
+            row = rows.get(rel)
+            if row is None or any(getattr(row, key) != value for key, value in fields.items()):
+                records[rel] = fields
+
+        for rel, entry in entries.items():
+            if rel in seen:
+                continue
+            seen.add(rel)
+            fields = dict(entry_fields(entry), status="missing")
+            row = rows.get(rel)
+            if row is None or row.status != "missing":
+                missing.append(rel)
+                records[rel] = fields
+
+        self.record_many(records)
+        self.remove(path for path in rows if path not in seen)
+        return {"added": added, "missing": missing, "updated": len(records)}
+
+    # ── Leitura ────────────────────────────────────────────────────
+
+    def summary(self) -> Dict:
+        """Totais por categoria/estado (em cache até o catálogo mudar)"""
+        version = self.version.get()
+        if self._summary is not None and self._summary_version == version:
+            return self._summary
+
+        with self._lock:
+            if self._summary is not None and self._summary_version == version:
+                return self._summary
+            db = SessionLocal()
+            try:
+                groups = db.query(
+                    KnowledgeDocument.category,
+                    KnowledgeDocument.status,
+                    func.count(KnowledgeDocument.id),
+                    func.coalesce(func.sum(KnowledgeDocument.size), 0),
+                    func.coalesce(func.sum(KnowledgeDocument.chunk_count), 0)
+                ).group_by(KnowledgeDocument.category, KnowledgeDocument.status).all()
+            finally:
+                db.close()
+
+            by_category = {
+                category: {"count": 0, "bytes": 0, "chunks": 0, "by_status": {}}
+                for category in CATEGORY_RULES
+            }
+            by_status: Dict[str, int] = {}
+            for category, status, count, size, chunks in groups:
+                totals = by_category.setdefault(category, {"count": 0, "bytes": 0, "chunks": 0, "by_status": {}})
+                totals["count"] += count
+                totals["bytes"] += int(size)
+                totals["chunks"] += int(chunks)
+                totals["by_status"][status] = count
+                by_status[status] = by_status.get(status, 0) + count
+
+            self._summary = {
+                "total": sum(t["count"] for t in by_category.values()),
+                "bytes": sum(t["bytes"] for t in by_category.values()),
+                "chunks": sum(t["chunks"] for t in by_category.values()),
+                "by_status": by_status,
+                "by_category": by_category,
+                "computed_at": time.time()
+            }
+            self._summary_version = version
+            return self._summary
+
+    def list(
+        self,
+        category: Optional[str] = None,
+        status: Optional[str] = None,
+        q: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 50
+    ) -> Tuple[int, List[Dict]]:
+        """(total filtrado, página de documentos ordenada por caminho)"""
+        db = SessionLocal()
+        try:
+            query = db.query(KnowledgeDocument)
+            if category:
+                query = query.filter(KnowledgeDocument.category == category)
+            if status:
+                query = query.filter(KnowledgeDocument.status == status)
+            if q:
+                pattern = f"%{q}%"
+                query = query.filter(or_(
+                    KnowledgeDocument.filename.ilike(pattern),
+                    KnowledgeDocument.sha256 == q.lower()
+                ))
+            total = query.count()
+            rows = query.order_by(KnowledgeDocument.path).offset(offset).limit(limit).all()
+            return total, [self.as_dict(row) for row in rows]
+        finally:
+            db.close()
+
+    @staticmethod
+    def as_dict(row: KnowledgeDocument) -> Dict:
+        return {
+            "path": row.path,
+            "filename": row.filename,
+            "category": row.category,
+            "size": row.size,
+            "sha256": row.sha256,
+            "status": row.status,
+            "chunk_count": row.chunk_count,
+            "case_id": row.case_id,
+            "duplicate_of": row.duplicate_of,
+            "error": row.error,
+            "updated_at": row.updated_at.isoformat() if row.updated_at else None
+        }
+
+
+class CatalogWatcher:
+    """Reconcilia o catálogo quando a knowledge_base muda por fora da API"""
+
+    def __init__(self, catalog: KnowledgeCatalog):
+        self.catalog = catalog
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = ProcessLock(str(Path(settings.INGEST_MANIFEST_PATH) / "catalog_watch.lock"))
+        self.reconciliations = 0
+        self.last_result: Dict = {}
+
+    def _reconcile(self):
+        try:
+            result = self.catalog.reconcile()
+        except Exception as e:
+            logger.error(f"❌ Erro reconciliando o catálogo: {e}")
+            return
+        self.reconciliations += 1
+        self.last_result = {key: (value if isinstance(value, int) else len(value)) for key, value in result.items()}
+        if not settings.CATALOG_WATCH_AUTO_SYNC or not (result["added"] or result["missing"]):
+            return
+
+        from app.services.jobs import job_queue
+        # Removidos exigem a sincronização completa; só novos, só esses caminhos
+        params = {} if result["missing"] else {"paths": result["added"]}
+        job = job_queue.submit("knowledge_sync", params)
+        logger.info(
+            f"👀 knowledge_base alterada por fora: {len(result['added'])} novos/alterados, "
+            f"{len(result['missing'])} removidos → job {job.id}"
+        )
+
+    def _loop(self):
+        self._reconcile()
+        root = Path(settings.KNOWLEDGE_BASE_PATH)
+        if watchfiles is not None and root.exists():
+            logger.info(f"👀 Observando {root} (watchfiles)")
+            try:
+                for _ in watchfiles.watch(
+                    root, stop_event=self._stopping,
+                    debounce=int(settings.CATALOG_WATCH_DEBOUNCE * 1000), raise_interrupt=False
+                ):
+                    self._reconcile()
+                return
+            except Exception as e:
+                logger.warning(f"⚠️  watchfiles indisponível ({e}); usando polling")
+
+        logger.info(f"👀 Observando {root} (polling a cada {settings.CATALOG_WATCH_INTERVAL:g}s)")
+        while not self._stopping.wait(settings.CATALOG_WATCH_INTERVAL):
+            self._reconcile()
+
+    def start(self):
+        """Com CATALOG_WATCH_ENABLED, reconcilia e passa a observar (um processo só)"""
+        if not settings.CATALOG_WATCH_ENABLED:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if self._lock.acquire(blocking=False) is None:
+            logger.info("👀 Outro processo já observa a knowledge_base")
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, name="catalog-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+            self._lock.release()
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": settings.CATALOG_WATCH_ENABLED,
+            "mode": "watchfiles" if watchfiles is not None else "polling",
+            "running": self._thread is not None and self._thread.is_alive(),
+            "reconciliations": self.reconciliations,
+            "last": self.last_result
+        }
+
+
+_catalog: Optional[KnowledgeCatalog] = None
+_catalog_lock = threading.Lock()
+
+def get_catalog() -> KnowledgeCatalog:
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = KnowledgeCatalog()
+    return _catalog
+
+
+catalog_watcher = CatalogWatcher(get_catalog())
@@ -0,0 +1,224 @@
+"""
+Extração de texto de PDFs em paralelo (pool de processos)
+
+Cada worker é um processo persistente (contexto "spawn", sem herdar
+modelos/conexões do pai) que recebe caminhos por um Pipe e devolve as
+páginas. O pai acompanha o relógio de cada arquivo: se passar de
+`timeout` segundos o worker é morto e substituído, e o arquivo sai como
+"timeout" — um PDF patológico não trava mais a ingestão.
+
+Os resultados saem na ordem em que terminam; o próximo arquivo é
+despachado antes de o resultado ser entregue ao consumidor, então os
+workers continuam extraindo enquanto o pipeline calcula embeddings.
+
+Este módulo é importado pelos workers: mantenha-o sem dependências
+pesadas.
+"""
+from dataclasses import dataclass, field
+from multiprocessing.connection import wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import multiprocessing as mp
+import itertools
+import hashlib
+import logging
+import time
+import io
+import os
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ExtractionResult:
+    key: Any
+    path: str
+    status: str  # ok | failed | timeout
+    pages: List[str] = field(default_factory=list)
+    sha256: str = ""
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+def read_pdf(path: str) -> Tuple[List[str], str]:
+    """Lê o arquivo uma vez: sha256 + texto de cada página"""
+    from pypdf import PdfReader
+
+    with open(path, "rb") as f:
+        data = f.read()
+    reader = PdfReader(io.BytesIO(data))
+    pages = [page.extract_text() or "" for page in reader.pages]
+    return pages, hashlib.sha256(data).hexdigest()
+
+
+def _worker_main(conn):
+    import pypdf  # noqa: F401 — importa antes de sinalizar pronto (fora do relógio)
+    conn.send(("ready",))
+    while True:
+        try:
+            path = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if path is None:
+            break
+
+        started = time.perf_counter()
+        try:
+            pages, sha256 = read_pdf(path)
+            conn.send(("ok", pages, sha256, None, time.perf_counter() - started))
+        except Exception as e:
+            conn.send(("failed", [], "", f"{type(e).__name__}: {e}", time.perf_counter() - started))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.task: Optional[Tuple[Any, str]] = None
+        self.deadline = 0.0
+        self.started = 0.0
+
+    def submit(self, key: Any, path: str, timeout: float):
+        self.task = (key, path)
+        self.started = time.perf_counter()
+        self.deadline = self.started + timeout
+        self.conn.send(path)
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class ExtractionPool:
+    def __init__(self, workers: int = 0, timeout: float = 120.0):
+        self.workers = workers if workers > 0 else max(1, (os.cpu_count() or 2) - 1)
+        self.timeout = timeout
+        self._ctx = mp.get_context("spawn")
+        self._pool: List[_Worker] = []
+        self.stats: Dict[str, int] = {"ok": 0, "failed": 0, "timeout": 0, "restarts": 0, "startup_failures": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _ensure_workers(self):
+        while len(self._pool) < self.workers:
+            self._pool.append(_Worker(self._ctx))
+
+    def _replace(self, worker: _Worker):
+        worker.kill()
+        self._pool.remove(worker)
+        self._pool.append(_Worker(self._ctx))
+        self.stats["restarts"] += 1
+
+    def imap_unordered(self, items: Iterable[Tuple[Any, str]]) -> Iterator[ExtractionResult]:
+        """Extrai (chave, caminho) e produz resultados na ordem de conclusão"""
+        pending = iter(items)
+        try:
+            first = next(pending)
+        except StopIteration:
+            return  # nada a extrair: nem sobe os workers
+        pending = itertools.chain([first], pending)
+        self._ensure_workers()
+        exhausted = False
+
+        def dispatch(worker: _Worker):
+            nonlocal exhausted
+            if exhausted:
+                return
+            try:
+                key, path = next(pending)
+            except StopIteration:
+                exhausted = True
+                return
+            worker.submit(key, str(path), self.timeout)
+
+        for worker in self._pool:
+            if worker.ready:
+                dispatch(worker)
+
+        while True:
+            busy = [w for w in self._pool if w.task is not None]
+            starting = [w for w in self._pool if not w.ready]
+            if not busy and (exhausted or not self._pool):
+                return
+
+            # O relógio de cada arquivo só corre depois que o worker está pronto
+            wait_for = max(0.0, min(w.deadline for w in busy) - time.perf_counter()) if busy else None
+            ready = set(wait([w.conn for w in busy + starting], timeout=wait_for))
+
+            for worker in starting:
+                if worker.conn in ready:
+                    try:
+                        worker.conn.recv()
+                        worker.ready = True
+                    except (EOFError, OSError):
+                        # Morrer antes de ficar pronto não é culpa de um PDF
+                        self.stats["startup_failures"] += 1
+                        if self.stats["startup_failures"] > 3 * self.workers:
+                            raise RuntimeError(
+                                "Workers de extração não iniciam (o script chamador tem "
+                                "a guarda `if __name__ == \"__main__\"`?)"
+                            )
+                        self._replace(worker)
+                        continue
+                    dispatch(worker)
+
+            finished: List[ExtractionResult] = []
+            for worker in busy:
+                key, path = worker.task
+                if worker.conn in ready:
+                    try:
+                        status, pages, sha256, error, seconds = worker.conn.recv()
+                    except (EOFError, OSError):
+                        # Worker morreu (ex: falta de memória num PDF enorme)
+                        status, pages, sha256, error = "failed", [], "", "worker encerrado inesperadamente"
+                        seconds = time.perf_counter() - worker.started
+                        worker.task = None
+                        self._replace(worker)
+                        worker = None
+                    else:
+                        worker.task = None
+                elif time.perf_counter() >= worker.deadline:
+                    status, pages, sha256 = "timeout", [], ""
+                    seconds = time.perf_counter() - worker.started
+                    error = f"extração excedeu {self.timeout:g}s"
+                    worker.task = None
+                    self._replace(worker)
+                    worker = None
+                    logger.warning(f"⏱️  {os.path.basename(path)}: {error}; worker reiniciado")
+                else:
+                    continue
+
+                self.stats[status] += 1
+                finished.append(ExtractionResult(
+                    key=key, path=path, status=status, pages=pages,
+                    sha256=sha256, error=error, seconds=round(seconds, 3)
+                ))
+                # Despacha o próximo antes de entregar o resultado (o
+                # substituto de um worker morto recebe ao ficar pronto)
+                if worker is not None:
+                    dispatch(worker)
+
+            for result in finished:
+                yield result
+
+    def close(self):
+        for worker in self._pool:
+            worker.stop()
+        self._pool = []
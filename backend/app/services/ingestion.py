@@ -0,0 +1,622 @@
+"""
+Pipeline de ingestão da base de conhecimento
+
+Cadeia de geradores com memória limitada:
+    descoberta → extração de páginas → limpeza → chunking com sobreposição
+    (CHUNK_SIZE/CHUNK_OVERLAP) → embeddings em lote → upsert em lote no
+    Qdrant + inserção em lote no PostgreSQL
+
+Cada estágio consome o anterior sob demanda, então só os documentos do
+lote em andamento ficam em memória.
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from qdrant_client.models import PointStruct
+from app.config import settings
+from app.database.session import SessionLocal
+from app.models.historical_case import HistoricalCase
+from app.ai.rag.embeddings import generate_embeddings
+from app.ai.rag.vectorstore import COLLECTION_NAME, init_collection, upsert_points
+from app.ai.rag.lexical_index import get_lexical_index, case_document
+from app.ai.rag.sections import extract_sections
+from app.services.extraction import ExtractionPool
+from app.services.text_store import ExtractedTextStore, get_text_store
+import hashlib
+import logging
+import time
+import uuid
+import re
+
+logger = logging.getLogger(__name__)
+
+# Pasta da knowledge_base → classificação do caso
+CATEGORY_RULES = {
+    "aprovados": {"approved": True, "score": 85},
+    "reprovados": {"approved": False, "score": 40},
+    "diligencias": {"approved": False, "score": 60},
+    "portarias": {"approved": False, "score": 60},
+    "exemplos": {"approved": False, "score": 60},
+}
+
+SUPPORTED_EXTENSIONS = (".pdf",)
+
+_POINT_NAMESPACE = uuid.UUID("6f1c1a52-6d0b-4e8e-9a53-9b7f0e0c5a11")
+
+
+@dataclass
+class SourceDocument:
+    path: Path
+    category: str
+    sha256: str = ""
+    # Preenchidos pela sincronização (manifesto): caso já existente e
+    # trechos gravados num lote confirmado antes de uma interrupção
+    case_id: Optional[int] = None
+    committed_points: Set[str] = field(default_factory=set)
+
+    @property
+    def title(self) -> str:
+        return self.path.stem[:200]
+
+
+@dataclass
+class ExtractedDocument:
+    source: SourceDocument
+    pages: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    case_id: Optional[int] = None
+    status: str = "ok"  # ok | failed | timeout
+    seconds: float = 0.0
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.pages)
+
+
+@dataclass
+class Chunk:
+    document: ExtractedDocument
+    index: int
+    text: str
+    page: int
+    point_id: str = ""
+    section: Optional[str] = None  # trecho de seção do formulário (aprovados)
+
+
+@dataclass
+class IngestStats:
+    documents: int = 0
+    pages: int = 0
+    chunks: int = 0
+    empty: int = 0
+    failed: int = 0
+    skipped: int = 0
+    resumed_chunks: int = 0
+    text_cache_hits: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    errors: List[Dict] = field(default_factory=list)
+    empty_files: List[str] = field(default_factory=list)
+    extraction: Dict = field(default_factory=dict)
+
+    def as_dict(self) -> Dict:
+        return {
+            "documents": self.documents,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "empty": self.empty,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "resumed_chunks": self.resumed_chunks,
+            "text_cache_hits": self.text_cache_hits,
+            "elapsed_seconds": round(time.perf_counter() - self.started_at, 2),
+            "errors": self.errors,
+            "empty_files": self.empty_files,
+            "extraction": self.extraction
+        }
+
+
+def chunk_point_id(document_key: str, index: int, size: int, overlap: int) -> str:
+    """Id determinístico do ponto: reingestões sobrescrevem, não duplicam"""
+    return str(uuid.uuid5(_POINT_NAMESPACE, f"{document_key}:{size}:{overlap}:{index}"))
+
+
+def section_point_id(document_key: str, section: str) -> str:
+    """Seções não dependem do chunking: mesmo id com qualquer CHUNK_SIZE"""
+    return str(uuid.uuid5(_POINT_NAMESPACE, f"{document_key}:section:{section}"))
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ── Estágios ──────────────────────────────────────────────────────
+
+def discover_documents(root: Path, categories: Optional[Iterable[str]] = None) -> Iterator[SourceDocument]:
+    """Percorre as pastas de categoria da knowledge_base"""
+    for category in categories or CATEGORY_RULES:
+        folder = root / category
+        if not folder.exists():
+            continue
+        for path in sorted(folder.rglob("*")):
+            if path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS:
+                yield SourceDocument(path=path, category=category)
+
+
+def extract_pages(sources: Iterable[SourceDocument]) -> Iterator[ExtractedDocument]:
+    """Extrai o texto página a página (pypdf)"""
+    from pypdf import PdfReader
+
+    for source in sources:
+        try:
+            source.sha256 = source.sha256 or file_sha256(source.path)
+            reader = PdfReader(str(source.path))
+            pages = [page.extract_text() or "" for page in reader.pages]
+            yield ExtractedDocument(source=source, pages=pages)
+        except Exception as e:
+            yield ExtractedDocument(source=source, error=f"{type(e).__name__}: {e}", status="failed")
+
+
+def extract_pages_parallel(sources: Iterable[SourceDocument], pool: ExtractionPool) -> Iterator[ExtractedDocument]:
+    """Como `extract_pages`, no pool de processos e na ordem de conclusão"""
+    for result in pool.imap_unordered((source, source.path) for source in sources):
+        source = result.key
+        source.sha256 = source.sha256 or result.sha256
+        yield ExtractedDocument(
+            source=source, pages=result.pages, error=result.error,
+            status=result.status, seconds=result.seconds
+        )
+
+
+def extract_pages_cached(
+    sources: Iterable[SourceDocument],
+    pool: ExtractionPool,
+    store: ExtractedTextStore,
+    on_hit: Optional[Callable[[ExtractedDocument], None]] = None
+) -> Iterator[ExtractedDocument]:
+    """
+    Texto já guardado (por sha256) sai direto do store; só os demais vão
+    ao pool, e o que ele extrair é guardado para as próximas execuções.
+    """
+    cached = deque()
+
+    def misses():
+        for source in sources:
+            if store.contains(source.sha256):
+                cached.append(source)  # só a referência; páginas lidas ao entregar
+            else:
+                yield source
+
+    def drain():
+        while cached:
+            source = cached.popleft()
+            pages = store.get(source.sha256)
+            if pages is None:
+                # Arquivo do store sumiu/corrompeu entre a consulta e a leitura
+                for document in extract_pages([source]):
+                    if document.status == "ok":
+                        store.put(source.sha256, document.pages)
+                    yield document
+                continue
+            document = ExtractedDocument(source=source, pages=pages)
+            if on_hit:
+                on_hit(document)
+            yield document
+
+    for document in extract_pages_parallel(misses(), pool):
+        yield from drain()
+        if document.status == "ok":
+            store.put(document.source.sha256, document.pages)
+        yield document
+    yield from drain()
+
+
+_HYPHEN_BREAK = re.compile(r"(\w)-\n(\w)")
+_CONTROL_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_SPACES = re.compile(r"[ \t ]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def clean_text(text: str) -> str:
+    text = _CONTROL_CHARS.sub(" ", text)
+    text = _HYPHEN_BREAK.sub(r"\1\2", text)
+    text = _SPACES.sub(" ", text)
+    text = _BLANK_LINES.sub("\n\n", text)
+    return "\n".join(line.strip() for line in text.splitlines()).strip()
+
+
+def clean_pages(documents: Iterable[ExtractedDocument]) -> Iterator[ExtractedDocument]:
+    for document in documents:
+        document.pages = [clean_text(page) for page in document.pages]
+        yield document
+
+
+def split_text(text: str, size: int, overlap: int) -> List[str]:
+    """Janelas de `size` caracteres com `overlap`, cortando em espaço"""
+    text = text.strip()
+    if len(text) <= size:
+        return [text] if text else []
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            # Preferir terminar em fim de frase/linha/palavra
+            window = text[start:end]
+            cut = max(window.rfind(". "), window.rfind("\n"))
+            if cut < size // 2:
+                cut = window.rfind(" ")
+            if cut >= size // 2:
+                end = start + cut + 1
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [c for c in chunks if c]
+
+
+def chunk_documents(
+    documents: Iterable[ExtractedDocument],
+    size: int,
+    overlap: int,
+    on_skip: Optional[Callable[[ExtractedDocument, str], None]] = None,
+    sections: bool = False
+) -> Iterator[Chunk]:
+    """
+    Divide cada documento em trechos sobrepostos (página de origem
+    anotada). Com `sections`, projetos aprovados ganham também um trecho
+    por seção do formulário (justificativa, objetivos...).
+    """
+    for document in documents:
+        if document.error:
+            if on_skip:
+                on_skip(document, "failed")
+            continue
+
+        text = document.text
+        if len(text) < 50:
+            if on_skip:
+                on_skip(document, "empty")
+            continue
+
+        # Offsets de início de cada página para anotar a origem do trecho
+        page_starts, offset = [], 0
+        for page in document.pages:
+            page_starts.append(offset)
+            offset += len(page) + 1
+
+        def page_of(position: int) -> int:
+            return sum(1 for start in page_starts if start <= position)
+
+        position, index = 0, -1
+        for index, chunk_text in enumerate(split_text(text, size, overlap)):
+            found = text.find(chunk_text[:50], position)
+            position = found if found >= 0 else position
+            yield Chunk(
+                document=document, index=index, text=chunk_text, page=page_of(position),
+                point_id=chunk_point_id(document.source.sha256, index, size, overlap)
+            )
+
+        if not (sections and CATEGORY_RULES.get(document.source.category, {}).get("approved")):
+            continue
+        for offset, (section, section_text) in enumerate(extract_sections(text).items(), 1):
+            # O texto da seção tem espaços normalizados: localiza pelo início
+            found = text.find(section_text[:30])
+            yield Chunk(
+                document=document, index=index + offset, text=section_text,
+                page=page_of(max(found, 0)), section=section,
+                point_id=section_point_id(document.source.sha256, section)
+            )
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def embed_batches(chunks: Iterable[Chunk], batch_size: int) -> Iterator[List[Tuple[Chunk, List[float]]]]:
+    for batch in batched(chunks, batch_size):
+        vectors = generate_embeddings([chunk.text for chunk in batch])
+        yield list(zip(batch, vectors))
+
+
+# ── Escrita ───────────────────────────────────────────────────────
+
+# vector_id de um caso cujos trechos ainda não foram todos gravados: só o
+# sha256 puro (caso completo) faz a ingestão comum pular o arquivo
+PARTIAL_PREFIX = "partial:"
+
+_INSTITUTION = re.compile(r"(APAE|Associa[cç][aã]o|Instituto|Hospital|Funda[cç][aã]o)[^\n]{0,60}", re.I)
+_YEAR = re.compile(r"\b(20[12]\d)\b")
+
+
+def build_case(document: ExtractedDocument) -> HistoricalCase:
+    source = document.source
+    rules = CATEGORY_RULES.get(source.category, {"approved": False, "score": 60})
+    text = document.text
+
+    institution = _INSTITUTION.search(source.path.stem) or _INSTITUTION.search(text[:2000])
+    year = _YEAR.search(source.path.stem) or _YEAR.search(text[:3000])
+
+    return HistoricalCase(
+        project_title=source.title,
+        institution_name=(institution.group(0).strip() if institution else "Instituição")[:200],
+        year=int(year.group(1)) if year else None,
+        field="prestacao_servicos_medico_assistenciais",
+        priority_area="Reabilitação",
+        is_approved=rules["approved"],
+        score=rules["score"],
+        full_text=text,
+        summary=text[:500],
+        key_points=[],
+        rejection_reasons=[],
+        vector_id=PARTIAL_PREFIX + source.sha256
+    )
+
+
+def chunk_payload(chunk: Chunk) -> Dict:
+    document = chunk.document
+    source = document.source
+    rules = CATEGORY_RULES.get(source.category, {"approved": False, "score": 60})
+    return {
+        "case_id": document.case_id,
+        "chunk_index": chunk.index,
+        "page": chunk.page,
+        "title": source.title,
+        "category": source.category,
+        "source": source.path.name,
+        "field": "prestacao_servicos_medico_assistenciais",
+        "approved": rules["approved"],
+        "score": rules["score"],
+        "year": _year_of(document),
+        "section": chunk.section,
+        "text": chunk.text
+    }
+
+
+def _year_of(document: ExtractedDocument) -> Optional[int]:
+    match = _YEAR.search(document.source.path.stem) or _YEAR.search(document.text[:3000])
+    return int(match.group(1)) if match else None
+
+
+class IngestionPipeline:
+    """
+    Orquestra os estágios e grava os lotes.
+
+    `on_document(documento, status)` é chamado quando um documento termina
+    (ingested/empty/failed/skipped); `on_batch(trechos)` depois que um lote
+    foi confirmado no banco e no Qdrant; `should_cancel()` é consultado
+    entre lotes.
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        skip_existing: bool = True,
+        extract_workers: Optional[int] = None,
+        extract_timeout: Optional[float] = None,
+        use_text_store: Optional[bool] = None,
+        index_sections: Optional[bool] = None,
+        collection_name: str = COLLECTION_NAME,
+        on_document: Optional[Callable[[ExtractedDocument, str], None]] = None,
+        on_batch: Optional[Callable[[List[Chunk]], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None
+    ):
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.chunk_size = chunk_size or settings.CHUNK_SIZE
+        self.chunk_overlap = settings.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        self.skip_existing = skip_existing
+        self._db = None
+        self.extract_workers = settings.INGEST_EXTRACT_WORKERS if extract_workers is None else extract_workers
+        self.extract_timeout = extract_timeout or settings.INGEST_EXTRACT_TIMEOUT
+        self.use_text_store = settings.TEXT_STORE_ENABLED if use_text_store is None else use_text_store
+        self.index_sections = settings.SECTION_INDEX_ENABLED if index_sections is None else index_sections
+        self.collection_name = collection_name
+        self.on_document = on_document
+        self.on_batch = on_batch
+        self.should_cancel = should_cancel or (lambda: False)
+        self.stats = IngestStats()
+        self.cancelled = False
+
+    def _notify(self, document: ExtractedDocument, status: str):
+        if status == "failed":
+            self.stats.failed += 1
+            self.stats.errors.append({
+                "file": str(document.source.path),
+                "status": document.status,
+                "error": document.error,
+                "seconds": document.seconds
+            })
+        elif status == "empty":
+            self.stats.empty += 1
+            self.stats.empty_files.append(str(document.source.path))
+        elif status == "skipped":
+            self.stats.skipped += 1
+        if self.on_document:
+            self.on_document(document, status)
+
+    def _filter_existing(self, sources: Iterable[SourceDocument], db) -> Iterator[SourceDocument]:
+        seen = set()
+        for source in sources:
+            try:
+                source.sha256 = source.sha256 or file_sha256(source.path)
+            except OSError as e:
+                self._notify(ExtractedDocument(source=source, error=str(e), status="failed"), "failed")
+                continue
+
+            # Cópias do mesmo arquivo com nomes diferentes entram uma vez só
+            duplicate = source.sha256 in seen
+            seen.add(source.sha256)
+            if duplicate or (self.skip_existing and db.query(HistoricalCase.id).filter(
+                HistoricalCase.vector_id == source.sha256
+            ).first()):
+                self._notify(ExtractedDocument(source=source), "skipped")
+                continue
+            yield source
+
+    def _count_text_hit(self, document: ExtractedDocument):
+        self.stats.text_cache_hits += 1
+
+    def _count_pages(self, documents: Iterable[ExtractedDocument]) -> Iterator[ExtractedDocument]:
+        for document in documents:
+            self.stats.pages += len(document.pages)
+            yield document
+
+    def stages(
+        self, sources: Iterable[SourceDocument], db, pool: ExtractionPool
+    ) -> Iterator[List[Tuple[Chunk, List[float]]]]:
+        """Monta a cadeia de geradores até os lotes com embeddings"""
+        sources = self._filter_existing(sources, db)
+        if self.use_text_store:
+            documents = extract_pages_cached(sources, pool, get_text_store(), on_hit=self._count_text_hit)
+        else:
+            documents = extract_pages_parallel(sources, pool)
+        documents = self._count_pages(clean_pages(documents))
+        chunks = chunk_documents(
+            documents, self.chunk_size, self.chunk_overlap, on_skip=self._notify, sections=self.index_sections
+        )
+        return embed_batches(self._skip_committed(chunks), self.batch_size)
+
+    def _skip_committed(self, chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+        """Retomada: trechos de lotes já confirmados não são recalculados"""
+        last, emitted = None, False
+        for chunk in chunks:
+            document = chunk.document
+            if document is not last:
+                if last is not None and not emitted:
+                    self._finish_resumed(last)
+                last, emitted = document, False
+            if chunk.point_id in document.source.committed_points:
+                self.stats.resumed_chunks += 1
+                continue
+            emitted = True
+            yield chunk
+        if last is not None and not emitted:
+            self._finish_resumed(last)
+
+    def _finish_resumed(self, document: ExtractedDocument):
+        document.case_id = document.source.case_id
+        self._mark_complete(self._db, [document])
+        self.stats.documents += 1
+        self._notify(document, "ingested")
+
+    def _mark_complete(self, db, documents: List[ExtractedDocument]):
+        """Todos os trechos gravados: o caso passa a contar como ingerido"""
+        documents = [d for d in documents if d.case_id is not None]
+        if not documents or db is None:
+            return
+        for document in documents:
+            db.query(HistoricalCase).filter(HistoricalCase.id == document.case_id).update(
+                {HistoricalCase.vector_id: document.source.sha256}, synchronize_session=False
+            )
+        db.commit()
+
+    def _write_batch(self, db, batch: List[Tuple[Chunk, List[float]]], open_documents: Dict):
+        # Inserção em lote dos casos novos deste lote (um flush/commit)
+        new_documents = []
+        for chunk, _ in batch:
+            document = chunk.document
+            if id(document) not in open_documents:
+                open_documents[id(document)] = document
+                new_documents.append(document)
+
+        if new_documents:
+            # Reingestão (--force) e retomada de um caso parcial atualizam o
+            # caso do mesmo arquivo em vez de duplicar
+            keys = [d.source.sha256 for d in new_documents]
+            existing = {
+                case.vector_id.removeprefix(PARTIAL_PREFIX): case
+                for case in db.query(HistoricalCase).filter(
+                    HistoricalCase.vector_id.in_(keys + [PARTIAL_PREFIX + key for key in keys])
+                )
+            }
+            cases = []
+            for document in new_documents:
+                case = build_case(document)
+                current = existing.get(document.source.sha256)
+                case_id = document.source.case_id or (current.id if current is not None else None)
+                if case_id is not None:
+                    case.id = case_id
+                    case = db.merge(case)
+                cases.append(case)
+            db.add_all(cases)
+            db.flush()
+            for document, case in zip(new_documents, cases):
+                document.case_id = case.id
+            db.commit()
+            get_lexical_index().add_documents(case_document(case) for case in cases)
+
+        points = [
+            PointStruct(id=chunk.point_id, vector=vector, payload=chunk_payload(chunk))
+            for chunk, vector in batch
+        ]
+        upsert_points(points, collection_name=self.collection_name)
+        self.stats.chunks += len(points)
+        if self.on_batch:
+            self.on_batch([chunk for chunk, _ in batch])
+
+    def _finish_documents(self, db, open_documents: Dict, keep: Optional[ExtractedDocument] = None):
+        """Documentos cujo último trecho já foi gravado saem da memória"""
+        finished = [document for document in open_documents.values() if document is not keep]
+        self._mark_complete(db, finished)
+        for document in finished:
+            del open_documents[id(document)]
+            self.stats.documents += 1
+            self._notify(document, "ingested")
+
+    def run(self, sources: Iterable[SourceDocument]) -> IngestStats:
+        init_collection(self.collection_name)
+        db = self._db = SessionLocal()
+        open_documents: Dict[int, ExtractedDocument] = {}
+        lexical_index = get_lexical_index()
+        pool = ExtractionPool(self.extract_workers, self.extract_timeout)
+        last_commit = 0
+
+        try:
+            for batch in self.stages(sources, db, pool):
+                if self.should_cancel():
+                    self.cancelled = True
+                    logger.warning("⛔ Ingestão cancelada")
+                    break
+
+                self._write_batch(db, batch, open_documents)
+                # O último documento do lote pode continuar no próximo
+                self._finish_documents(db, open_documents, keep=batch[-1][0].document)
+
+                if self.stats.documents - last_commit >= 50:
+                    lexical_index.commit()
+                    last_commit = self.stats.documents
+
+            if not self.cancelled:
+                self._finish_documents(db, open_documents)
+        finally:
+            pool.close()
+            self.stats.extraction = dict(pool.stats, workers=pool.workers)
+            lexical_index.commit()
+            db.close()
+
+        return self.stats
+
+
+def ingest_knowledge_base(
+    root: Optional[str] = None,
+    categories: Optional[Iterable[str]] = None,
+    **kwargs
+) -> IngestStats:
+    """Ingestão completa das pastas da knowledge_base"""
+    root_path = Path(root or settings.KNOWLEDGE_BASE_PATH)
+    pipeline = IngestionPipeline(**kwargs)
+    return pipeline.run(discover_documents(root_path, categories))
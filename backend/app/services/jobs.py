@@ -0,0 +1,446 @@
+"""
+Fila de jobs em segundo plano (ingestão da knowledge_base)
+
+A API só enfileira; um pool de workers (threads, JOB_WORKERS) executa.
+Com Redis (REDIS_URL) a fila e o estado dos jobs ficam no Redis e podem
+ser consumidos por outro processo (scripts/ingest_worker.py); sem Redis,
+uma fila em memória no próprio processo faz o mesmo papel.
+
+Chaves no Redis:
+    pronas:jobs:queue          lista de ids a executar (LPUSH/BRPOP)
+    pronas:jobs:index          zset id → criação (listagem)
+    pronas:job:<id>            estado do job (JSON)
+    pronas:job:<id>:results    resultados por arquivo (lista JSON)
+    pronas:job:<id>:cancel     flag de cancelamento
+    pronas:job:<id>:heartbeat  renovado enquanto o worker executa o job
+
+Um job "running" sem heartbeat (processo do worker caiu) é marcado como
+"failed" pelos workers de qualquer processo (`recover_stale`). Jobs de
+processos diferentes que gravam no índice se revezam pelo
+`index_write_lock` (app/services/manifest.py).
+"""
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from app.config import settings
+import threading
+import logging
+import queue
+import json
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    params: Dict = field(default_factory=dict)
+    status: str = "queued"  # queued | running | succeeded | failed | cancelled
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Dict = field(default_factory=lambda: {"total": 0, "done": 0, "current": None})
+    summary: Dict = field(default_factory=dict)
+    error: Optional[str] = None
+    worker: Optional[str] = None
+
+    def as_dict(self) -> Dict:
+        data = asdict(self)
+        total = self.progress.get("total") or 0
+        data["progress"]["percent"] = round(100 * self.progress.get("done", 0) / total, 1) if total else None
+        return data
+
+
+class LocalJobStore:
+    """Fila e estado em memória (um único processo)"""
+
+    name = "local"
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict] = {}
+        self._results: Dict[str, List[Dict]] = {}
+        self._cancel = set()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._lock = threading.Lock()
+
+    def save(self, job: Job):
+        with self._lock:
+            self._jobs[job.id] = asdict(job)
+
+    def load(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            data = self._jobs.get(job_id)
+        return Job(**data) if data else None
+
+    def list(self, limit: int) -> List[Job]:
+        with self._lock:
+            rows = sorted(self._jobs.values(), key=lambda j: j["created_at"], reverse=True)[:limit]
+        return [Job(**row) for row in rows]
+
+    def enqueue(self, job_id: str):
+        self._queue.put(job_id)
+
+    def dequeue(self, timeout: float) -> Optional[str]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def add_result(self, job_id: str, result: Dict):
+        with self._lock:
+            self._results.setdefault(job_id, []).append(result)
+
+    def results(self, job_id: str, offset: int, limit: int) -> List[Dict]:
+        with self._lock:
+            return list(self._results.get(job_id, [])[offset:offset + limit])
+
+    def request_cancel(self, job_id: str):
+        with self._lock:
+            self._cancel.add(job_id)
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return job_id in self._cancel
+
+    def heartbeat(self, job_ids: Iterable[str], ttl_seconds: float):
+        """Jobs em memória morrem com o processo: nada a sinalizar"""
+
+    def alive(self, job_id: str) -> bool:
+        return True
+
+    def expire(self, job_id: str):
+        """Sem TTL em memória: mantém só os últimos jobs"""
+        with self._lock:
+            if len(self._jobs) <= 500:
+                return
+            oldest = sorted(
+                (j for j in self._jobs.values() if j["status"] in FINAL_STATUSES),
+                key=lambda j: j["created_at"]
+            )
+            for row in oldest[:len(self._jobs) - 500]:
+                self._jobs.pop(row["id"], None)
+                self._results.pop(row["id"], None)
+                self._cancel.discard(row["id"])
+
+
+class RedisJobStore:
+    name = "redis"
+    prefix = "pronas:job:"
+    queue_key = "pronas:jobs:queue"
+    index_key = "pronas:jobs:index"
+
+    def __init__(self, url: str, ttl_seconds: int):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=5)
+        self.client.ping()
+        self.ttl_seconds = ttl_seconds
+
+    def save(self, job: Job):
+        self.client.set(self.prefix + job.id, json.dumps(asdict(job), ensure_ascii=False))
+        self.client.zadd(self.index_key, {job.id: job.created_at})
+
+    def load(self, job_id: str) -> Optional[Job]:
+        raw = self.client.get(self.prefix + job_id)
+        return Job(**json.loads(raw)) if raw else None
+
+    def list(self, limit: int) -> List[Job]:
+        ids = [i.decode() for i in self.client.zrevrange(self.index_key, 0, limit - 1)]
+        jobs = [self.load(job_id) for job_id in ids]
+        return [job for job in jobs if job is not None]
+
+    def enqueue(self, job_id: str):
+        self.client.lpush(self.queue_key, job_id)
+
+    def dequeue(self, timeout: float) -> Optional[str]:
+        item = self.client.brpop(self.queue_key, timeout=max(1, int(timeout)))
+        return item[1].decode() if item else None
+
+    def add_result(self, job_id: str, result: Dict):
+        self.client.rpush(self.prefix + job_id + ":results", json.dumps(result, ensure_ascii=False))
+
+    def results(self, job_id: str, offset: int, limit: int) -> List[Dict]:
+        rows = self.client.lrange(self.prefix + job_id + ":results", offset, offset + limit - 1)
+        return [json.loads(row) for row in rows]
+
+    def request_cancel(self, job_id: str):
+        self.client.set(self.prefix + job_id + ":cancel", 1, ex=self.ttl_seconds)
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return bool(self.client.exists(self.prefix + job_id + ":cancel"))
+
+    def heartbeat(self, job_ids: Iterable[str], ttl_seconds: float):
+        pipeline = self.client.pipeline()
+        for job_id in job_ids:
+            pipeline.set(self.prefix + job_id + ":heartbeat", 1, ex=max(1, int(ttl_seconds)))
+        pipeline.execute()
+
+    def alive(self, job_id: str) -> bool:
+        return bool(self.client.exists(self.prefix + job_id + ":heartbeat"))
+
+    def expire(self, job_id: str):
+        for suffix in ("", ":results", ":cancel"):
+            self.client.expire(self.prefix + job_id + suffix, self.ttl_seconds)
+        self.client.zremrangebyscore(self.index_key, 0, time.time() - self.ttl_seconds)
+
+
+def build_store():
+    backend = settings.JOB_BACKEND
+    if backend in ("auto", "redis"):
+        try:
+            return RedisJobStore(settings.REDIS_URL, settings.JOB_TTL_SECONDS)
+        except Exception as e:
+            if backend == "redis":
+                raise
+            logger.warning(f"⚠️  Redis indisponível para a fila de jobs ({e}); usando fila local")
+    return LocalJobStore()
+
+
+class JobContext:
+    """O que um handler usa para reportar progresso e checar cancelamento"""
+
+    def __init__(self, queue: "JobQueue", job: Job):
+        self._queue = queue
+        self.job = job
+        self._cancel_checked_at = 0.0
+        self._cancelled = False
+
+    def set_total(self, total: int):
+        self.job.progress["total"] = total
+        self._queue.store.save(self.job)
+
+    def advance(self, current: Optional[str] = None, result: Optional[Dict] = None):
+        self.job.progress["done"] += 1
+        self.job.progress["current"] = current
+        if result is not None:
+            self._queue.store.add_result(self.job.id, result)
+        self._queue.store.save(self.job)
+
+    def cancelled(self) -> bool:
+        # Consulta o store no máximo a cada 0,5s
+        now = time.monotonic()
+        if not self._cancelled and now - self._cancel_checked_at >= 0.5:
+            self._cancel_checked_at = now
+            self._cancelled = self._queue.store.cancel_requested(self.job.id)
+        return self._cancelled
+
+
+class JobQueue:
+    def __init__(self):
+        self._store = None
+        self._store_lock = threading.Lock()
+        self.handlers: Dict[str, Callable[[Dict, JobContext], Dict]] = {}
+        self._threads: List[threading.Thread] = []
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._running: Set[str] = set()
+        self._running_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._store_lock:
+                if self._store is None:
+                    self._store = build_store()
+        return self._store
+
+    def register(self, kind: str, handler: Callable[[Dict, JobContext], Dict]):
+        self.handlers[kind] = handler
+
+    # ── API ────────────────────────────────────────────────────────
+
+    def submit(self, kind: str, params: Optional[Dict] = None) -> Job:
+        if kind not in self.handlers:
+            raise ValueError(f"Tipo de job desconhecido: {kind}")
+        job = Job(id=uuid.uuid4().hex, kind=kind, params=params or {})
+        self.store.save(job)
+        self.store.enqueue(job.id)
+        logger.info(f"📥 Job {job.id} ({kind}) enfileirado")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.store.load(job_id)
+
+    def list(self, limit: int = 20) -> List[Job]:
+        return self.store.list(limit)
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Dict]:
+        return self.store.results(job_id, offset, limit)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.store.load(job_id)
+        if job is None or job.status in FINAL_STATUSES:
+            return job
+        self.store.request_cancel(job_id)
+        if job.status == "queued":
+            # Ainda na fila: o worker descarta ao retirar
+            job.status, job.finished_at = "cancelled", time.time()
+            self.store.save(job)
+            self.store.expire(job_id)
+        return job
+
+    # ── Workers ────────────────────────────────────────────────────
+
+    def _execute(self, job_id: str, worker_name: str):
+        job = self.store.load(job_id)
+        if job is None or job.status != "queued":
+            return
+
+        with self._running_lock:
+            self._running.add(job.id)
+        self.store.heartbeat([job.id], settings.JOB_HEARTBEAT_SECONDS * 3)
+        job.status, job.started_at, job.worker = "running", time.time(), worker_name
+        self.store.save(job)
+        context = JobContext(self, job)
+        logger.info(f"▶️  Job {job.id} ({job.kind}) iniciado em {worker_name}")
+
+        try:
+            job.summary = self.handlers[job.kind](job.params, context) or {}
+            job.status = "cancelled" if self.store.cancel_requested(job.id) else "succeeded"
+        except Exception as e:
+            logger.exception(f"❌ Job {job.id} falhou")
+            job.status, job.error = "failed", f"{type(e).__name__}: {e}"
+        finally:
+            job.finished_at = time.time()
+            job.progress["current"] = None
+            self.store.save(job)
+            self.store.expire(job.id)
+            with self._running_lock:
+                self._running.discard(job.id)
+            logger.info(f"⏹️  Job {job.id}: {job.status}")
+
+    def recover_stale(self, limit: int = 200) -> int:
+        """Marca como "failed" os jobs "running" cujo worker parou de renovar o heartbeat"""
+        recovered = 0
+        for job in self.store.list(limit):
+            if job.status != "running" or job.id in self._running or self.store.alive(job.id):
+                continue
+            job.status, job.finished_at = "failed", time.time()
+            job.error = f"Worker {job.worker} interrompido durante a execução (sem heartbeat)"
+            job.progress["current"] = None
+            self.store.save(job)
+            self.store.expire(job.id)
+            recovered += 1
+            logger.warning(f"⚠️  Job {job.id} ({job.kind}) abandonado por {job.worker}: marcado como failed")
+        return recovered
+
+    def _heartbeat_loop(self):
+        interval = settings.JOB_HEARTBEAT_SECONDS
+        while not self._stopping.wait(interval):
+            try:
+                with self._running_lock:
+                    running = list(self._running)
+                if running:
+                    self.store.heartbeat(running, interval * 3)
+                self.recover_stale()
+            except Exception as e:
+                logger.error(f"❌ Erro no heartbeat dos jobs: {e}")
+
+    def _worker_loop(self, worker_name: str):
+        while not self._stopping.is_set():
+            try:
+                job_id = self.store.dequeue(timeout=1.0)
+            except Exception as e:
+                logger.error(f"❌ Erro lendo a fila de jobs: {e}")
+                self._stopping.wait(5)
+                continue
+            if job_id:
+                self._execute(job_id, worker_name)
+
+    def start(self, workers: Optional[int] = None, prefix: str = "api"):
+        """Inicia o pool de workers (paralelismo limitado a `workers` jobs)"""
+        workers = settings.JOB_WORKERS if workers is None else workers
+        self._stopping.clear()
+        for i in range(workers - len(self._threads)):
+            thread = threading.Thread(
+                target=self._worker_loop, args=(f"{prefix}-{i + 1}",),
+                name=f"job-worker-{i + 1}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        if workers:
+            logger.info(f"👷 {workers} workers de jobs ({self.store.name})")
+            try:
+                self.recover_stale()
+            except Exception as e:
+                logger.error(f"❌ Erro recuperando jobs abandonados: {e}")
+            if self._heartbeat_thread is None:
+                self._heartbeat_thread = threading.Thread(
+                    target=self._heartbeat_loop, name="job-heartbeat", daemon=True
+                )
+                self._heartbeat_thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(timeout=timeout)
+            self._heartbeat_thread = None
+
+    def get_stats(self) -> Dict:
+        return {
+            "backend": self.store.name,
+            "workers": len(self._threads),
+            "handlers": sorted(self.handlers)
+        }
+
+
+job_queue = JobQueue()
+
+
+# ── Handlers ──────────────────────────────────────────────────────
+
+def run_knowledge_sync(params: Dict, context: JobContext) -> Dict:
+    """Sincroniza a knowledge_base (toda ou só `paths`) com o índice"""
+    from app.services.sync import sync_knowledge_base
+
+    def on_plan(plan):
+        context.set_total(len(plan.to_ingest))
+
+    def on_document(document, status):
+        context.advance(current=document.source.path.name, result={
+            "file": document.source.path.name,
+            "category": document.source.category,
+            "status": status,
+            "case_id": document.case_id,
+            "error": document.error,
+            "seconds": document.seconds
+        })
+
+    result = sync_knowledge_base(
+        categories=params.get("categories"),
+        paths=params.get("paths"),
+        extract_workers=settings.JOB_EXTRACT_WORKERS,
+        on_plan=on_plan,
+        on_document=on_document,
+        should_cancel=context.cancelled
+    )
+    stats = result.get("stats", {})
+    stats.pop("errors", None)
+    return {"plan": {k: (v if isinstance(v, int) else len(v)) for k, v in result["plan"].items()}, "stats": stats}
+
+
+def run_knowledge_reindex(params: Dict, context: JobContext) -> Dict:
+    """Nova versão da coleção (blue/green); troca o alias se validada"""
+    from app.services.reindex import reindex_collection
+
+    def on_document(document, status):
+        context.advance(current=document.source.path.name)
+
+    result = reindex_collection(
+        switch=params.get("switch", True),
+        extract_workers=settings.JOB_EXTRACT_WORKERS,
+        on_plan=lambda sources: context.set_total(len(sources)),
+        on_document=on_document,
+        should_cancel=context.cancelled
+    )
+    result["stats"].pop("errors", None)
+    return result
+
+
+job_queue.register("knowledge_sync", run_knowledge_sync)
+job_queue.register("knowledge_reindex", run_knowledge_reindex)
@@ -0,0 +1,220 @@
+"""
+Manifesto da ingestão: o que já está no Qdrant/banco para cada arquivo
+
+Cada entrada guarda (caminho, tamanho, mtime, sha256, modelo, parâmetros
+de chunking) → ids dos pontos e caso no banco. A sincronização compara o
+manifesto com a knowledge_base e só processa o que mudou.
+
+Arquivos em INGEST_MANIFEST_PATH:
+    manifest.json    snapshot {caminho relativo: entrada}
+    journal.jsonl    operações desde o último snapshot (uma por lote
+                     confirmado); reaplicadas na abertura, o que permite
+                     retomar após uma queda a partir do último lote
+    index.lock       lock entre processos das escritas no índice
+                     (`index_write_lock`)
+"""
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.config import settings
+from app.utils.process_lock import ProcessLock
+import threading
+import logging
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ManifestEntry:
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    model: str
+    chunk_size: int
+    chunk_overlap: int
+    category: str = ""
+    case_id: Optional[int] = None
+    point_ids: List[str] = field(default_factory=list)
+    status: str = "partial"  # partial | complete | empty | duplicate
+    duplicate_of: Optional[str] = None
+    updated_at: float = field(default_factory=time.time)
+
+    def matches_params(self, model: str, chunk_size: int, chunk_overlap: int) -> bool:
+        return (self.model, self.chunk_size, self.chunk_overlap) == (model, chunk_size, chunk_overlap)
+
+
+class IngestManifest:
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or settings.INGEST_MANIFEST_PATH)
+        self._lock = threading.Lock()
+        self.entries: Dict[str, ManifestEntry] = {}
+        self._journal_lines = 0
+        self._disk: Tuple = ()
+        self._load()
+
+    @property
+    def _snapshot_file(self) -> Path:
+        return self.path / "manifest.json"
+
+    @property
+    def _journal_file(self) -> Path:
+        return self.path / "journal.jsonl"
+
+    def _signature(self) -> Tuple:
+        """(mtime, tamanho) dos arquivos: muda quando outro processo grava"""
+        signature = []
+        for file in (self._snapshot_file, self._journal_file):
+            try:
+                stat = file.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _load(self):
+        self._disk = self._signature()
+        if self._snapshot_file.exists():
+            data = json.loads(self._snapshot_file.read_text())
+            self.entries = {p: ManifestEntry(**e) for p, e in data.get("entries", {}).items()}
+
+        if self._journal_file.exists():
+            with open(self._journal_file, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, TypeError):
+                        # Última linha truncada por uma queda no meio da escrita
+                        logger.warning("⚠️  Linha inválida no journal do manifesto ignorada")
+                        break
+                    self._journal_lines += 1
+
+    def _apply(self, op: Dict):
+        if op["op"] == "put":
+            self.entries[op["entry"]["path"]] = ManifestEntry(**op["entry"])
+        elif op["op"] == "delete":
+            self.entries.pop(op["path"], None)
+
+    def _append(self, op: Dict):
+        """Aplica e registra a operação (durável antes de retornar)"""
+        with self._lock:
+            self._apply(op)
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self._journal_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(op, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_lines += 1
+            self._disk = self._signature()
+
+    def refresh(self) -> bool:
+        """Relê do disco se outro processo gravou desde a última leitura"""
+        with self._lock:
+            if self._signature() == self._disk:
+                return False
+            self.entries = {}
+            self._journal_lines = 0
+            self._load()
+        logger.info("🔄 Manifesto relido (alterado por outro processo)")
+        return True
+
+    # ── API ────────────────────────────────────────────────────────
+
+    def get(self, path: str) -> Optional[ManifestEntry]:
+        return self.entries.get(path)
+
+    def put(self, entry: ManifestEntry):
+        entry.updated_at = time.time()
+        self._append({"op": "put", "entry": asdict(entry)})
+
+    def delete(self, path: str):
+        self._append({"op": "delete", "path": path})
+
+    def snapshot(self) -> List[ManifestEntry]:
+        """Cópia da lista de entradas (seguro com outros jobs gravando)"""
+        with self._lock:
+            return list(self.entries.values())
+
+    def by_sha256(self, sha256: str) -> Iterator[ManifestEntry]:
+        return (e for e in self.snapshot() if e.sha256 == sha256)
+
+    def replace(self, entries: Dict[str, ManifestEntry]):
+        """Troca todas as entradas (ativação de outra versão da coleção)"""
+        with self._lock:
+            self.entries = dict(entries)
+        self.checkpoint()
+
+    def checkpoint(self):
+        """Grava o snapshot e zera o journal"""
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            tmp = self.path / "manifest.json.tmp"
+            tmp.write_text(json.dumps(
+                {"version": 1, "entries": {p: asdict(e) for p, e in self.entries.items()}},
+                ensure_ascii=False
+            ))
+            os.replace(tmp, self._snapshot_file)
+            self._journal_file.unlink(missing_ok=True)
+            self._journal_lines = 0
+            self._disk = self._signature()
+
+    def get_stats(self) -> Dict:
+        statuses: Dict[str, int] = {}
+        entries = self.snapshot()
+        for entry in entries:
+            statuses[entry.status] = statuses.get(entry.status, 0) + 1
+        return {
+            "files": len(entries),
+            "points": sum(len(e.point_ids) for e in entries),
+            "by_status": statuses,
+            "pending_journal_ops": self._journal_lines
+        }
+
+
+_manifest: Optional[IngestManifest] = None
+_manifest_lock = threading.Lock()
+
+def get_manifest() -> IngestManifest:
+    """Instância compartilhada do processo (jobs simultâneos usam a mesma)"""
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                _manifest = IngestManifest()
+    else:
+        _manifest.refresh()
+    return _manifest
+
+
+_index_lock = ProcessLock(str(Path(settings.INGEST_MANIFEST_PATH) / "index.lock"))
+
+
+@contextmanager
+def index_write_lock(manifest: Optional[IngestManifest] = None):
+    """
+    Exclusão entre processos para quem grava no índice (sincronização,
+    reindexação, troca de versão, importação)
+
+    Manifesto, índice lexical e as reservas de arquivos em andamento são
+    estado do processo: dois processos gravando ao mesmo tempo (vários
+    workers da API, ingest_worker.py) se sobrescreveriam. Threads do mesmo
+    processo seguram o lock juntas. Ao obtê-lo, manifesto e índice lexical
+    são relidos se outro processo os alterou.
+    """
+    from app.ai.rag.lexical_index import get_lexical_index
+
+    first = _index_lock.acquire(blocking=False)
+    if first is None:
+        logger.info("⏳ Índice em uso por outro processo; aguardando")
+        first = _index_lock.acquire()
+    try:
+        if first:
+            (manifest or get_manifest()).refresh()
+            get_lexical_index().refresh()
+        yield
+    finally:
+        _index_lock.release()
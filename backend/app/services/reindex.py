@@ -0,0 +1,394 @@
+"""
+Reindexação sem parada (coleções blue/green atrás de um alias)
+
+As buscas leem o alias COLLECTION_NAME. A reindexação:
+    1. cria uma coleção nova (<alias>_v<data>) com a dimensão do modelo
+       de embeddings atual
+    2. reprocessa nela os documentos do manifesto (texto do text store,
+       upserts limitados a REINDEX_MAX_POINTS_PER_SECOND) enquanto a
+       coleção ativa continua atendendo
+    3. valida: pontos na coleção = trechos gravados, nenhuma falha e
+       recall de uma amostra de trechos (o próprio texto como consulta
+       deve trazer o caso entre os REINDEX_RECALL_TOP_K primeiros)
+    4. troca o alias numa única operação e ativa o manifesto da versão
+
+A coleção anterior é mantida: `activate_collection` / `rollback_collection`
+voltam o alias (e o manifesto) para ela; `prune_collections` apaga as
+versões antigas.
+
+Rode a reindexação com as configurações novas (EMBEDDING_MODEL,
+CHUNK_SIZE...) e atualize as da API junto com a troca — com `switch=False`
+a coleção fica pronta e a troca é feita depois por `activate_collection`.
+
+Versões em INGEST_MANIFEST_PATH/versions/<coleção>.json: parâmetros,
+validação e as entradas do manifesto correspondentes.
+"""
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from app.config import settings
+from app.ai.rag.embeddings import generate_embeddings
+from app.ai.rag.embedding_cache import model_fingerprint
+from app.ai.rag.vectorstore import (
+    COLLECTION_NAME, count_points, create_collection, delete_collection, list_collections,
+    new_collection_name, resolve_collection, search_collection, switch_alias
+)
+from app.services.ingestion import Chunk, ExtractedDocument, IngestionPipeline, SourceDocument, discover_documents
+from app.services.manifest import IngestManifest, ManifestEntry, get_manifest, index_write_lock
+from app.services.catalog import get_catalog
+from app.services.sync import claim_paths, release_paths
+import logging
+import random
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class _Throttle:
+    """Limita a vazão média de pontos gravados (não compete com as buscas)"""
+
+    def __init__(self, points_per_second: float):
+        self.rate = points_per_second
+        self.started = time.monotonic()
+        self.points = 0
+
+    def wait(self, points: int):
+        if self.rate <= 0:
+            return
+        self.points += points
+        delay = self.points / self.rate - (time.monotonic() - self.started)
+        if delay > 0:
+            time.sleep(delay)
+
+
+# ── Versões ────────────────────────────────────────────────────────
+
+def _version_file(manifest: IngestManifest, collection_name: str) -> Path:
+    return manifest.path / "versions" / f"{collection_name}.json"
+
+
+def _save_version(manifest: IngestManifest, collection_name: str, info: Dict, entries: Dict[str, ManifestEntry]):
+    path = _version_file(manifest, collection_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(
+        dict(info, collection=collection_name, entries={p: asdict(e) for p, e in entries.items()}),
+        ensure_ascii=False
+    ))
+    os.replace(tmp, path)
+
+
+def _load_version(manifest: IngestManifest, collection_name: str) -> Optional[Dict]:
+    path = _version_file(manifest, collection_name)
+    if not path.exists():
+        return None
+    data = json.loads(path.read_text())
+    data["entries"] = {p: ManifestEntry(**e) for p, e in data.get("entries", {}).items()}
+    return data
+
+
+def _snapshot_live(manifest: IngestManifest, live: Optional[str]):
+    """Guarda o manifesto atual como o da coleção ativa (para voltar a ela)"""
+    if live is None:
+        return
+    previous = _load_version(manifest, live) or {}
+    previous.pop("entries", None)
+    previous.pop("collection", None)
+    sample = next((e for e in manifest.snapshot() if e.status == "complete"), None)
+    if sample is not None:
+        previous.setdefault("model", sample.model)
+        previous.setdefault("chunk_size", sample.chunk_size)
+        previous.setdefault("chunk_overlap", sample.chunk_overlap)
+    _save_version(manifest, live, previous, {e.path: e for e in manifest.snapshot()})
+
+
+def list_versions(manifest: Optional[IngestManifest] = None) -> Dict:
+    manifest = manifest or get_manifest()
+    live = resolve_collection(COLLECTION_NAME)
+    versions = []
+    for name in list_collections(COLLECTION_NAME):
+        info = _load_version(manifest, name) or {}
+        versions.append({
+            "collection": name,
+            "active": name == live,
+            "points": count_points(name),
+            "created_at": info.get("created_at"),
+            "model": info.get("model"),
+            "chunk_size": info.get("chunk_size"),
+            "chunk_overlap": info.get("chunk_overlap"),
+            "validation": info.get("validation")
+        })
+    return {"alias": COLLECTION_NAME, "active": live, "versions": versions}
+
+
+# ── Ativação ───────────────────────────────────────────────────────
+
+def activate_collection(
+    collection_name: str,
+    manifest: Optional[IngestManifest] = None,
+    drop_legacy: bool = False
+) -> Dict:
+    """
+    Aponta o alias para `collection_name` e ativa o manifesto dela.
+
+    Uma coleção física com o nome do alias (instalação anterior aos
+    aliases) impede a troca no Qdrant; com `drop_legacy` ela é apagada
+    logo antes (buscas falham por um instante só nessa primeira troca).
+    """
+    with index_write_lock(manifest):
+        return _activate(collection_name, manifest or get_manifest(), drop_legacy)
+
+
+def _activate(collection_name: str, manifest: IngestManifest, drop_legacy: bool) -> Dict:
+    if collection_name not in list_collections(COLLECTION_NAME):
+        raise ValueError(f"Coleção inexistente: {collection_name}")
+    version = _load_version(manifest, collection_name)
+    if version is None:
+        raise ValueError(f"Sem manifesto salvo para {collection_name}")
+
+    live = resolve_collection(COLLECTION_NAME)
+    if live == collection_name:
+        return {"active": live, "previous": live}
+    if version.get("model") and version["model"] != model_fingerprint():
+        logger.warning(
+            f"⚠️  {collection_name} usa o modelo {version['model']}; ajuste EMBEDDING_MODEL "
+            f"(atual: {model_fingerprint()}) para as consultas"
+        )
+
+    _snapshot_live(manifest, live)
+    if live == COLLECTION_NAME and settings.VECTOR_STORE_BACKEND != "local":
+        if not drop_legacy:
+            raise RuntimeError(
+                f"'{COLLECTION_NAME}' é uma coleção, não um alias: use drop_legacy para "
+                f"substituí-la (não haverá rollback para ela)"
+            )
+        delete_collection(COLLECTION_NAME)
+
+    previous = switch_alias(collection_name, COLLECTION_NAME)
+    manifest.replace(version["entries"])
+    get_catalog().reconcile(manifest=manifest)  # trechos por documento mudam com a versão
+    return {"active": collection_name, "previous": previous}
+
+
+def rollback_collection(manifest: Optional[IngestManifest] = None) -> Dict:
+    """Volta o alias para a versão anterior à ativa"""
+    live = resolve_collection(COLLECTION_NAME)
+    older = [name for name in list_collections(COLLECTION_NAME) if live is None or name < live]
+    if not older:
+        raise ValueError("Não há versão anterior para rollback")
+    return activate_collection(older[-1], manifest)
+
+
+def prune_collections(keep: Optional[int] = None, manifest: Optional[IngestManifest] = None) -> List[str]:
+    """Apaga as versões inativas além das `keep` mais recentes"""
+    manifest = manifest or get_manifest()
+    keep = settings.REINDEX_KEEP_VERSIONS if keep is None else keep
+    with index_write_lock(manifest):
+        live = resolve_collection(COLLECTION_NAME)
+        inactive = [name for name in list_collections(COLLECTION_NAME) if name != live]
+        removed = inactive[:max(0, len(inactive) - keep)]
+        for name in removed:
+            delete_collection(name)
+            _version_file(manifest, name).unlink(missing_ok=True)
+    return removed
+
+
+# ── Reindexação ────────────────────────────────────────────────────
+
+def _sources(root: Path, manifest: IngestManifest) -> List[SourceDocument]:
+    """O que está indexado hoje (pelo manifesto) ou, sem manifesto, a knowledge_base"""
+    entries = [e for e in manifest.snapshot() if e.status in ("complete", "partial")]
+    if not entries:
+        return list(discover_documents(root))
+    return [
+        SourceDocument(path=root / e.path, category=e.category, sha256=e.sha256, case_id=e.case_id)
+        for e in entries
+    ]
+
+
+def _sample_found(hits, point_id: str, case_id: Optional[int]) -> bool:
+    """O próprio trecho ou outro trecho do mesmo caso (quando há caso) no top-k"""
+    for hit in hits:
+        if str(hit.id) == point_id:
+            return True
+        if case_id is not None and (hit.payload or {}).get("case_id") == case_id:
+            return True
+    return False
+
+
+def _validate(collection_name: str, expected_points: int, failed: int,
+              samples: List[Tuple[str, str, Optional[int]]]) -> Dict:
+    points = count_points(collection_name)
+    top_k = settings.REINDEX_RECALL_TOP_K
+
+    found = 0
+    if samples:
+        vectors = generate_embeddings([text for text, _, _ in samples])
+        for (_, point_id, case_id), vector in zip(samples, vectors):
+            hits = search_collection(collection_name, vector, limit=top_k)
+            if _sample_found(hits, point_id, case_id):
+                found += 1
+    recall = found / len(samples) if samples else 0.0
+
+    problems = []
+    if not points:
+        problems.append("coleção vazia")
+    if points != expected_points:
+        problems.append(f"{points} pontos na coleção, {expected_points} gravados")
+    if failed:
+        problems.append(f"{failed} documentos falharam")
+    if samples and recall < settings.REINDEX_MIN_RECALL:
+        problems.append(f"recall@{top_k} {recall:.2f} < {settings.REINDEX_MIN_RECALL}")
+
+    return {
+        "ok": not problems,
+        "problems": problems,
+        "points": points,
+        "expected_points": expected_points,
+        "sample_size": len(samples),
+        f"recall_at_{top_k}": round(recall, 3)
+    }
+
+
+def reindex_collection(
+    root: Optional[str] = None,
+    manifest: Optional[IngestManifest] = None,
+    switch: bool = True,
+    drop_legacy: bool = False,
+    max_points_per_second: Optional[float] = None,
+    on_plan: Optional[Callable[[List[SourceDocument]], None]] = None,
+    **pipeline_kwargs
+) -> Dict:
+    """
+    Constrói uma nova versão da coleção e, se válida (e `switch`), troca
+    o alias para ela.
+    """
+    with index_write_lock(manifest):
+        return _reindex(root, manifest, switch, drop_legacy, max_points_per_second, on_plan, **pipeline_kwargs)
+
+
+def _reindex(
+    root: Optional[str],
+    manifest: Optional[IngestManifest],
+    switch: bool,
+    drop_legacy: bool,
+    max_points_per_second: Optional[float],
+    on_plan: Optional[Callable[[List[SourceDocument]], None]],
+    **pipeline_kwargs
+) -> Dict:
+    root_path = Path(root or settings.KNOWLEDGE_BASE_PATH)
+    manifest = manifest or get_manifest()
+    rate = settings.REINDEX_MAX_POINTS_PER_SECOND if max_points_per_second is None else max_points_per_second
+
+    sources = _sources(root_path, manifest)
+    claimed = {s.path.relative_to(root_path).as_posix() for s in sources}
+    busy = claim_paths(claimed)
+    if busy:
+        raise RuntimeError(f"{len(busy)} arquivos em sincronização; tente de novo quando terminar")
+
+    target = new_collection_name(COLLECTION_NAME)
+    pipeline_kwargs.update(skip_existing=False, collection_name=target)
+    pipeline = IngestionPipeline(**pipeline_kwargs)
+    throttle = _Throttle(rate)
+    indexed: Dict[str, Dict] = {}
+    by_path = {s.path.relative_to(root_path).as_posix(): s for s in sources}
+    samples: List[Tuple[str, str, Optional[int]]] = []
+    seen_chunks = 0
+    user_on_document = pipeline.on_document
+
+    def on_batch(chunks: List[Chunk]):
+        nonlocal seen_chunks
+        for chunk in chunks:
+            rel = chunk.document.source.path.relative_to(root_path).as_posix()
+            entry = indexed.setdefault(rel, {"case_id": None, "point_ids": [], "status": "partial"})
+            entry["case_id"] = chunk.document.case_id
+            entry["point_ids"].append(chunk.point_id)
+            # Amostra uniforme dos trechos (reservoir sampling) para o recall
+            seen_chunks += 1
+            if len(samples) < settings.REINDEX_SAMPLE_SIZE:
+                samples.append((chunk.text, chunk.point_id, chunk.document.case_id))
+            else:
+                slot = random.randrange(seen_chunks)
+                if slot < len(samples):
+                    samples[slot] = (chunk.text, chunk.point_id, chunk.document.case_id)
+        throttle.wait(len(chunks))
+
+    def on_document(document: ExtractedDocument, status: str):
+        rel = document.source.path.relative_to(root_path).as_posix()
+        if status == "ingested":
+            indexed[rel]["status"] = "complete"
+        elif status == "empty":
+            indexed[rel] = {"case_id": None, "point_ids": [], "status": "empty"}
+        if user_on_document:
+            user_on_document(document, status)
+
+    pipeline.on_batch = on_batch
+    pipeline.on_document = on_document
+
+    logger.info(f"🏗️  Reindexando {len(sources)} documentos em '{target}'")
+    if on_plan:
+        on_plan(sources)
+    try:
+        create_collection(target)
+        stats = pipeline.run(sources)
+    except Exception:
+        release_paths(claimed)
+        if target in list_collections(COLLECTION_NAME):
+            delete_collection(target)
+        raise
+
+    result = {"collection": target, "previous": resolve_collection(COLLECTION_NAME), "stats": stats.as_dict()}
+    try:
+        if pipeline.cancelled:
+            delete_collection(target)
+            result.update(status="cancelled", switched=False)
+            return result
+
+        validation = _validate(target, stats.chunks, stats.failed, samples)
+        result["validation"] = validation
+
+        # Manifesto desta versão; arquivos que entraram no índice durante a
+        # reindexação ficam "partial" e a próxima sincronização os completa
+        model = model_fingerprint()
+        entries = {}
+        for entry in manifest.snapshot():
+            entry = ManifestEntry(**asdict(entry))
+            entry.model, entry.chunk_size, entry.chunk_overlap = model, pipeline.chunk_size, pipeline.chunk_overlap
+            if entry.path in indexed:
+                entry.case_id = indexed[entry.path]["case_id"]
+                entry.point_ids = sorted(indexed[entry.path]["point_ids"])
+                entry.status = indexed[entry.path]["status"]
+            elif entry.status in ("complete", "partial"):
+                entry.point_ids, entry.status = [], "partial"
+            entries[entry.path] = entry
+        for rel, state in indexed.items():
+            if rel not in entries:  # knowledge_base ingerida sem manifesto
+                source, stat = by_path[rel], by_path[rel].path.stat()
+                entries[rel] = ManifestEntry(
+                    path=rel, size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=source.sha256,
+                    model=model, chunk_size=pipeline.chunk_size, chunk_overlap=pipeline.chunk_overlap,
+                    category=source.category, case_id=state["case_id"],
+                    point_ids=sorted(state["point_ids"]), status=state["status"]
+                )
+
+        _save_version(manifest, target, {
+            "created_at": time.time(),
+            "model": model,
+            "chunk_size": pipeline.chunk_size,
+            "chunk_overlap": pipeline.chunk_overlap,
+            "validation": validation
+        }, entries)
+
+        if not validation["ok"]:
+            logger.error(f"❌ '{target}' reprovada na validação: {'; '.join(validation['problems'])}")
+            result.update(status="invalid", switched=False)
+            return result
+
+        if switch:
+            activate_collection(target, manifest, drop_legacy=drop_legacy)
+        result.update(status="ready", switched=switch)
+        return result
+    finally:
+        release_paths(claimed)
@@ -0,0 +1,373 @@
+"""
+Sincronização incremental da knowledge_base com o índice
+
+Compara os arquivos com o manifesto (app/services/manifest.py):
+    novos/alterados  → pipeline de ingestão (pontos antigos removidos ao fim)
+    interrompidos    → retomados a partir do último lote confirmado
+    removidos        → pontos, caso no banco e documento lexical apagados
+    inalterados      → nada (tamanho+mtime iguais; na dúvida, sha256)
+
+Sincronizações simultâneas no mesmo processo (jobs) dividem o trabalho:
+um arquivo em processamento por outra sincronização fica de fora do plano.
+Entre processos, as escritas são serializadas por `index_write_lock`.
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from app.config import settings
+from app.database.session import SessionLocal
+from app.models.historical_case import HistoricalCase
+from app.ai.rag.embedding_cache import model_fingerprint
+from app.ai.rag.vectorstore import delete_points
+from app.ai.rag.lexical_index import get_lexical_index
+from app.services.ingestion import (
+    CATEGORY_RULES, SUPPORTED_EXTENSIONS, Chunk, ExtractedDocument, IngestionPipeline,
+    SourceDocument, discover_documents, file_sha256
+)
+from app.services.manifest import IngestManifest, ManifestEntry, get_manifest, index_write_lock
+from app.services.catalog import entry_fields, get_catalog
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Caminhos (relativos) sendo processados por alguma sincronização
+_in_flight: Set[str] = set()
+_in_flight_lock = threading.Lock()
+
+
+def claim_paths(paths: Iterable[str]) -> Set[str]:
+    """
+    Reserva caminhos para uma operação fora da sincronização (ex:
+    reindexação). Se algum já estiver reservado, nada é reservado e os
+    ocupados são retornados.
+    """
+    paths = set(paths)
+    with _in_flight_lock:
+        busy = paths & _in_flight
+        if not busy:
+            _in_flight.update(paths)
+    return busy
+
+
+def release_paths(paths: Iterable[str]):
+    with _in_flight_lock:
+        _in_flight.difference_update(paths)
+
+
+@dataclass
+class SyncPlan:
+    root: Path
+    new: List[SourceDocument] = field(default_factory=list)
+    changed: List[SourceDocument] = field(default_factory=list)
+    resumed: List[SourceDocument] = field(default_factory=list)
+    duplicates: List[Tuple[SourceDocument, str]] = field(default_factory=list)
+    removed: List[ManifestEntry] = field(default_factory=list)
+    busy: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    # Entradas cujo conteúdo não mudou, só o mtime (ex: cópia/checkout)
+    touched: List[ManifestEntry] = field(default_factory=list)
+    previous: Dict[str, ManifestEntry] = field(default_factory=dict)
+
+    def relative(self, source: SourceDocument) -> str:
+        return source.path.relative_to(self.root).as_posix()
+
+    @property
+    def to_ingest(self) -> List[SourceDocument]:
+        return self.resumed + self.changed + self.new
+
+    def as_dict(self) -> Dict:
+        return {
+            "new": [self.relative(s) for s in self.new],
+            "changed": [self.relative(s) for s in self.changed],
+            "resumed": [self.relative(s) for s in self.resumed],
+            "duplicates": [self.relative(s) for s, _ in self.duplicates],
+            "removed": [e.path for e in self.removed],
+            "busy": self.busy,
+            "unchanged": self.unchanged,
+            "touched": len(self.touched)
+        }
+
+
+def select_documents(root: Path, paths: Iterable[str]) -> Iterator[SourceDocument]:
+    """Arquivos específicos (ex: recém-enviados); categoria = primeira pasta"""
+    for path in paths:
+        path = Path(path)
+        path = path if path.is_absolute() else root / path
+        try:
+            rel = path.resolve().relative_to(root.resolve())
+        except ValueError:
+            logger.warning(f"⚠️  Fora da knowledge_base, ignorado: {path}")
+            continue
+        if (len(rel.parts) < 2 or rel.parts[0] not in CATEGORY_RULES
+                or path.suffix.lower() not in SUPPORTED_EXTENSIONS or not path.is_file()):
+            logger.warning(f"⚠️  Caminho não suportado, ignorado: {path}")
+            continue
+        yield SourceDocument(path=root / rel, category=rel.parts[0])
+
+
+def plan_sync(
+    root: Path,
+    manifest: IngestManifest,
+    chunk_size: int,
+    chunk_overlap: int,
+    categories: Optional[Iterable[str]] = None,
+    paths: Optional[Iterable[str]] = None
+) -> SyncPlan:
+    """
+    Compara a knowledge_base com o manifesto.
+
+    Com `paths`, só esses arquivos entram no plano e nada é considerado
+    removido.
+    """
+    plan = SyncPlan(root=root)
+    model = model_fingerprint()
+    categories = list(categories) if categories else None
+    seen_paths = set()
+    new_by_sha: Dict[str, str] = {}
+    sources = select_documents(root, paths) if paths is not None else discover_documents(root, categories)
+
+    for source in sources:
+        rel = plan.relative(source)
+        seen_paths.add(rel)
+        if rel in _in_flight:
+            plan.busy.append(rel)
+            continue
+        stat = source.path.stat()
+        entry = manifest.get(rel)
+        same_params = entry is not None and entry.matches_params(model, chunk_size, chunk_overlap)
+
+        if (same_params and entry.status != "partial"
+                and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns):
+            plan.unchanged += 1
+            continue
+
+        source.sha256 = file_sha256(source.path)
+
+        if same_params and entry.sha256 == source.sha256:
+            if entry.status == "partial":
+                source.case_id = entry.case_id
+                source.committed_points = set(entry.point_ids)
+                plan.resumed.append(source)
+                plan.previous[rel] = entry
+            else:
+                entry.size, entry.mtime_ns = stat.st_size, stat.st_mtime_ns
+                plan.touched.append(entry)
+                plan.unchanged += 1
+            continue
+
+        if entry is not None:
+            source.case_id = entry.case_id
+            plan.changed.append(source)
+            plan.previous[rel] = entry
+            continue
+
+        # Mesmo conteúdo de outro arquivo já indexado: só registra
+        original = next((
+            e for e in manifest.by_sha256(source.sha256)
+            if e.status == "complete" and e.matches_params(model, chunk_size, chunk_overlap)
+            and (root / e.path).exists()
+        ), None)
+        if original is not None or source.sha256 in new_by_sha:
+            plan.duplicates.append((source, original.path if original is not None else new_by_sha[source.sha256]))
+            continue
+
+        new_by_sha[source.sha256] = rel
+        plan.new.append(source)
+
+    if paths is not None:
+        return plan
+
+    for entry in manifest.snapshot():
+        if entry.path in seen_paths or entry.path in _in_flight:
+            continue
+        if categories and entry.category not in categories:
+            continue
+        plan.removed.append(entry)
+
+    return plan
+
+
+def _purge(db, point_ids: List[str], case_id: Optional[int]):
+    """Apaga pontos, caso no banco e documento lexical"""
+    if point_ids:
+        delete_points(list(point_ids))
+    if case_id is not None:
+        db.query(HistoricalCase).filter(HistoricalCase.id == case_id).delete()
+        db.commit()
+        get_lexical_index().remove_documents([case_id])
+
+
+def _new_entry(plan: SyncPlan, source: SourceDocument, pipeline: IngestionPipeline, status: str) -> ManifestEntry:
+    stat = source.path.stat()
+    return ManifestEntry(
+        path=plan.relative(source),
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        sha256=source.sha256,
+        model=model_fingerprint(),
+        chunk_size=pipeline.chunk_size,
+        chunk_overlap=pipeline.chunk_overlap,
+        category=source.category,
+        case_id=source.case_id,
+        point_ids=sorted(source.committed_points),
+        status=status
+    )
+
+
+def _remove_entries(plan: SyncPlan, manifest: IngestManifest, db):
+    for entry in plan.removed:
+        if entry.status != "duplicate":
+            # Uma cópia ainda presente herda os pontos em vez de reindexar
+            heir = next((
+                e for e in manifest.snapshot()
+                if e.duplicate_of == entry.path and (plan.root / e.path).exists()
+            ), None)
+            if heir is not None:
+                for other in manifest.snapshot():
+                    if other.duplicate_of == entry.path and other is not heir:
+                        other.duplicate_of = heir.path
+                        manifest.put(other)
+                heir.status, heir.duplicate_of = entry.status, None
+                heir.case_id, heir.point_ids = entry.case_id, entry.point_ids
+                manifest.put(heir)
+                get_catalog().record_entry(heir)
+            else:
+                _purge(db, entry.point_ids, entry.case_id)
+        manifest.delete(entry.path)
+        logger.info(f"🗑️  Removido do índice: {entry.path}")
+    get_catalog().remove(entry.path for entry in plan.removed)
+
+
+def sync_knowledge_base(
+    root: Optional[str] = None,
+    categories: Optional[Iterable[str]] = None,
+    dry_run: bool = False,
+    manifest: Optional[IngestManifest] = None,
+    paths: Optional[Iterable[str]] = None,
+    on_plan: Optional[Callable[[SyncPlan], None]] = None,
+    **pipeline_kwargs
+) -> Dict:
+    """
+    Sincroniza a knowledge_base com o índice.
+
+    Com `dry_run`, só calcula e retorna o plano (nada é gravado); com
+    `paths`, processa só esses arquivos. Outro processo gravando no
+    índice faz esta sincronização esperar (`index_write_lock`).
+    """
+    if dry_run:
+        return _sync(root, categories, dry_run, manifest, paths, on_plan, **pipeline_kwargs)
+    with index_write_lock(manifest):
+        return _sync(root, categories, dry_run, manifest, paths, on_plan, **pipeline_kwargs)
+
+
+def _sync(
+    root: Optional[str],
+    categories: Optional[Iterable[str]],
+    dry_run: bool,
+    manifest: Optional[IngestManifest],
+    paths: Optional[Iterable[str]],
+    on_plan: Optional[Callable[[SyncPlan], None]],
+    **pipeline_kwargs
+) -> Dict:
+    root_path = Path(root or settings.KNOWLEDGE_BASE_PATH)
+    manifest = manifest or get_manifest()
+    pipeline_kwargs["skip_existing"] = False
+    pipeline = IngestionPipeline(**pipeline_kwargs)
+
+    with _in_flight_lock:
+        plan = plan_sync(root_path, manifest, pipeline.chunk_size, pipeline.chunk_overlap, categories, paths)
+        claimed = {plan.relative(s) for s in plan.to_ingest} | {e.path for e in plan.removed}
+        if not dry_run:
+            _in_flight.update(claimed)
+
+    result = {"dry_run": dry_run, "plan": plan.as_dict()}
+    if dry_run:
+        return result
+    if on_plan:
+        on_plan(plan)
+
+    pending: Dict[str, ManifestEntry] = {}
+    user_on_document = pipeline.on_document
+    catalog = get_catalog()
+
+    def on_batch(chunks: List[Chunk]):
+        # Um registro por documento do lote: é o ponto de retomada
+        touched = {}
+        for chunk in chunks:
+            source = chunk.document.source
+            rel = plan.relative(source)
+            if rel not in pending:
+                pending[rel] = _new_entry(plan, source, pipeline, "partial")
+            entry = pending[rel]
+            entry.case_id = chunk.document.case_id
+            entry.point_ids.append(chunk.point_id)
+            touched[rel] = entry
+        for entry in touched.values():
+            manifest.put(entry)
+
+    def on_document(document: ExtractedDocument, status: str):
+        source = document.source
+        rel = plan.relative(source)
+        previous = plan.previous.get(rel)
+
+        if status == "ingested":
+            entry = pending.pop(rel, None) or _new_entry(plan, source, pipeline, "partial")
+            entry.status, entry.case_id = "complete", document.case_id
+            entry.point_ids = sorted(set(entry.point_ids) | source.committed_points)
+            manifest.put(entry)
+            if previous is not None:
+                stale = set(previous.point_ids) - set(entry.point_ids)
+                _purge(db, sorted(stale), None)
+        elif status == "empty":
+            if previous is not None:
+                _purge(db, previous.point_ids, previous.case_id)
+            source.case_id = None
+            manifest.put(_new_entry(plan, source, pipeline, "empty"))
+        elif status == "skipped":
+            # Duplicata descoberta durante a ingestão (mesmo sha256)
+            entry = _new_entry(plan, source, pipeline, "duplicate")
+            entry.duplicate_of = next(
+                (plan.relative(s) for s in plan.new if s.sha256 == source.sha256), None
+            )
+            manifest.put(entry)
+        elif status == "failed":
+            # Entrada anterior preservada no manifesto; tenta de novo na próxima sincronização
+            stat = source.path.stat()
+            catalog.record(
+                rel, category=source.category, size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                sha256=source.sha256 or None, status="failed", error=document.error
+            )
+        if status != "failed":
+            catalog.record_entry(manifest.get(rel))
+
+        if user_on_document:
+            user_on_document(document, status)
+
+    pipeline.on_batch = on_batch
+    pipeline.on_document = on_document
+
+    db = SessionLocal()
+    try:
+        for entry in plan.touched:
+            manifest.put(entry)
+        for source, original in plan.duplicates:
+            entry = _new_entry(plan, source, pipeline, "duplicate")
+            entry.duplicate_of = original
+            manifest.put(entry)
+        catalog.record_many({
+            entry.path: entry_fields(entry)
+            for entry in plan.touched + [manifest.get(plan.relative(s)) for s, _ in plan.duplicates]
+        })
+
+        _remove_entries(plan, manifest, db)
+        stats = pipeline.run(plan.to_ingest)
+    finally:
+        db.close()
+        manifest.checkpoint()
+        with _in_flight_lock:
+            _in_flight.difference_update(claimed)
+
+    result["stats"] = stats.as_dict()
+    result["cancelled"] = pipeline.cancelled
+    return result
@@ -0,0 +1,132 @@
+"""
+Texto extraído dos PDFs, persistido por sha256 do conteúdo
+
+Guarda as páginas *brutas* (antes da limpeza) de cada documento, então
+trocar EMBEDDING_MODEL, CHUNK_SIZE/CHUNK_OVERLAP ou a limpeza só
+re-chunka e recalcula embeddings — o PDF não é lido de novo.
+
+Arquivos em TEXT_STORE_PATH:
+    <sha[:2]>/<sha>.json.zst   com `zstandard` instalado
+    <sha[:2]>/<sha>.json.gz    fallback (gzip da stdlib)
+Conteúdo: {"sha256", "pages": [...], "extractor", "created_at"}
+"""
+from pathlib import Path
+from typing import Dict, List, Optional
+from app.config import settings
+import threading
+import logging
+import gzip
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:  # opcional
+    zstandard = None
+
+
+def _extractor_version() -> str:
+    try:
+        import pypdf
+        return f"pypdf {pypdf.__version__}"
+    except ImportError:
+        return "unknown"
+
+
+class ExtractedTextStore:
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.extractor = _extractor_version()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _file(self, sha256: str, suffix: str) -> Path:
+        return self.path / sha256[:2] / f"{sha256}.json{suffix}"
+
+    def _existing(self, sha256: str) -> Optional[Path]:
+        for suffix in (".zst", ".gz"):
+            candidate = self._file(sha256, suffix)
+            if candidate.exists():
+                return candidate
+        return None
+
+    def contains(self, sha256: str) -> bool:
+        return bool(sha256) and self._existing(sha256) is not None
+
+    def get(self, sha256: str) -> Optional[List[str]]:
+        """Páginas guardadas ou None"""
+        file = self._existing(sha256) if sha256 else None
+        if file is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            raw = file.read_bytes()
+            if file.suffix == ".zst":
+                if zstandard is None:
+                    raise RuntimeError("zstandard não instalado")
+                raw = zstandard.ZstdDecompressor().decompress(raw)
+            else:
+                raw = gzip.decompress(raw)
+            pages = json.loads(raw)["pages"]
+        except Exception as e:
+            logger.warning(f"⚠️  Texto guardado ilegível ({file.name}): {e}")
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return pages
+
+    def put(self, sha256: str, pages: List[str]):
+        if not sha256:
+            return
+        data = json.dumps({
+            "sha256": sha256,
+            "pages": pages,
+            "extractor": self.extractor,
+            "created_at": time.time()
+        }, ensure_ascii=False).encode("utf-8")
+
+        if zstandard is not None:
+            file = self._file(sha256, ".zst")
+            data = zstandard.ZstdCompressor(level=6).compress(data)
+        else:
+            file = self._file(sha256, ".gz")
+            data = gzip.compress(data, compresslevel=6)
+
+        file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = file.with_name(f"{file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, file)
+        with self._lock:
+            self.writes += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": settings.TEXT_STORE_ENABLED,
+            "path": str(self.path),
+            "compression": "zstd" if zstandard is not None else "gzip",
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes
+        }
+
+
+_store: Optional[ExtractedTextStore] = None
+_store_lock = threading.Lock()
+
+def get_text_store() -> ExtractedTextStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ExtractedTextStore(settings.TEXT_STORE_PATH)
+    return _store
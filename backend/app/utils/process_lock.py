@@ -0,0 +1,70 @@
+"""
+Lock exclusivo entre processos (flock num arquivo)
+
+Só um processo por vez segura o lock; dentro dele, várias threads podem
+segurá-lo juntas (contagem de referências), o que mantém o paralelismo
+entre jobs do mesmo processo. O sistema operacional libera o lock se o
+processo morrer. Sem fcntl (Windows), vale só dentro do processo.
+"""
+from pathlib import Path
+from typing import Optional
+import threading
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class ProcessLock:
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._mutex = threading.Lock()
+        self._holders = 0
+        self._fd: Optional[int] = None
+        self._pid = os.getpid()
+
+    def _after_fork(self):
+        # Processo filho (fork) herda o estado do pai, mas não o lock: o fd
+        # herdado é abandonado sem LOCK_UN, que soltaria o lock do pai
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._holders = 0
+            self._fd = None
+
+    def acquire(self, blocking: bool = True) -> Optional[bool]:
+        """
+        True: este processo acabou de obter o lock; False: já o tinha (outra
+        thread); None: ocupado por outro processo (só com blocking=False)
+        """
+        with self._mutex:
+            self._after_fork()
+            if self._holders:
+                self._holders += 1
+                return False
+
+            if fcntl is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    os.close(fd)
+                    return None
+                os.ftruncate(fd, 0)
+                os.write(fd, str(os.getpid()).encode())
+                self._fd = fd
+            self._holders = 1
+            return True
+
+    def release(self):
+        with self._mutex:
+            self._after_fork()
+            if not self._holders:
+                return
+            self._holders -= 1
+            if self._holders == 0 and self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                os.close(self._fd)
+                self._fd = None
@@ -0,0 +1,78 @@
+"""
+Contador de versão compartilhado entre processos
+
+Usado para invalidar caches quando outro processo (importação, worker de
+ingestão) altera os dados. Usa Redis (REDIS_URL) quando disponível; sem
+Redis, vale apenas dentro do processo atual.
+
+A versão vista por um processo nunca volta atrás: com o Redis fora do ar
+soma-se o incremento local ao último valor remoto lido, e se o Redis
+voltar zerado (reiniciado sem persistência) a diferença passa para o
+contador local.
+"""
+from app.config import settings
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class VersionCounter:
+    prefix = "pronas:version:"
+
+    def __init__(self, name: str, refresh_seconds: float = 1.0):
+        self.key = self.prefix + name
+        self.refresh_seconds = refresh_seconds
+        self._local = 0
+        self._last_remote = 0
+        self._cached = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._redis = None
+        self._redis_retry_at = 0.0
+
+    def _client(self):
+        if self._redis is None and time.monotonic() >= self._redis_retry_at:
+            try:
+                import redis
+                self._redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5)
+            except Exception as e:
+                logger.debug(f"Redis indisponível para {self.key}: {e}")
+                self._redis_retry_at = time.monotonic() + 30
+        return self._redis
+
+    def _remote(self, operation):
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            return operation(client)
+        except Exception as e:
+            logger.debug(f"Erro acessando {self.key} no Redis: {e}")
+            self._redis = None
+            self._redis_retry_at = time.monotonic() + 30
+            return None
+
+    def get(self) -> int:
+        now = time.monotonic()
+        if now - self._checked_at < self.refresh_seconds:
+            return self._cached
+
+        remote = self._remote(lambda client: int(client.get(self.key) or 0))
+        with self._lock:
+            if remote is not None:
+                if remote < self._last_remote:
+                    self._local += self._last_remote - remote + 1
+                self._last_remote = remote
+            self._cached = self._last_remote + self._local
+            self._checked_at = now
+            return self._cached
+
+    def bump(self) -> int:
+        remote = self._remote(lambda client: client.incr(self.key))
+        with self._lock:
+            if remote is None:
+                self._local += 1
+            self._checked_at = 0.0
+        return self.get()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Compara o índice local (NumPy) com o Qdrant no corpus da knowledge_base
+
+Uso:
+    python scripts/benchmark_vectorstore.py --kb /app/knowledge_base
+    python scripts/benchmark_vectorstore.py --synthetic 5000   # sem PDFs/modelo
+"""
+import sys
+import os
+import argparse
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, '/app')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from pathlib import Path
+from qdrant_client.models import Distance, PointStruct, VectorParams
+from app.config import settings
+from app.ai.rag.local_vectorstore import LocalVectorIndex
+from app.ai.rag.vectorstore import get_qdrant_client
+
+
+def load_corpus(kb_path: Path, max_docs: int, chunk_chars: int):
+    from pypdf import PdfReader
+    from app.ai.rag.embeddings import generate_embeddings
+
+    chunks = []
+    for pdf in sorted(kb_path.rglob("*.pdf"))[:max_docs]:
+        try:
+            text = " ".join((page.extract_text() or "") for page in PdfReader(str(pdf)).pages)
+        except Exception as e:
+            print(f"   ⚠️  {pdf.name}: {e}")
+            continue
+        text = " ".join(text.split())
+        chunks.extend(text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars))
+
+    print(f"🤖 Gerando embeddings de {len(chunks)} trechos...")
+    return np.asarray(generate_embeddings(chunks), dtype=np.float32)
+
+
+def percentile(samples, p):
+    return float(np.percentile(np.asarray(samples) * 1000, p))
+
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--kb", default="/app/knowledge_base")
+parser.add_argument("--max-docs", type=int, default=500)
+parser.add_argument("--chunk-chars", type=int, default=settings.CHUNK_SIZE)
+parser.add_argument("--synthetic", type=int, default=0, help="Usa N vetores aleatórios")
+parser.add_argument("--dim", type=int, default=768)
+parser.add_argument("--queries", type=int, default=200)
+parser.add_argument("--k", type=int, default=5)
+parser.add_argument("--dtype", default=settings.LOCAL_VECTORSTORE_DTYPE)
+args = parser.parse_args()
+
+rng = np.random.default_rng(42)
+if args.synthetic:
+    vectors = rng.normal(size=(args.synthetic, args.dim)).astype(np.float32)
+else:
+    vectors = load_corpus(Path(args.kb), args.max_docs, args.chunk_chars)
+
+if not len(vectors):
+    print("⚠️  Corpus vazio")
+    sys.exit(1)
+
+points = [
+    PointStruct(id=i, vector=v.tolist(), payload={"approved": bool(i % 2), "score": int(i % 100)})
+    for i, v in enumerate(vectors)
+]
+query_ids = rng.integers(0, len(vectors), size=args.queries)
+queries = vectors[query_ids] + rng.normal(scale=0.05, size=(args.queries, vectors.shape[1])).astype(np.float32)
+
+print(f"\n📊 {len(points)} vetores x {vectors.shape[1]} dim | {args.queries} consultas | k={args.k}\n")
+
+# ── Índice local ──────────────────────────────────────────────────
+with tempfile.TemporaryDirectory() as tmp:
+    started = time.perf_counter()
+    local = LocalVectorIndex(tmp, dtype=args.dtype)
+    local.upsert(points)
+    local_build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    LocalVectorIndex(tmp, dtype=args.dtype)
+    local_open = time.perf_counter() - started
+
+    local_times, local_results = [], []
+    for q in queries:
+        started = time.perf_counter()
+        hits = local.search(q, limit=args.k)
+        local_times.append(time.perf_counter() - started)
+        local_results.append([h.id for h in hits])
+
+print(f"🗂️  Local ({args.dtype}): build {local_build:.2f}s | abertura {local_open * 1000:.1f}ms "
+      f"| p50 {percentile(local_times, 50):.2f}ms | p95 {percentile(local_times, 95):.2f}ms")
+
+# ── Qdrant ────────────────────────────────────────────────────────
+client = get_qdrant_client()
+collection = f"benchmark_{uuid.uuid4().hex[:8]}"
+try:
+    client.create_collection(
+        collection_name=collection,
+        vectors_config=VectorParams(size=vectors.shape[1], distance=Distance.COSINE)
+    )
+    started = time.perf_counter()
+    for i in range(0, len(points), 256):
+        client.upsert(collection_name=collection, points=points[i:i + 256], wait=True)
+    qdrant_build = time.perf_counter() - started
+
+    qdrant_times, overlap = [], []
+    for q, expected in zip(queries, local_results):
+        started = time.perf_counter()
+        hits = client.search(collection_name=collection, query_vector=q.tolist(), limit=args.k)
+        qdrant_times.append(time.perf_counter() - started)
+        overlap.append(len({h.id for h in hits} & set(expected)) / max(len(expected), 1))
+
+    print(f"🔮 Qdrant: build {qdrant_build:.2f}s "
+          f"| p50 {percentile(qdrant_times, 50):.2f}ms | p95 {percentile(qdrant_times, 95):.2f}ms")
+    print(f"🎯 Concordância top-{args.k} local x Qdrant: {np.mean(overlap):.1%}")
+except Exception as e:
+    print(f"⚠️  Qdrant indisponível: {e}")
+finally:
+    try:
+        client.delete_collection(collection)
+    except Exception:
+        pass
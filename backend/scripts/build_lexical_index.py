@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Reconstrói o índice lexical BM25 a partir da tabela historical_cases
+"""
+import sys
+import os
+import shutil
+
+sys.path.insert(0, '/app')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.config import settings
+from app.database.session import SessionLocal
+from app.models.historical_case import HistoricalCase
+from app.ai.rag.lexical_index import LexicalIndex, case_document
+
+print(f"🔤 Reconstruindo índice lexical em {settings.LEXICAL_INDEX_PATH}...")
+
+shutil.rmtree(settings.LEXICAL_INDEX_PATH, ignore_errors=True)
+index = LexicalIndex(settings.LEXICAL_INDEX_PATH)
+
+db = SessionLocal()
+try:
+    query = db.query(HistoricalCase).order_by(HistoricalCase.id).yield_per(200)
+    batch = []
+    total = 0
+    for case in query:
+        batch.append(case_document(case))
+        if len(batch) >= 200:
+            index.add_documents(batch)
+            total += len(batch)
+            batch = []
+    index.add_documents(batch)
+    total += len(batch)
+finally:
+    db.close()
+
+index.commit()
+print(f"✅ {total} casos indexados ({len(index.terms)} termos)")
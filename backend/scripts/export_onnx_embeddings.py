@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Exporta o modelo de embeddings para ONNX (+ int8) e mede a paridade
+com o modelo PyTorch de referência
+"""
+import sys
+import os
+import argparse
+
+sys.path.insert(0, '/app')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.config import settings
+from app.ai.rag.embeddings import OnnxBackend, export_onnx_model, check_backend_parity
+
+SAMPLES = [
+    "Ampliação e qualificação dos atendimentos em fisioterapia para pessoas com deficiência",
+    "Justificativa: a APAE atende 350 usuários com deficiência intelectual e múltipla",
+    "Capacitação de profissionais da rede SUS em Transtornos do Espectro Autista",
+    "Aquisição de equipamentos de reabilitação conforme Portaria GM/MS nº 8.031/2025",
+    "Metas: ampliar em 30% o número de atendimentos mensais em terapia ocupacional",
+    "Orçamento detalhado com recursos humanos, material de consumo e equipamentos",
+    "Projeto reprovado por ausência de indicadores mensuráveis e cronograma irrealista",
+    "Declaração de capacidade técnico-operativa da instituição proponente",
+]
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--output", default=settings.EMBEDDING_ONNX_DIR)
+parser.add_argument("--no-quantize", action="store_true")
+parser.add_argument("--skip-export", action="store_true", help="Apenas medir paridade")
+args = parser.parse_args()
+
+if not args.skip_export:
+    print(f"📦 Exportando {settings.EMBEDDING_MODEL} → {args.output}")
+    export_onnx_model(settings.EMBEDDING_MODEL, args.output, quantize=not args.no_quantize)
+
+variants = [False] if args.no_quantize else [False, True]
+for quantized in variants:
+    backend = OnnxBackend(args.output, quantized=quantized)
+    report = check_backend_parity(SAMPLES, candidate=backend)
+    label = "onnx-int8" if quantized else "onnx-fp32"
+    print(f"\n📊 Paridade {label} vs torch ({report['samples']} textos)")
+    print(f"   • Desvio de cosseno médio: {report['mean_cosine_drift']:.6f}")
+    print(f"   • Desvio de cosseno máximo: {report['max_cosine_drift']:.6f}")
+    print(f"   • Latência torch: {report['reference_ms_per_text']:.1f} ms/texto")
+    print(f"   • Latência {label}: {report['candidate_ms_per_text']:.1f} ms/texto")
+
+print("\n✅ Para usar: EMBEDDING_BACKEND=onnx (EMBEDDING_ONNX_QUANTIZED=true|false)")
@@ -13,14 +13,16 @@ print("📚 Importando casos históricos...")
 try:
     from app.database.session import SessionLocal
     from app.models.historical_case import HistoricalCase
-    from app.ai.rag.embeddings import generate_embedding
-    from app.ai.rag.vectorstore import get_qdrant_client
+    from app.ai.rag.embeddings import generate_embeddings
+    from app.ai.rag.vectorstore import COLLECTION_NAME, init_collection, upsert_points
+    from app.ai.rag.lexical_index import get_lexical_index, case_document
+    from app.services.manifest import index_write_lock
     from qdrant_client.models import PointStruct
     
     print("✅ Dependências importadas")
     
     db = SessionLocal()
-    qdrant = get_qdrant_client()
+    init_collection()
     
     # Verificar se já existem casos
     existing = db.query(HistoricalCase).count()
@@ -116,8 +118,14 @@ try:
     
     print(f"\n📥 Importando {len(casos)} casos de exemplo...\n")
     
+    # Gerar todos os embeddings em um único lote
+    print("🤖 Gerando embeddings em lote...")
+    embeddings = generate_embeddings([c['texto'] for c in casos])
+    
     count = 0
-    for i, caso_data in enumerate(casos, 1):
+    points = []
+    lexical_docs = []
+    for i, (caso_data, embedding) in enumerate(zip(casos, embeddings), 1):
         print(f"[{i}/{len(casos)}] Processando: {caso_data['titulo'][:50]}...")
         
         # Criar no PostgreSQL
@@ -141,34 +149,38 @@ try:
         db.refresh(case)
         
         print(f"   ✅ Salvo no PostgreSQL (ID: {case.id})")
+        lexical_docs.append(case_document(case))
         
-        # Gerar embedding
-        print(f"   🤖 Gerando embedding...")
-        embedding = generate_embedding(caso_data['texto'])
-        
-        # Adicionar ao Qdrant
-        point = PointStruct(
+        # Preparar ponto para o Qdrant
+        points.append(PointStruct(
             id=case.id,
             vector=embedding,
             payload={
+                "case_id": case.id,
                 "title": case.project_title,
                 "institution": case.institution_name,
                 "field": case.field,
+                "year": case.year,
                 "approved": case.is_approved,
                 "score": case.score,
                 "text": caso_data['texto'][:500]
             }
-        )
-        
-        qdrant.upsert(
-            collection_name="pronas_pcd_cases",
-            points=[point]
-        )
+        ))
         
         status = "✅ APROVADO" if caso_data['aprovado'] else "❌ REPROVADO"
         print(f"   {status} | Score: {caso_data['pontuacao']}/100\n")
         count += 1
     
+    # Sem sincronizações de outros processos gravando ao mesmo tempo
+    with index_write_lock():
+        # Enviar todos os pontos ao índice vetorial em uma única chamada
+        upsert_points(points, collection_name=COLLECTION_NAME)
+        
+        # Atualizar índice lexical (busca híbrida)
+        lexical_index = get_lexical_index()
+        lexical_index.add_documents(lexical_docs)
+        lexical_index.commit()
+    
     db.close()
     
     print("═" * 70)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Ingestão da knowledge_base pelo pipeline em streaming (app/services/ingestion)
+
+Uso:
+    python scripts/ingest_knowledge_base.py                  # ingestão completa
+    python scripts/ingest_knowledge_base.py --kb /app/knowledge_base --category aprovados
+    python scripts/ingest_knowledge_base.py --force --batch-size 128
+    python scripts/ingest_knowledge_base.py sync --dry-run   # o que mudaria
+    python scripts/ingest_knowledge_base.py sync             # só novos/alterados/removidos
+    python scripts/ingest_knowledge_base.py status           # resumo do manifesto
+    CHUNK_SIZE=800 python scripts/ingest_knowledge_base.py reindex   # nova versão da coleção
+    python scripts/ingest_knowledge_base.py versions         # versões e qual está ativa
+    python scripts/ingest_knowledge_base.py rollback         # volta para a versão anterior
+    python scripts/ingest_knowledge_base.py activate <coleção>
+    python scripts/ingest_knowledge_base.py prune --keep 2
+    python scripts/ingest_knowledge_base.py catalog          # reconcilia o catálogo com as pastas
+"""
+import sys
+import os
+import json
+import argparse
+
+sys.path.insert(0, '/app')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.config import settings
+from app.services.ingestion import CATEGORY_RULES, ingest_knowledge_base
+from app.services.manifest import IngestManifest
+from app.services.sync import sync_knowledge_base
+from app.services import reindex
+from app.services.text_store import get_text_store
+from app.services.catalog import get_catalog
+
+done = 0
+
+
+def progress(document, status):
+    global done
+    done += 1
+    icon = {"ingested": "✅", "skipped": "⏭️ ", "empty": "⚠️ ", "failed": "❌"}.get(status, "•")
+    print(f"   {icon} [{done}] {document.source.path.name} ({status})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", default="ingest",
+                        choices=["ingest", "sync", "status", "reindex", "versions", "activate", "rollback", "prune", "catalog"])
+    parser.add_argument("collection", nargs="?", help="activate: coleção a ativar")
+    parser.add_argument("--kb", default=settings.KNOWLEDGE_BASE_PATH)
+    parser.add_argument("--category", action="append", choices=list(CATEGORY_RULES),
+                        help="Restringe a uma ou mais pastas (padrão: todas)")
+    parser.add_argument("--batch-size", type=int, default=settings.INGEST_BATCH_SIZE)
+    parser.add_argument("--chunk-size", type=int, default=settings.CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=settings.CHUNK_OVERLAP)
+    parser.add_argument("--workers", type=int, default=settings.INGEST_EXTRACT_WORKERS,
+                        help="Processos de extração de PDF (0 = núcleos - 1)")
+    parser.add_argument("--timeout", type=float, default=settings.INGEST_EXTRACT_TIMEOUT,
+                        help="Tempo máximo de extração por arquivo (s)")
+    parser.add_argument("--force", action="store_true", help="Reingere casos já existentes no banco")
+    parser.add_argument("--no-text-store", action="store_true", help="Ignora o texto já extraído e relê os PDFs")
+    parser.add_argument("--dry-run", action="store_true", help="sync: só mostra o plano")
+    parser.add_argument("--no-switch", action="store_true", help="reindex: valida mas não troca o alias")
+    parser.add_argument("--drop-legacy", action="store_true",
+                        help="reindex/activate: apaga a coleção anterior aos aliases na troca")
+    parser.add_argument("--max-rate", type=float, default=settings.REINDEX_MAX_POINTS_PER_SECOND,
+                        help="reindex: pontos gravados por segundo (0 = sem limite)")
+    parser.add_argument("--keep", type=int, default=settings.REINDEX_KEEP_VERSIONS,
+                        help="prune: versões inativas mantidas")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        status = dict(IngestManifest().get_stats(), text_store=get_text_store().get_stats())
+        print(json.dumps(status, indent=2, ensure_ascii=False))
+        return
+    if args.command == "catalog":
+        result = get_catalog().reconcile(root=args.kb, manifest=IngestManifest())
+        for key in ("added", "missing"):
+            for path in result[key]:
+                print(f"   {key:>8}  {path}")
+        print(json.dumps(get_catalog().summary(), indent=2, ensure_ascii=False))
+        return
+    if args.command in ("versions", "activate", "rollback", "prune"):
+        manifest = IngestManifest()
+        if args.command == "activate":
+            if not args.collection:
+                parser.error("activate requer o nome da coleção")
+            result = reindex.activate_collection(args.collection, manifest, drop_legacy=args.drop_legacy)
+        elif args.command == "rollback":
+            result = reindex.rollback_collection(manifest)
+        elif args.command == "prune":
+            result = {"removed": reindex.prune_collections(args.keep, manifest)}
+        else:
+            result = reindex.list_versions(manifest)
+        print(json.dumps(result, indent=2, ensure_ascii=False, default=str))
+        return
+
+    pipeline_args = dict(
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        extract_workers=args.workers,
+        extract_timeout=args.timeout,
+        use_text_store=False if args.no_text_store else None,
+        on_document=progress
+    )
+
+    if args.command == "reindex":
+        print(f"🏗️  Reindexando | chunk {args.chunk_size}/{args.chunk_overlap} | até {args.max_rate:g} pontos/s\n")
+        result = reindex.reindex_collection(
+            root=args.kb, manifest=IngestManifest(), switch=not args.no_switch,
+            drop_legacy=args.drop_legacy, max_points_per_second=args.max_rate, **pipeline_args
+        )
+        validation = result.get("validation") or {}
+        print(f"\n📋 {result['collection']}: {result['status']} | {validation.get('points', 0)} pontos "
+              f"| {json.dumps({k: v for k, v in validation.items() if k.startswith('recall')})}")
+        for problem in validation.get("problems", []):
+            print(f"   ❌ {problem}")
+        if result.get("switched"):
+            print(f"🔀 Alias ativo: {result['collection']} (anterior: {result['previous']})")
+        stats = result["stats"]
+    elif args.command == "sync":
+        print(f"🔄 Sincronizando {args.kb}{' (dry-run)' if args.dry_run else ''}\n")
+        result = sync_knowledge_base(root=args.kb, categories=args.category, dry_run=args.dry_run, **pipeline_args)
+        plan = result["plan"]
+        for key in ("new", "changed", "resumed", "removed", "duplicates"):
+            for path in plan[key]:
+                print(f"   {key:>10}  {path}")
+        print(f"\n📋 {len(plan['new'])} novos | {len(plan['changed'])} alterados | {len(plan['resumed'])} retomados "
+              f"| {len(plan['removed'])} removidos | {len(plan['duplicates'])} duplicados | {plan['unchanged']} inalterados")
+        if args.dry_run:
+            return
+        stats = result["stats"]
+    else:
+        print(f"📚 Ingerindo {args.kb} | chunk {args.chunk_size}/{args.chunk_overlap} | lote {args.batch_size}\n")
+        stats = ingest_knowledge_base(
+            root=args.kb, categories=args.category, skip_existing=not args.force, **pipeline_args
+        ).as_dict()
+
+    print(f"\n📊 {stats['documents']} documentos | {stats['pages']} páginas | {stats['chunks']} trechos "
+          f"| {stats['skipped']} pulados | {stats['empty']} vazios | {stats['failed']} falhas "
+          f"| {stats['elapsed_seconds']}s")
+    extraction = stats.get("extraction") or {}
+    if extraction:
+        print(f"📄 Extração: {extraction.get('workers')} workers | {extraction.get('ok', 0)} ok "
+              f"| {extraction.get('failed', 0)} falhas | {extraction.get('timeout', 0)} timeouts "
+              f"| {stats.get('text_cache_hits', 0)} do texto guardado")
+    for error in stats["errors"][:10]:
+        print(f"   ❌ [{error['status']}] {error['file']}: {error['error']}")
+
+
+# Guarda obrigatória: os workers de extração (spawn) reimportam este módulo
+if __name__ == "__main__":
+    main()
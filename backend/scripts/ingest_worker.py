@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Worker dedicado da fila de ingestão (requer Redis)
+
+Consome os jobs enfileirados por POST /api/knowledge/process. Processos
+que gravam no índice se revezam (lock em INGEST_MANIFEST_PATH), então
+prefira rodar os workers num só lugar — na API (JOB_WORKERS > 0) ou aqui
+(com JOB_WORKERS=0 na API) — para não ter jobs parados esperando o lock.
+
+Uso:
+    python scripts/ingest_worker.py --workers 2
+"""
+import sys
+import os
+import time
+import argparse
+
+sys.path.insert(0, '/app')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.config import settings
+from app.services.jobs import job_queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=max(1, settings.JOB_WORKERS))
+    args = parser.parse_args()
+
+    if job_queue.store.name != "redis":
+        print("❌ Fila local não é compartilhada entre processos: configure REDIS_URL")
+        sys.exit(1)
+
+    job_queue.start(args.workers, prefix=f"worker-{os.getpid()}")
+    print(f"👷 {args.workers} workers aguardando jobs (Ctrl+C para sair)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n⏹️  Encerrando (aguardando até 30s os jobs em execução)...")
+        job_queue.stop(timeout=30)
+
+
+# Guarda obrigatória: os workers de extração (spawn) reimportam este módulo
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Configuração dos testes
+
+As variáveis obrigatórias de app.config são definidas antes de qualquer
+import do app, apontando tudo para um diretório temporário (SQLite, índice
+local, sem Qdrant/Redis).
+"""
+from pathlib import Path
+import tempfile
+import sys
+import os
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_data = Path(tempfile.mkdtemp(prefix="pronas-tests-"))
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_data / 'test.db'}",
+    "QDRANT_URL": "http://localhost:1",
+    "REDIS_URL": "redis://localhost:1",
+    "SECRET_KEY": "test",
+    "VECTOR_STORE_BACKEND": "local",
+    "LOCAL_VECTORSTORE_PATH": str(_data / "vectorstore"),
+    "LEXICAL_INDEX_PATH": str(_data / "lexical_index"),
+    "INGEST_MANIFEST_PATH": str(_data / "manifest"),
+    "KNOWLEDGE_BASE_PATH": str(_data / "knowledge_base"),
+    "TEXT_STORE_PATH": str(_data / "text_store"),
+})
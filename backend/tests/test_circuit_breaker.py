@@ -0,0 +1,82 @@
+import pytest
+
+from app.ai.agents import circuit_breaker
+from app.ai.agents.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.config import settings
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BREAKER_FAILURES", 3)
+    monkeypatch.setattr(settings, "LLM_BREAKER_WINDOW", 10)
+    monkeypatch.setattr(settings, "LLM_BREAKER_MIN_CALLS", 4)
+    monkeypatch.setattr(settings, "LLM_BREAKER_ERROR_RATE", 0.5)
+    monkeypatch.setattr(settings, "LLM_BREAKER_COOLDOWN_SECONDS", 30)
+    return CircuitBreaker("openai")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_opens_after_consecutive_failures(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.available()
+    assert not breaker.acquire()
+
+
+def test_opens_on_error_rate_within_the_window(breaker, clock):
+    for ok in (True, False, True, False):
+        if ok:
+            breaker.record_success(0.1)
+        else:
+            breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.consecutive_failures == 1
+
+
+def test_half_open_allows_a_single_probe(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 30
+
+    assert breaker.available()
+    assert breaker.acquire()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.acquire()
+
+    breaker.release()
+    assert breaker.acquire()
+
+
+def test_probe_success_closes_and_failure_reopens(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 30
+    breaker.acquire()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+    assert not breaker.acquire()
+
+    clock[0] += 30
+    breaker.acquire()
+    breaker.record_success(0.2)
+    assert breaker.state == CLOSED
+    assert breaker.consecutive_failures == 0
+
+
+def test_latency_is_an_ewma(breaker, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_LATENCY_EWMA_ALPHA", 0.5)
+    breaker.record_success(1.0)
+    breaker.record_success(2.0)
+    assert breaker.ewma_latency == 1.5
+    assert breaker.get_stats()["ewma_latency_ms"] == 1500
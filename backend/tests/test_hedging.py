@@ -0,0 +1,54 @@
+import pytest
+
+from app.ai.agents.hedging import HedgePolicy
+from app.config import settings
+
+
+@pytest.fixture(autouse=True)
+def hedge_settings(monkeypatch):
+    monkeypatch.setattr(settings, "GENERATION_HEDGE_PERCENTILE", 90)
+    monkeypatch.setattr(settings, "GENERATION_HEDGE_DEFAULT_DELAY", 2.0)
+    monkeypatch.setattr(settings, "GENERATION_HEDGE_MIN_DELAY", 0.5)
+    monkeypatch.setattr(settings, "GENERATION_HEDGE_MAX_DELAY", 8.0)
+
+
+def test_uses_default_delay_until_enough_samples():
+    policy = HedgePolicy(min_samples=5)
+    for _ in range(4):
+        policy.record_latency("openai", 1.0)
+    assert policy.delay("openai") == 2.0
+    assert policy.delay("gemini") == 2.0
+
+
+def test_delay_is_the_latency_percentile():
+    policy = HedgePolicy(min_samples=5)
+    for seconds in range(1, 11):
+        policy.record_latency("openai", seconds * 0.5)
+    assert policy.delay("openai") == 5.0
+
+
+def test_delay_is_clamped():
+    policy = HedgePolicy(min_samples=1)
+    policy.record_latency("fast", 0.01)
+    policy.record_latency("slow", 60.0)
+    assert policy.delay("fast") == 0.5
+    assert policy.delay("slow") == 8.0
+
+
+def test_only_recent_latencies_count():
+    policy = HedgePolicy(window=3, min_samples=3)
+    for seconds in (7.0, 7.0, 7.0, 1.0, 1.0, 1.0):
+        policy.record_latency("openai", seconds)
+    assert policy.delay("openai") == 1.0
+
+
+def test_stats_track_hedge_rate_and_wins():
+    policy = HedgePolicy()
+    policy.record_outcome(hedged=False, winner="openai")
+    policy.record_outcome(hedged=True, winner="gemini")
+    policy.record_outcome(hedged=True, winner=None)
+    policy.record_outcome(hedged=True, winner="gemini")
+
+    stats = policy.get_stats()
+    assert stats["hedge_rate"] == 0.75
+    assert stats["wins"] == {"gemini": 2}
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+from app.ai.rag.lexical_index import LexicalIndex, reciprocal_rank_fusion, stem, tokenize
+
+
+def test_tokenize_folds_accents_drops_stopwords_and_stems_plurals():
+    assert tokenize("Reabilitação das Pessoas com Deficiências") == ["reabilitacao", "pessoa", "deficiencia"]
+    assert stem("instituicoes") == "instituicao"
+    assert stem("classe") == "classe"
+
+
+def test_tokenize_keeps_document_numbers_and_their_parts():
+    assert tokenize("Portaria 8.031/2025") == ["portaria", "8.031/2025", "8031", "2025"]
+
+
+def test_search_ranks_exact_terms_and_applies_filters(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add_documents([
+        (1, "Portaria 8.031 sobre equoterapia", {"approved": True, "year": 2023}),
+        (2, "Projeto de equoterapia e hidroterapia", {"approved": False, "year": 2022}),
+        (3, "Capacitação de profissionais", {"approved": True, "year": 2021}),
+    ])
+
+    assert [hit.id for hit in index.search("portaria 8.031")] == [1]
+    # Mesmo termo nos dois: o documento mais curto pontua mais (BM25)
+    assert [hit.id for hit in index.search("equoterapia")] == [2, 1]
+    assert [hit.id for hit in index.search("equoterapia", filters={"approved": False})] == [2]
+    assert [hit.id for hit in index.search("equoterapia", filters={"year_from": 2023})] == [1]
+
+
+def test_commit_persists_and_drops_removed_documents(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add_documents([(1, "oficina de libras", {}), (2, "curso de libras", {})])
+    index.remove_documents([2])
+    index.add_documents([(1, "oficina de braille", {})])
+    index.commit()
+
+    reloaded = LexicalIndex(str(tmp_path))
+    assert len(reloaded) == 1
+    assert reloaded.search("libras") == []
+    assert [hit.id for hit in reloaded.search("braille")] == [1]
+
+
+def test_rrf_counts_each_key_once_per_ranking():
+    dense = [SimpleNamespace(case=1, chunk="a"), SimpleNamespace(case=1, chunk="b"), SimpleNamespace(case=2, chunk="c")]
+    lexical = [SimpleNamespace(case=2, chunk="d"), SimpleNamespace(case=3, chunk="e")]
+
+    fused = reciprocal_rank_fusion([dense, lexical], key=lambda hit: hit.case, k=60)
+    scores = {item.case: score for score, item in fused}
+
+    assert scores[1] == 1 / 61
+    assert scores[2] == 1 / 62 + 1 / 61
+    assert scores[3] == 1 / 62
+    assert [item.case for _, item in fused] == [2, 1, 3]
+    # Mantém o item da primeira lista em que a chave aparece
+    assert fused[0][1].chunk == "c"
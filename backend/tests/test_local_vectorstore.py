@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+import json
+
+from app.ai.rag.local_vectorstore import LocalVectorIndex
+
+
+def point(point_id, vector, **payload):
+    return SimpleNamespace(id=point_id, vector=vector, payload=payload)
+
+
+def log_lines(path):
+    return (path / "payloads.jsonl").read_text(encoding="utf-8").splitlines()
+
+
+def test_search_orders_by_cosine_and_applies_filters(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    index.upsert([
+        point("a", [1, 0, 0], approved=True, year=2020),
+        point("b", [0.9, 0.1, 0], approved=False, year=2022),
+        point("c", [0, 1, 0], approved=True, year=2023),
+    ])
+
+    assert [hit.id for hit in index.search([1, 0, 0], limit=3)] == ["a", "b", "c"]
+    assert [hit.id for hit in index.search([1, 0, 0], limit=3, filters={"approved": True})] == ["a", "c"]
+    assert [hit.id for hit in index.search([1, 0, 0], limit=3, filters={"year_from": 2021})] == ["b", "c"]
+
+
+def test_search_groups_keeps_best_point_per_case(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    index.upsert([
+        point("a1", [1, 0], case_id=1),
+        point("a2", [0.95, 0.05], case_id=1),
+        point("b1", [0.8, 0.2], case_id=2),
+        point("orphan", [1, 0]),
+    ])
+
+    hits = index.search_groups([1, 0], limit=5)
+    assert [hit.id for hit in hits] == ["a1", "b1"]
+
+
+def test_upsert_and_delete_append_to_the_payload_log(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    index.upsert([point("a", [1, 0], n=1), point("b", [0, 1], n=2)])
+    index.upsert([point("a", [1, 0], n=3)])
+    index.delete(["b"])
+
+    rows = [json.loads(line) for line in log_lines(tmp_path)]
+    assert rows[2] == {"pos": 0, "id": "a", "payload": {"n": 3}}
+    assert rows[3] == {"pos": 1, "id": "b", "deleted": True}
+
+    reloaded = LocalVectorIndex(str(tmp_path))
+    assert len(reloaded) == 1
+    assert reloaded.payloads[reloaded.positions["a"]] == {"n": 3}
+    assert "b" not in reloaded.positions
+
+
+def test_payload_log_is_compacted(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    index.upsert([point("a", [1, 0], n=0)])
+    for n in range(1, 1100):
+        index.upsert([point("a", [1, 0], n=n)])
+
+    assert len(log_lines(tmp_path)) < 1024
+    reloaded = LocalVectorIndex(str(tmp_path))
+    assert reloaded.payloads[reloaded.positions["a"]] == {"n": 1099}
+
+
+def test_loads_one_line_per_position_format(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    index.upsert([point("a", [1, 0], n=1), point("b", [0, 1], n=2)])
+    (tmp_path / "payloads.jsonl").write_text(
+        json.dumps({"id": "a", "payload": {"n": 1}}) + "\n"
+        + json.dumps({"id": "b", "payload": {"n": 2}, "deleted": True}) + "\n",
+        encoding="utf-8"
+    )
+
+    reloaded = LocalVectorIndex(str(tmp_path))
+    assert list(reloaded.positions) == ["a"]
+    assert [hit.id for hit in reloaded.search([0, 1], limit=5)] == ["a"]
@@ -0,0 +1,56 @@
+from app.ai.rag.result_cache import SearchResultCache, vector_fingerprint
+from app.utils import lru
+
+
+def test_lru_evicts_least_recently_used():
+    cache = lru.LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.evictions == 1
+
+
+def test_lru_expires_entries_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(lru.time, "monotonic", lambda: now[0])
+    cache = lru.LRUCache(10, ttl_seconds=5)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl_seconds=0)
+
+    now[0] += 6
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+def test_lru_with_zero_items_stores_nothing():
+    cache = lru.LRUCache(0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_result_cache_key_changes_after_a_write():
+    cache = SearchResultCache(max_items=10, ttl_seconds=0)
+    key = cache.key("cases", [0.1, 0.2], "  equoterapia   ", {"approved": True}, 5)
+    cache.set(key, ["hit"], latency=0.25)
+
+    assert cache.get(cache.key("cases", [0.1, 0.2], "equoterapia", {"approved": True}, 5)) == ["hit"]
+    assert cache.saved_seconds == 0.25
+
+    cache.bump("cases")
+    assert cache.get(cache.key("cases", [0.1, 0.2], "equoterapia", {"approved": True}, 5)) is None
+    assert cache.invalidations == 1
+
+
+def test_result_cache_key_depends_on_filters_and_limit():
+    cache = SearchResultCache(max_items=10, ttl_seconds=0)
+    base = cache.key("cases", [0.1, 0.2], None, {"approved": True, "year": 2023}, 5)
+
+    assert base == cache.key("cases", [0.1, 0.2], None, {"year": 2023, "approved": True}, 5)
+    assert base != cache.key("cases", [0.1, 0.2], None, {"approved": False, "year": 2023}, 5)
+    assert base != cache.key("cases", [0.1, 0.2], None, {"approved": True, "year": 2023}, 6)
+    assert vector_fingerprint([0.1, 0.2]) != vector_fingerprint([0.1, 0.3])
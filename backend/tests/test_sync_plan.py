@@ -0,0 +1,125 @@
+import os
+
+import pytest
+
+from app.ai.rag.embedding_cache import model_fingerprint
+from app.services.ingestion import file_sha256
+from app.services.manifest import IngestManifest, ManifestEntry
+from app.services.sync import claim_paths, plan_sync, release_paths
+
+CHUNK_SIZE, CHUNK_OVERLAP = 1000, 200
+
+
+@pytest.fixture
+def kb(tmp_path):
+    root = tmp_path / "knowledge_base"
+    (root / "aprovados").mkdir(parents=True)
+    (root / "reprovados").mkdir()
+    return root
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return IngestManifest(str(tmp_path / "manifest"))
+
+
+def write(root, rel, content):
+    path = root / rel
+    path.write_bytes(content)
+    return path
+
+
+def index(manifest, root, rel, status="complete", **fields):
+    """Registra o arquivo como já indexado no estado atual"""
+    path = root / rel
+    stat = path.stat()
+    entry = ManifestEntry(
+        path=rel, size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=file_sha256(path),
+        model=model_fingerprint(), chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+        category=rel.split("/")[0], case_id=1, point_ids=["p1"], status=status
+    )
+    for name, value in fields.items():
+        setattr(entry, name, value)
+    manifest.put(entry)
+    return entry
+
+
+def plan(root, manifest, **kwargs):
+    return plan_sync(root, manifest, CHUNK_SIZE, CHUNK_OVERLAP, **kwargs).as_dict()
+
+
+def test_new_unchanged_changed_and_removed(kb, manifest):
+    write(kb, "aprovados/a.pdf", b"a")
+    write(kb, "aprovados/b.pdf", b"b")
+    write(kb, "reprovados/gone.pdf", b"gone")
+    index(manifest, kb, "aprovados/a.pdf")
+    index(manifest, kb, "aprovados/b.pdf")
+    index(manifest, kb, "reprovados/gone.pdf")
+    write(kb, "aprovados/b.pdf", b"b changed")
+    (kb / "reprovados/gone.pdf").unlink()
+    write(kb, "reprovados/c.pdf", b"c")
+
+    result = plan(kb, manifest)
+    assert result["unchanged"] == 1
+    assert result["changed"] == ["aprovados/b.pdf"]
+    assert result["new"] == ["reprovados/c.pdf"]
+    assert result["removed"] == ["reprovados/gone.pdf"]
+
+
+def test_touched_file_with_same_content_is_not_reindexed(kb, manifest):
+    path = write(kb, "aprovados/a.pdf", b"a")
+    index(manifest, kb, "aprovados/a.pdf")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    result = plan(kb, manifest)
+    assert result["unchanged"] == 1
+    assert result["touched"] == 1
+    assert result["changed"] == []
+
+
+def test_partial_file_is_resumed_with_its_committed_points(kb, manifest):
+    write(kb, "aprovados/a.pdf", b"a")
+    index(manifest, kb, "aprovados/a.pdf", status="partial", case_id=7, point_ids=["p1", "p2"])
+
+    sync_plan = plan_sync(kb, manifest, CHUNK_SIZE, CHUNK_OVERLAP)
+    assert [s.path.name for s in sync_plan.resumed] == ["a.pdf"]
+    assert sync_plan.resumed[0].case_id == 7
+    assert sync_plan.resumed[0].committed_points == {"p1", "p2"}
+
+
+def test_new_chunking_params_reindex_everything(kb, manifest):
+    write(kb, "aprovados/a.pdf", b"a")
+    index(manifest, kb, "aprovados/a.pdf", chunk_size=500)
+
+    assert plan(kb, manifest)["changed"] == ["aprovados/a.pdf"]
+
+
+def test_duplicate_content_is_only_recorded(kb, manifest):
+    write(kb, "aprovados/a.pdf", b"same")
+    index(manifest, kb, "aprovados/a.pdf")
+    write(kb, "reprovados/copy.pdf", b"same")
+    write(kb, "reprovados/x.pdf", b"x")
+    write(kb, "reprovados/x2.pdf", b"x")
+
+    result = plan(kb, manifest)
+    assert result["new"] == ["reprovados/x.pdf"]
+    assert sorted(result["duplicates"]) == ["reprovados/copy.pdf", "reprovados/x2.pdf"]
+
+
+def test_explicit_paths_never_remove_and_busy_paths_are_skipped(kb, manifest):
+    write(kb, "aprovados/a.pdf", b"a")
+    write(kb, "aprovados/b.pdf", b"b")
+    write(kb, "reprovados/gone.pdf", b"gone")
+    index(manifest, kb, "reprovados/gone.pdf")
+    (kb / "reprovados/gone.pdf").unlink()
+
+    assert claim_paths(["aprovados/b.pdf"]) == set()
+    try:
+        result = plan(kb, manifest, paths=["aprovados/a.pdf", "aprovados/b.pdf", "../outside.pdf"])
+    finally:
+        release_paths(["aprovados/b.pdf"])
+
+    assert result["new"] == ["aprovados/a.pdf"]
+    assert result["busy"] == ["aprovados/b.pdf"]
+    assert result["removed"] == []
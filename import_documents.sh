@@ -31,7 +31,7 @@ import json
 from app.database.session import SessionLocal
 from app.models.historical_case import HistoricalCase
 from app.ai.rag.embeddings import generate_embedding
-from app.ai.rag.vectorstore import qdrant_client, COLLECTION_NAME
+from app.ai.rag.vectorstore import qdrant_client, COLLECTION_NAME, upsert_points
 from qdrant_client.models import PointStruct
 import uuid
 
@@ -156,10 +156,7 @@ for folder in folders:
                     }
                 )
                 
-                qdrant_client.upsert(
-                    collection_name=COLLECTION_NAME,
-                    points=[point]
-                )
+                upsert_points([point], collection_name=COLLECTION_NAME)
                 
                 print("✅")
                 total_imported += 1
@@ -41,7 +41,7 @@ from pathlib import Path
 from app.database.session import SessionLocal
 from app.models.historical_case import HistoricalCase
 from app.ai.rag.embeddings import generate_embedding
-from app.ai.rag.vectorstore import qdrant_client, COLLECTION_NAME
+from app.ai.rag.vectorstore import qdrant_client, COLLECTION_NAME, upsert_points
 from qdrant_client.models import PointStruct
 import PyPDF2
 import uuid
@@ -174,10 +174,7 @@ for folder in ["aprovados", "reprovados", "diligencias", "portarias"]:
                     }
                 )
                 
-                qdrant_client.upsert(
-                    collection_name=COLLECTION_NAME,
-                    points=[point]
-                )
+                upsert_points([point], collection_name=COLLECTION_NAME)
                 
                 total_rag += 1
                 print(f"✅ RAG (ID: {case.id})")
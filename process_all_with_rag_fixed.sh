@@ -27,7 +27,7 @@ from pathlib import Path
 from app.database.session import SessionLocal
 from app.models.historical_case import HistoricalCase
 from app.ai.rag.embeddings import generate_embedding
-from app.ai.rag.vectorstore import get_qdrant_client
+from app.ai.rag.vectorstore import get_qdrant_client, upsert_points
 from app.config import settings
 from qdrant_client.models import PointStruct
 import PyPDF2
@@ -128,10 +128,7 @@ for folder in ["aprovados", "reprovados", "diligencias", "portarias"]:
                     }
                 )
                 
-                qdrant.upsert(
-                    collection_name=settings.QDRANT_COLLECTION_NAME,
-                    points=[point]
-                )
+                upsert_points([point], collection_name=settings.QDRANT_COLLECTION_NAME)
                 
                 total_rag += 1
                 print(f"✅ ID:{case.id} RAG")